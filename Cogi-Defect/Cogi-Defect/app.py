@@ -13,7 +13,7 @@ from __future__ import annotations
 import io
 import datetime as dt
 from pathlib import Path
-from typing import List
+from typing import List, Tuple
 import json
 
 import altair as alt
@@ -50,7 +50,25 @@ except ImportError:
 
 import pandas as pd
 import streamlit as st
-import sqlite3
+
+from connections import pooled
+from defect_data import (
+    COMPACT_STATE_KEY,
+    DB_PATH,
+    compact_preference,
+    ensure_schema,
+    filter_frame,
+    latest_defect_date,
+    load_archive,
+    load_defects,
+    memory_report,
+    month_span,
+    read_data_version,
+)
+from dimensions import as_categoricals, read_dimensions
+from profiling import cached_stage, render_panel, sidebar_toggle, stage, timed
+from query_backend import DuckDBBackend, PandasBackend, make_filter_spec, selected_backend
+from rollups import read_outcomes
 
 # NEW: Add session state management for debounced filtering
 if "filter_applied" not in st.session_state:
@@ -59,90 +77,81 @@ if "last_filter_hash" not in st.session_state:
     st.session_state.last_filter_hash = None
 
 # NEW: -------------------------------------------------------------
-# Cache database read so the entire table isn't loaded on every
+# The database read is cached in defect_data.load_defects (shared with the
+# Action Tracker page), so the entire table isn't loaded on every
 # Streamlit script re-run (which happens on every widget change).
 # This dramatically improves UI responsiveness for large datasets.
-@st.cache_data(show_spinner=False)
-def load_db(path: Path) -> pd.DataFrame:
-    """Read the *defects* table from the SQLite database once and cache it."""
-    with sqlite3.connect(path) as conn:
-        df = pd.read_sql("SELECT * FROM defects", conn)
-        # Pre-process datetime columns once during caching
-        datetime_cols = [c for c in df.columns 
-                        if pd.api.types.is_datetime64_any_dtype(df[c]) or 
-                        any(substr in c.lower() for substr in ["date", "time"])]
-        for col in datetime_cols:
-            df[col] = pd.to_datetime(df[col], errors="coerce")
-        return df
+# Only the months of the selected date window are read; other months are
+# loaded (and cached) when the window moves there.
+
+def preset_window(preset: str, ref_date: dt.date) -> Tuple[dt.date, dt.date]:
+    """Inclusive date window of the Daily / Weekly / Monthly presets for *ref_date*."""
+    if preset == "Weekly":
+        return ref_date - dt.timedelta(days=6), ref_date
+    if preset == "Monthly":
+        first_day = ref_date.replace(day=1)
+        next_month = (first_day + dt.timedelta(days=32)).replace(day=1)
+        return first_day, next_month - dt.timedelta(days=1)
+    return ref_date, ref_date
+
+def requested_window(latest: dt.date) -> Tuple[dt.date, dt.date]:
+    """The window the date widgets show this rerun, read from their state
+    before they are drawn (the latest day on a session's first run)."""
+    state = st.session_state
+    preset = state.get("preset") or state.get("preset_mode", "Daily")
+    if preset == "Custom":
+        dates = state.get("date_range") or state.get("date_range_value") or (latest,)
+        dates = tuple(dates) if isinstance(dates, (list, tuple)) else (dates,)
+        return (dates[0], dates[-1]) if dates else (latest, latest)
+    return preset_window(preset, state.get("ref_date") or state.get("ref_date_value") or latest)
+
+@cached_stage("load_dimensions", show_spinner=False)
+def load_dimension_values(path: Path, data_version: int = 0) -> dict:
+    """Filter options for machine/line/operation/part/component (and the
+    outcomes) from the small dimension and count tables instead of scanning
+    every defect row – the loaded months may not contain them all."""
+    with pooled(path) as conn:
+        return {**read_dimensions(conn), "Outcome": read_outcomes(conn)}
 
 # NEW: Cache expensive operations
-@st.cache_data(show_spinner=False)
+@cached_stage("unique_values", show_spinner=False)
 def get_unique_values(df: pd.DataFrame, column: str) -> list:
     """Get sorted unique values for a column, cached."""
     if column in df.columns:
         return sorted(df[column].dropna().unique())
     return []
 
-@st.cache_data(show_spinner=False) 
+@cached_stage("apply_filters", show_spinner=False)
 def apply_filters_cached(df: pd.DataFrame, filter_hash: str, filters: dict, 
                         datetime_col: str = None, start_dt=None, end_dt=None, 
                         outcome_sel=None) -> pd.DataFrame:
     """Apply all filters to dataframe, cached by filter hash."""
-    mask = pd.Series(True, index=df.index)
-    
-    # Outcome filter
-    if outcome_sel:
-        mask &= df["Outcome"].isin(outcome_sel)
-    
-    # Column filters  
-    for col, sel in filters.items():
-        if sel:  # only filter if user selected something
-            mask &= df[col].isin(sel)
-    
-    # Date/time filtering
-    if datetime_col and start_dt and end_dt:
-        mask &= df[datetime_col].between(start_dt, end_dt)
-    
-    return df[mask].copy()
+    return filter_frame(df, filters, outcome_sel, datetime_col, start_dt, end_dt).copy()
 # ------------------------------------------------------------------
 
 # NEW: Cache chart data computation
-@st.cache_data(show_spinner=False)
+@cached_stage("compute_chart_data", show_spinner=False)
 def compute_chart_data(filtered_df: pd.DataFrame, top_n: int = 20, dedup: bool = True) -> pd.DataFrame:
     """Compute top Ref_Id counts. If *dedup* true treat pin-level refs as one."""
-    if filtered_df.empty or "Ref_Id" not in filtered_df.columns:
-        return pd.DataFrame()
-
-    df = filtered_df.copy()
-
-    if dedup:
-        df["RF_Base"] = df["Ref_Id"].str.split(".").str[0]
-        base_col = "RF_Base"
-        # Deduplicate by SerialNumber + RF_Base + DefectCode (if exists)
-        dedup_cols = ["SerialNumber", base_col]
-        # Include timestamp bucket (minute) to avoid collapsing distinct runs hours apart
-        if "EventDate" in df.columns:
-            df["_event_min"] = pd.to_datetime(df["EventDate"]).dt.floor("T")
-            dedup_cols.append("_event_min")
-        if "DefectCode" in df.columns:
-            dedup_cols.append("DefectCode")
-        df = df.drop_duplicates(dedup_cols)
-    else:
-        base_col = "Ref_Id"
-
-    return (
-        df.groupby(base_col)
-        .size()
-        .reset_index(name="count")
-        .sort_values("count", ascending=False)
-        .head(top_n)
-    )
+    return PandasBackend(filtered_df).top_ref_ids(top_n=top_n, dedup=dedup)
+# ------------------------------------------------------------------
+
+# Optional DuckDB engine for the aggregations (AOI_QUERY_BACKEND=duckdb)
+QUERY_BACKEND = selected_backend()
+
+@st.cache_resource(show_spinner=False)
+def get_duckdb_backend(path: Path, data_version: int) -> DuckDBBackend:
+    """One DuckDB connection per data version, shared by all sessions."""
+    return DuckDBBackend.for_database(path, data_version)
+
+@cached_stage("duckdb_aggregate", show_spinner=False)
+def duckdb_aggregate(path: Path, data_version: int, method: str, spec, **kwargs):
+    """Run backend *method* for filter *spec* in DuckDB, cached per filter state."""
+    return getattr(get_duckdb_backend(path, data_version), method)(spec=spec, **kwargs)
 # ------------------------------------------------------------------
 
-# Locate database: current dir or parent dir
+# Database location (current dir, app dir or parent) comes from defect_data.DB_PATH
 SCRIPT_DIR = Path(__file__).resolve().parent
-POSSIBLE_DB_PATHS = [Path.cwd() / "aoi_defects.db", SCRIPT_DIR / "aoi_defects.db", SCRIPT_DIR.parent / "aoi_defects.db"]
-DB_PATH = next((p for p in POSSIBLE_DB_PATHS if p.exists()), POSSIBLE_DB_PATHS[0])
 DATA_PATTERN = "AOI_defect_status*.xlsx"  # fallback
 
 # configuration file for layout persistence
@@ -183,6 +192,9 @@ st.set_page_config(page_title="AOI Defect Dashboard", layout="wide")
 
 st.title("🪄 AOI Defect Dashboard")
 
+# Opt-in per-rerun timings (sidebar "Performance" toggle or AOI_PROFILE=1)
+perf_profile = sidebar_toggle()
+
 # ---------------------------------------------------------------------------
 # Load saved layout config if any
 # ---------------------------------------------------------------------------
@@ -240,8 +252,17 @@ else:
 
 if DB_PATH.exists():
     st.sidebar.success(f"Using database: {DB_PATH.name}")  # data source indicator
+    st.sidebar.caption(f"Query engine: {QUERY_BACKEND}")
+    ensure_schema(DB_PATH)  # pending migrations, once per process
     # CHANGED: Use cached DB loader instead of querying every run
-    df = load_db(DB_PATH)
+    data_version = read_data_version(DB_PATH)
+    compact_mode = st.sidebar.checkbox("Compact in-memory mode", value=compact_preference(),
+                                       help="Categorical text columns and small-int counts")
+    st.session_state[COMPACT_STATE_KEY] = compact_mode  # the tracker loads the same copy
+    latest = latest_defect_date(DB_PATH, data_version)
+    load_span = month_span(*requested_window(latest)) if latest else (None, None)
+    df = load_defects(DB_PATH, data_version, compact_mode, *load_span)
+    dim_options = load_dimension_values(DB_PATH, data_version)
 else:
     st.sidebar.warning("Database not found – falling back to Excel files.")
     files = find_data_files()
@@ -254,9 +275,17 @@ else:
     source_path = next(p for p in files if p.name == file_choice)
 
     df = load_excel(source_path)
+    dim_options = {}
+
+def option_values(column: str) -> list:
+    """Dimension-table options when available, else distinct values of *df*."""
+    return dim_options.get(column) or get_unique_values(df, column)
 
 # Show basic info once data is loaded
 st.caption(f"Loaded rows: {len(df)}")
+frame_memory = memory_report(df)
+if frame_memory:
+    st.sidebar.caption(f"Frame memory: {frame_memory}")
 
 # Add a small stability buffer to prevent rapid re-renders
 import time
@@ -279,7 +308,7 @@ with filter_col:
     st.subheader("Filters")
 
     # Outcome filter (full width) - use cached unique values
-    outcomes = get_unique_values(df, "Outcome")
+    outcomes = option_values("Outcome")
     outcome_sel = st.multiselect("Outcome", outcomes, default=outcomes, key="outcome")
 
     # Toggle for pin-level ref-id deduplication
@@ -344,17 +373,7 @@ with filter_col:
                                            key="ref_date",
                                            help="Click to select reference date")
                     st.session_state.ref_date_value = ref_date
-                    
-                    if preset == "Daily":
-                        start_date = end_date = ref_date
-                    elif preset == "Weekly":
-                        start_date = ref_date - dt.timedelta(days=6)
-                        end_date = ref_date
-                    elif preset == "Monthly":
-                        first_day = ref_date.replace(day=1)
-                        next_month = (first_day + dt.timedelta(days=32)).replace(day=1)
-                        last_day = next_month - dt.timedelta(days=1)
-                        start_date, end_date = first_day, last_day
+                    start_date, end_date = preset_window(preset, ref_date)
 
         with row1_col3:
             start_t = st.time_input("Start", dt.time(0, 0), key="start_time")
@@ -367,7 +386,7 @@ with filter_col:
     filters = {}
     row2_col1, row2_col2 = st.columns(2)
     with row2_col1:
-        opts_pn = get_unique_values(df, "PartNumber")
+        opts_pn = option_values("PartNumber")
         if opts_pn:
             # Limit to first 100 options for UI responsiveness
             display_opts_pn = opts_pn[:100] if len(opts_pn) > 100 else opts_pn
@@ -376,7 +395,7 @@ with filter_col:
                 st.caption(f"Showing first 100 of {len(opts_pn)} options")
             filters["PartNumber"] = sel_pn
     with row2_col2:
-        opts_cpn = get_unique_values(df, "ComponentPN") 
+        opts_cpn = option_values("ComponentPN")
         if opts_cpn:
             display_opts_cpn = opts_cpn[:100] if len(opts_cpn) > 100 else opts_cpn
             sel_cpn = st.multiselect("Component PN", display_opts_cpn, default=[], key="cpn_filter")
@@ -411,19 +430,19 @@ with filter_col:
     row4_col1, row4_col2, row4_col3 = st.columns(3)
 
     with row4_col1:
-        opts_machine = get_unique_values(df, "MachineName")
+        opts_machine = option_values("MachineName")
         if opts_machine:
             sel_machine = st.multiselect("Machine Name", opts_machine, default=[], key="machine_filter")
             filters["MachineName"] = sel_machine
 
     with row4_col2:
-        opts_operation = get_unique_values(df, "OperationName")
+        opts_operation = option_values("OperationName")
         if opts_operation:
             sel_operation = st.multiselect("Operation Name", opts_operation, default=[], key="operation_filter")
             filters["OperationName"] = sel_operation
 
     with row4_col3:
-        opts_line = get_unique_values(df, "LineName")
+        opts_line = option_values("LineName")
         if opts_line:
             sel_line = st.multiselect("Line Name", opts_line, default=[], key="line_filter")
             filters["LineName"] = sel_line
@@ -452,8 +471,29 @@ if st.session_state.last_filter_hash != filter_hash:
     st.session_state.last_filter_hash = filter_hash
     st.session_state.filter_applied = True
 
+# Drill-down into months archived by compact_db.py reads the cold Parquet
+# files for the selected window only; recent windows never touch them
+# (the Excel fallback has no archive).
+source_df = df
+if start_dt and end_dt and DB_PATH.exists():
+    archived = load_archive(DB_PATH, start_dt.date(), end_dt.date(), data_version)
+    if not archived.empty:
+        source_df = as_categoricals(pd.concat([df, archived], ignore_index=True))
+
 # Use cached filtering with hash
-filtered = apply_filters_cached(df, filter_hash, filters, datetime_col, start_dt, end_dt, outcome_sel)
+filtered = apply_filters_cached(source_df, filter_hash, filters, datetime_col, start_dt, end_dt, outcome_sel)
+
+# Aggregations run on the configured backend; DuckDB queries the on-disk
+# snapshot/database directly with the same filters pushed into SQL.
+use_duckdb = QUERY_BACKEND == "duckdb" and DB_PATH.exists()
+filter_spec = make_filter_spec(filters, datetime_col, start_dt, end_dt, outcome_sel)
+
+def aggregate(method: str, **kwargs):
+    """Run a query_backend aggregation for the current filters."""
+    if use_duckdb:
+        return duckdb_aggregate(DB_PATH, data_version, method, filter_spec, **kwargs)
+    with stage(f"aggregate:{method}", rows=len(filtered)):
+        return getattr(PandasBackend(filtered), method)(**kwargs)
 
 # ---------------------------------------------------------------------------
 # Section rendering helpers
@@ -462,8 +502,9 @@ filtered = apply_filters_cached(df, filter_hash, filters, datetime_col, start_dt
 def render_summary():
     st.subheader("Summary counts")
     cols = st.columns(len(outcomes))
+    counts = aggregate("outcome_counts")
     for i, outcome in enumerate(outcomes):
-        count = int(filtered[filtered["Outcome"] == outcome].shape[0])
+        count = int(counts.get(outcome, 0))
         cols[i].metric(outcome, f"{count}")
 
 
@@ -478,7 +519,10 @@ def render_chart_ref():
         title_suffix = ", ".join(outcome_sel)
     h_px = st.session_state.section_heights.get("chart_ref",400)
     st.subheader(f"Defect distribution – Top 20 Ref_Id ({title_suffix})")
-    ref_data = compute_chart_data(filtered, top_n=20, dedup=dedup_pins)
+    if use_duckdb:
+        ref_data = aggregate("top_ref_ids", top_n=20, dedup=dedup_pins)
+    else:
+        ref_data = compute_chart_data(filtered, top_n=20, dedup=dedup_pins)
     if ref_data.empty:
         st.info("No data to display")
         return
@@ -490,7 +534,8 @@ def render_chart_ref():
         .encode(x=alt.X("count:Q", title="Defects"), y=alt.Y(f"{y_field}:N", sort="-x", title=y_field))
         .properties(height=h_px)
     )
-    st.altair_chart(bar, use_container_width=True)
+    with stage("altair_chart"):
+        st.altair_chart(bar, use_container_width=True)
 
 
 def render_chart_comp():
@@ -498,9 +543,7 @@ def render_chart_comp():
         return
     h_px = st.session_state.section_heights.get("chart_comp",400)
     st.subheader("Defect distribution – Top 20 Component PN")
-    comp_data = (
-        filtered.groupby("ComponentPN").size().reset_index(name="count").sort_values("count", ascending=False).head(20)
-    )
+    comp_data = aggregate("top_counts", column="ComponentPN", top_n=20)
     if comp_data.empty:
         st.info("No data to display")
         return
@@ -510,7 +553,8 @@ def render_chart_comp():
         .encode(x=alt.X("count:Q", title="Defects"), y=alt.Y("ComponentPN:N", sort="-x", title="Component PN"))
         .properties(height=h_px)
     )
-    st.altair_chart(bar, use_container_width=True)
+    with stage("altair_chart"):
+        st.altair_chart(bar, use_container_width=True)
 
 
 def render_suspect():
@@ -546,45 +590,21 @@ def render_table():
         # Download button for full dataset
         if not filtered.empty:
             buf = io.BytesIO()
-            filtered.to_excel(buf, index=False)
+            with stage("table_excel", rows=len(filtered)):
+                filtered.to_excel(buf, index=False)
             st.download_button("Download filtered data (Excel)", data=buf.getvalue(), 
                               file_name="filtered_aoi_defect_status.xlsx")
 
     # Pivot table
     with st.expander("📊 Pivot – Count of SerialNumber by Part › Component › Ref vs DefectCode"):
         if not filtered.empty and "SerialNumber" in filtered.columns and "ComponentPN" in filtered.columns:
-            df_piv = filtered.copy()
-
-            # -------------------------------------------------------------
             # Limit to TOP-5 Component PN **within current filter context**
-            # -------------------------------------------------------------
-            top_pns = (
-                df_piv["ComponentPN"].value_counts().nlargest(5).index.tolist()
-            )
-            df_piv = df_piv[df_piv["ComponentPN"].isin(top_pns)]
-
-            # Ensure RF_Base column present
-            if "RF_Base" not in df_piv.columns:
-                if "Ref_Id" in df_piv.columns:
-                    df_piv["RF_Base"] = df_piv["Ref_Id"].astype(str).str.split(".").str[0]
-                else:
-                    df_piv["RF_Base"] = "N/A"
-
-            index_cols = [c for c in ("PartNumber","ComponentPN","RF_Base") if c in df_piv.columns]
-            col_field = "DefectCode" if "DefectCode" in df_piv.columns else "Outcome"
-
-            pivot = pd.pivot_table(
-                df_piv,
-                index=index_cols,
-                columns=col_field,
-                values="SerialNumber",
-                aggfunc="nunique",
-                fill_value=0,
-            )
+            pivot = aggregate("pivot_top_components", n_components=5)
             st.dataframe(pivot, use_container_width=True)
             # Download
             buf2 = io.BytesIO()
-            pivot.to_excel(buf2)
+            with stage("pivot_excel", rows=len(pivot)):
+                pivot.to_excel(buf2)
             st.download_button("Download pivot (Excel)", data=buf2.getvalue(), file_name="pivot_defects.xlsx")
         else:
             st.info("Pivot not available – required columns missing.")
@@ -596,6 +616,7 @@ section_map = {
     "chart_comp": render_chart_comp,
     "table": render_table,
 }
+section_map = {name: timed(f"section:{name}")(render) for name, render in section_map.items()}
 
 # ---------------------------------------------------------------------------
 # Orderable layout using streamlit-sortable when customize mode enabled
@@ -701,4 +722,6 @@ cfg_final = {
     "heights": st.session_state.section_heights,
     "colors": st.session_state.section_colors,
 }
-CONFIG_FILE.write_text(json.dumps(cfg_final)) 
\ No newline at end of file
+CONFIG_FILE.write_text(json.dumps(cfg_final))
+
+render_panel(perf_profile) 
\ No newline at end of file
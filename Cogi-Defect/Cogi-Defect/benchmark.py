@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+benchmark.py
+------------
+End-to-end benchmark of the AOI pipeline on synthetic data
+(synthetic_data.py), with regression checks against a stored baseline.
+
+Stages, in pipeline order (seconds):
+
+* ``generate``          – write the synthetic Excel exports (skipped when
+                          the files from an earlier run are reused)
+* ``read_excel``        – ``pd.read_excel`` of every export
+* ``classify``          – loop collapse + outcome classification
+* ``ingest``            – star-schema upsert, daily/part counts, links and
+                          the Parquet snapshot
+* ``load``              – the dashboard's cached dataset (``load_defects``)
+* ``filter``            – date window × machine × outcome filter
+* ``chart_aggregation`` – outcome counts, top components, top Ref_Ids
+* ``pivot``             – top-components pivot
+
+Query stages run per backend (``filter``, ``filter.duckdb`` …) and report
+the median of ``--repeat`` runs.  Results are written to JSON; a stage
+regresses when it is more than ``--tolerance`` slower than the baseline
+*and* slower by at least ``MIN_DELTA_S`` (timer noise on tiny stages).
+
+Usage
+-----
+$ python benchmark.py                          # 10k rows, compare to benchmark_baseline.json
+$ python benchmark.py --rows 1M --workdir bench_data --out results-1M.json
+$ python benchmark.py --rows 10k --update-baseline
+"""
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import pandas as pd
+
+import ingest_telemetry
+from connections import connect
+from defect_data import load_defects
+from ingest_to_db import classify_frame, ensure_table, get_data_version, publish_ingest, upsert_df
+from issue_effectiveness import link_issues
+from migrations import migrate
+from parquet_snapshot import months_of
+from query_backend import DUCKDB_AVAILABLE, DuckDBBackend, PandasBackend, make_filter_spec
+from synthetic_data import parse_rows, rows_label, write_rawdata
+
+STAGES = ["generate", "read_excel", "classify", "ingest", "load", "filter", "chart_aggregation", "pivot"]
+BASELINE_PATH = Path(__file__).resolve().parent / "benchmark_baseline.json"
+DEFAULT_TOLERANCE = 0.5   # 50 % slower than the baseline
+MIN_DELTA_S = 0.05
+
+
+class StageTimer(ingest_telemetry.StageTimer):
+    """Seconds per stage, plus medians of repeated query stages."""
+
+    def median(self, stage: str, fn: Callable[[], object], repeat: int) -> object:
+        """Run *fn* *repeat* times, record the median, return the last result."""
+        runs, result = [], None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = fn()
+            runs.append(time.perf_counter() - start)
+        self.seconds[stage] = statistics.median(runs)
+        return result
+
+
+# ---------------------------------------------------------------------------
+# Stages
+# ---------------------------------------------------------------------------
+
+def rawdata_files(workdir: Path, n_rows: int, seed: int, timer: StageTimer) -> List[Path]:
+    """The exports for (*n_rows*, *seed*), generated once per workdir."""
+    data_dir = workdir / f"rawdata-{rows_label(n_rows)}-s{seed}"
+    files = sorted(data_dir.glob("Defect RawData - *.xlsx"))
+    if files and (data_dir / "_complete").exists():
+        return files
+    shutil.rmtree(data_dir, ignore_errors=True)
+    with timer("generate"):
+        files = write_rawdata(data_dir, n_rows, seed)
+    (data_dir / "_complete").touch()
+    return files
+
+
+def ingest(db_path: Path, files: List[Path], timer: StageTimer) -> int:
+    """Read, classify and ingest *files* like ingest_to_db.main; returns classified rows."""
+    rows = 0
+    with connect(db_path) as conn:
+        with timer("ingest"):
+            migrate(conn)
+        months = set()
+        for path in files:
+            with timer("read_excel"):
+                raw = pd.read_excel(path, sheet_name=0)
+            with timer("classify"):
+                df = classify_frame(raw)
+            with timer("ingest"):
+                ensure_table(conn, df)
+                upsert_df(conn, df)
+            months |= months_of(df)
+            rows += len(df)
+        with timer("ingest"):
+            with conn:
+                link_issues(conn)
+            publish_ingest(conn, db_path, months)
+    return rows
+
+
+def query_stages(df: pd.DataFrame, timer: StageTimer, repeat: int) -> None:
+    """Dashboard queries on one machine's middle half of the date range."""
+    dates = df["EventDate"]
+    span = dates.max() - dates.min()
+    machine = df["MachineName"].value_counts().index[0]
+    spec = make_filter_spec({"MachineName": [machine]}, "EventDate",
+                            dates.min() + span / 4, dates.max() - span / 4, ["Real", "False"])
+
+    backends = [("", PandasBackend(df))]
+    if DUCKDB_AVAILABLE:
+        backends.append((".duckdb", DuckDBBackend.for_frame(df)))
+    for suffix, backend in backends:
+        timer.median(f"filter{suffix}", lambda: backend.filter(spec), repeat)
+        timer.median(f"chart_aggregation{suffix}", lambda: (
+            backend.outcome_counts(spec),
+            backend.top_counts("ComponentPN", spec),
+            backend.top_ref_ids(spec),
+        ), repeat)
+        timer.median(f"pivot{suffix}", lambda: backend.pivot_top_components(spec), repeat)
+
+
+def run(n_rows: int, seed: int, workdir: Path, repeat: int) -> Dict:
+    """Every stage for one dataset size; returns the result document."""
+    timer = StageTimer()
+    files = rawdata_files(workdir, n_rows, seed, timer)
+
+    db_dir = workdir / f"db-{rows_label(n_rows)}-s{seed}"
+    shutil.rmtree(db_dir, ignore_errors=True)
+    db_dir.mkdir(parents=True)
+    db_path = db_dir / "aoi_defects.db"
+    classified = ingest(db_path, files, timer)
+
+    with connect(db_path) as conn:
+        version = get_data_version(conn)
+
+    def load() -> pd.DataFrame:
+        load_defects.clear()
+        return load_defects(db_path, version)
+
+    df = timer.median("load", load, repeat)
+    query_stages(df, timer, repeat)
+
+    return {
+        "tier": rows_label(n_rows),
+        "rows": n_rows,
+        "seed": seed,
+        "created": dt.datetime.now().isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "dataset": {"files": len(files), "classified_rows": classified, "loaded_rows": len(df)},
+        "timings": {stage: round(s, 4) for stage, s in sorted(
+            timer.seconds.items(), key=lambda item: (STAGES.index(item[0].split(".")[0]), item[0])
+        )},
+    }
+
+
+# ---------------------------------------------------------------------------
+# Baseline
+# ---------------------------------------------------------------------------
+
+def read_baseline(path: Path) -> Dict[str, Dict]:
+    return json.loads(path.read_text()) if path.exists() else {}
+
+
+def compare(timings: Dict[str, float], baseline: Dict[str, float],
+            tolerance: float = DEFAULT_TOLERANCE, min_delta: float = MIN_DELTA_S) -> List[Dict]:
+    """Stages slower than their baseline by more than *tolerance* and *min_delta*."""
+    regressions = []
+    for stage, seconds in timings.items():
+        base = baseline.get(stage)
+        if base is None:
+            continue
+        if seconds > base * (1 + tolerance) and seconds - base >= min_delta:
+            regressions.append({"stage": stage, "baseline": base, "current": seconds,
+                                "ratio": round(seconds / base, 2) if base else None})
+    return regressions
+
+
+def parse_args(argv: List[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the AOI pipeline on synthetic data")
+    parser.add_argument("--rows", default="10k", help="10k, 1M, 10M or a row count (default 10k)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per query stage (median)")
+    parser.add_argument("--workdir", type=Path, default=None,
+                        help="keeps generated exports between runs (default: temporary)")
+    parser.add_argument("--out", type=Path, default=Path("benchmark_results.json"))
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="store these timings as the baseline for this tier")
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str] | None = None) -> int:
+    args = parse_args(argv)
+    n_rows = parse_rows(args.rows)
+    print(f"[INFO] Benchmark: {n_rows:,} raw rows, seed {args.seed}")
+
+    if args.workdir:
+        args.workdir.mkdir(parents=True, exist_ok=True)
+        result = run(n_rows, args.seed, args.workdir, args.repeat)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            result = run(n_rows, args.seed, Path(tmp), args.repeat)
+
+    baseline_doc = read_baseline(args.baseline)
+    baseline = baseline_doc.get(result["tier"], {}).get("timings", {})
+    result["baseline"] = {"path": str(args.baseline), "tolerance": args.tolerance, "found": bool(baseline)}
+    result["regressions"] = compare(result["timings"], baseline, args.tolerance)
+
+    width = max(map(len, result["timings"]))
+    for stage, seconds in result["timings"].items():
+        base = baseline.get(stage)
+        versus = f"  (baseline {base:.3f}s)" if base is not None else ""
+        print(f"  {stage:<{width}}  {seconds:8.3f}s{versus}")
+
+    args.out.write_text(json.dumps(result, indent=2))
+    print(f"[INFO] Results written to {args.out.resolve()}")
+
+    if args.update_baseline:
+        baseline_doc[result["tier"]] = {key: result[key] for key in ("created", "environment", "timings")}
+        args.baseline.write_text(json.dumps(baseline_doc, indent=2) + "\n")
+        print(f"[DONE] Baseline for {result['tier']} updated: {args.baseline}")
+        return 0
+    for reg in result["regressions"]:
+        print(f"[WARN] {reg['stage']}: {reg['current']:.3f}s vs baseline {reg['baseline']:.3f}s "
+              f"(x{reg['ratio']})")
+    if result["regressions"]:
+        return 1
+    print("[DONE] No regressions" if baseline else "[DONE] No baseline for this tier yet")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+compact_db.py
+-------------
+Retention job for the hot SQLite database.
+
+Pair-level defect rows older than a configurable age are moved, one whole
+month at a time, into compressed Parquet files under
+``aoi_defects_archive/month=YYYY-MM/``.  Their aggregates are added to the
+``defect_rollups`` table in the hot DB first, so counts and trends keep
+covering the full history.  Dashboard reads that reach an archived month
+read the archive transparently (see parquet_snapshot.read_snapshot).
+The ``archived_before`` watermark makes ingestion leave rows of archived
+months out, so re-ingesting an old export does not count them twice.
+
+Freed pages are returned to the filesystem with ``PRAGMA incremental_vacuum``,
+a bounded number of pages per run, so the job never locks the database for a
+full VACUUM after the one-time switch to ``auto_vacuum = INCREMENTAL``.
+
+Usage
+-----
+$ python compact_db.py                        # archive rows older than 180 days
+$ python compact_db.py --max-age-days 90 --vacuum-pages 5000
+$ python compact_db.py --dry-run
+"""
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import sqlite3
+import sys
+from pathlib import Path
+from typing import List
+
+import pandas as pd
+
+from connections import connect
+from dimensions import FACT_TABLE
+from ingest_to_db import ARCHIVED_BEFORE, DB_PATH, get_data_version, get_meta, publish_ingest, set_meta
+from migrations import migrate
+from parquet_snapshot import PYARROW_AVAILABLE, archive_dir, write_archive
+from rollups import add_rollups, ensure_rollup_table
+
+DEFAULT_MAX_AGE_DAYS = 180
+DEFAULT_VACUUM_PAGES = 2000
+
+
+def parse_args(argv: List[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Archive aged AOI defect rows to Parquet and keep rollups hot")
+    parser.add_argument("--db", type=Path, default=DB_PATH, help="SQLite database (default: %(default)s)")
+    parser.add_argument("--max-age-days", type=int, default=DEFAULT_MAX_AGE_DAYS,
+                        help="Archive months that ended more than this many days ago (default: %(default)s)")
+    parser.add_argument("--vacuum-pages", type=int, default=DEFAULT_VACUUM_PAGES,
+                        help="Max free pages to release per run (default: %(default)s)")
+    parser.add_argument("--as-of", type=dt.date.fromisoformat, default=None,
+                        help="Reference date instead of today (YYYY-MM-DD)")
+    parser.add_argument("--dry-run", action="store_true", help="Only list the months that would be archived")
+    return parser.parse_args(argv)
+
+
+def archive_cutoff(max_age_days: int, as_of: dt.date | None = None) -> dt.date:
+    """First day of the month containing (as_of - max_age_days).
+
+    Everything before the returned date is eligible, so only whole months are
+    archived and snapshot/archive partitions never overlap.
+    """
+    edge = (as_of or dt.date.today()) - dt.timedelta(days=max_age_days)
+    return edge.replace(day=1)
+
+
+def months_to_archive(conn: sqlite3.Connection, cutoff: dt.date) -> List[str]:
+    rows = conn.execute(
+        "SELECT DISTINCT strftime('%Y-%m', EventDate) FROM defects "
+        "WHERE EventDate < ? AND strftime('%Y-%m', EventDate) IS NOT NULL ORDER BY 1",
+        (cutoff.isoformat(),),
+    ).fetchall()
+    return [r[0] for r in rows]
+
+
+def compact_month(conn: sqlite3.Connection, db_path: Path, month: str, tag: str) -> int:
+    """Archive one month: Parquet first, then rollups + DELETE in one transaction."""
+    start = dt.date.fromisoformat(f"{month}-01")
+    end = (start + dt.timedelta(days=32)).replace(day=1)
+    bounds = (start.isoformat(), end.isoformat())
+
+    df = pd.read_sql("SELECT * FROM defects WHERE EventDate >= ? AND EventDate < ?", conn, params=bounds)
+    if df.empty:
+        return 0
+    write_archive(conn, db_path, month, df, tag)
+
+    with conn:  # one transaction: rollups in, raw rows out
+        add_rollups(conn, df, source="archive")
+        conn.execute(f"DELETE FROM {FACT_TABLE} WHERE EventDate >= ? AND EventDate < ?", bounds)
+    return len(df)
+
+
+def incremental_vacuum(conn: sqlite3.Connection, max_pages: int) -> int:
+    """Release up to *max_pages* free pages; returns the number released.
+
+    The first run on a database created without auto_vacuum switches it to
+    INCREMENTAL, which SQLite only applies after one full VACUUM.
+    """
+    if conn.execute("PRAGMA auto_vacuum;").fetchone()[0] != 2:
+        print("[INFO] Enabling incremental auto-vacuum (one-time full VACUUM)…")
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL;")
+        before = conn.execute("PRAGMA page_count;").fetchone()[0]
+        conn.execute("VACUUM;")
+        return before - conn.execute("PRAGMA page_count;").fetchone()[0]
+
+    free = conn.execute("PRAGMA freelist_count;").fetchone()[0]
+    conn.execute(f"PRAGMA incremental_vacuum({int(max_pages)});").fetchall()
+    return free - conn.execute("PRAGMA freelist_count;").fetchone()[0]
+
+
+def main(argv: List[str] | None = None) -> None:
+    args = parse_args(argv)
+    if not args.db.exists():
+        print(f"[ERROR] Database not found: {args.db}", file=sys.stderr)
+        sys.exit(1)
+    if not PYARROW_AVAILABLE:
+        print("[ERROR] pyarrow is required to write the Parquet archive.", file=sys.stderr)
+        sys.exit(1)
+
+    cutoff = archive_cutoff(args.max_age_days, args.as_of)
+    with connect(args.db) as conn:
+        migrate(conn, verbose=True)
+        months = months_to_archive(conn, cutoff)
+        print(f"[INFO] Cutoff {cutoff}: {len(months)} month(s) to archive {months}")
+        if args.dry_run or not months:
+            return
+
+        ensure_rollup_table(conn)
+        tag = f"v{get_data_version(conn)}"  # stable across retries of this run
+        for month in months:
+            n = compact_month(conn, args.db, month, tag)
+            print(f"  → {month}: {n:,} row(s) archived")
+
+        watermark = max(cutoff.isoformat(), get_meta(conn, ARCHIVED_BEFORE, ""))
+        set_meta(conn, ARCHIVED_BEFORE, watermark)  # ingestion leaves older rows out
+        version = publish_ingest(conn, args.db, months)
+
+        pages = incremental_vacuum(conn, args.vacuum_pages)
+        print(f"[INFO] Released {pages:,} page(s); data version {version}")
+
+    print(f"[DONE] Archive: {archive_dir(args.db).resolve()}")
+
+
+if __name__ == "__main__":
+    main()
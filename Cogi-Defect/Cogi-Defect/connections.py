@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+connections.py
+--------------
+SQLite connections shared by the dashboard pages and the CLI scripts.
+
+Every connection is opened in WAL mode with a busy timeout:
+
+* WAL lets dashboard reads continue while ``ingest_to_db.py`` or
+  ``compact_db.py`` hold the write lock, and readers never block writers;
+* ``busy_timeout`` makes a second writer (two engineers saving issues, or a
+  save during ingestion) wait for the lock instead of failing with
+  "database is locked";
+* ``synchronous = NORMAL`` is the recommended, still crash-safe, setting for
+  WAL.
+
+The Streamlit pages borrow connections from a small per-process pool
+(``pooled``) instead of opening one per query; scripts use ``connect``.
+
+    with pooled(DB_PATH) as conn:   # commit on success, rollback on error
+        ...
+"""
+from __future__ import annotations
+
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator
+
+BUSY_TIMEOUT_MS = 15_000
+POOL_SIZE = 4
+
+
+def configure(conn: sqlite3.Connection) -> sqlite3.Connection:
+    """Apply the WAL / busy-timeout settings to *conn* and return it."""
+    conn.execute(f"PRAGMA busy_timeout = {int(BUSY_TIMEOUT_MS)};")
+    conn.execute("PRAGMA journal_mode = WAL;")  # persistent; a no-op once set
+    conn.execute("PRAGMA synchronous = NORMAL;")
+    return conn
+
+
+def connect(db_path: Path, check_same_thread: bool = True) -> sqlite3.Connection:
+    """A configured connection (``with connect(p) as conn`` commits like sqlite3)."""
+    return configure(sqlite3.connect(
+        db_path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=check_same_thread
+    ))
+
+
+class ConnectionPool:
+    """At most *size* connections to one database, reused across threads.
+
+    A borrowed connection is used by one thread at a time; when all are in
+    use, ``connection()`` waits for one to be returned.
+    """
+
+    def __init__(self, db_path: Path, size: int = POOL_SIZE):
+        self.db_path = Path(db_path)
+        self.size = size
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._opened < self.size:
+                self._opened += 1
+                return connect(self.db_path, check_same_thread=False)
+        return self._idle.get(timeout=BUSY_TIMEOUT_MS / 1000)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self._acquire()
+        try:
+            with conn:  # commit on success, rollback on error
+                yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._opened -= 1
+
+
+_POOLS: Dict[Path, ConnectionPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_pool(db_path: Path) -> ConnectionPool:
+    key = Path(db_path).resolve()
+    with _POOLS_LOCK:
+        if key not in _POOLS:
+            _POOLS[key] = ConnectionPool(key)
+        return _POOLS[key]
+
+
+def pooled(db_path: Path):
+    """Borrow a pooled connection to *db_path* for a ``with`` block."""
+    return get_pool(db_path).connection()
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+defect_data.py
+--------------
+Shared data access for the defects table, used by the dashboard, the action
+tracker and the ingestion page.
+
+* one cached, typed dataset per ``data_version`` and month span
+  (``load_defects``) with the derived ISO_Week and RF_Base columns, so
+  switching pages never reloads it and only the months a window reaches are
+  read (``month_span``);
+* date windows that reach months moved out by compact_db.py add the
+  archived rows (``load_defect_window``);
+* a typed EventDate index per dataset (``date_index``): windows are
+  binary searches and ``range_outcome_counts`` is a prefix-sum lookup;
+* the filter primitives every page applies (``filter_frame``,
+  ``slice_window``, ``deduplicate_pins``).
+
+``compact_frame`` shrinks a loaded frame before it is cached: repeated text
+columns become Categoricals (integer codes + one copy of each label), the
+ReworkStatus counts become the smallest unsigned int that holds them and
+date/time columns are datetime64.  ``isin`` filters and groupbys then work
+on the codes instead of Python strings.
+"""
+from __future__ import annotations
+
+import datetime as dt
+import sqlite3
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from connections import pooled
+from dimensions import as_categoricals
+from ingest_to_db import get_data_version
+from migrations import migrate_db
+from profiling import cached_stage
+from parquet_snapshot import (
+    COUNT_COLUMNS,
+    PYARROW_AVAILABLE,
+    is_datetime_column,
+    latest_event_date,
+    read_archive,
+    read_months,
+    snapshot_is_fresh,
+)
+
+# Database next to the working directory, the app or the project root
+CODE_DIR = Path(__file__).resolve().parent
+POSSIBLE_DB_PATHS = [Path.cwd() / "aoi_defects.db", CODE_DIR / "aoi_defects.db", CODE_DIR.parent / "aoi_defects.db"]
+DB_PATH = next((p for p in POSSIBLE_DB_PATHS if p.exists()), POSSIBLE_DB_PATHS[0])
+
+# Text columns with at most this share of distinct values become categories
+MAX_CATEGORY_RATIO = 0.5
+
+# Session key of the "Compact in-memory mode" choice, read by every page so
+# they all share one cached representation of the dataset
+COMPACT_STATE_KEY = "compact_in_memory"
+
+
+def frame_memory_mb(df: pd.DataFrame) -> float:
+    """Deep memory usage of *df* in MiB (object strings included)."""
+    return float(df.memory_usage(deep=True).sum()) / 2**20
+
+
+def _is_integral(s: pd.Series) -> bool:
+    return s.notna().all() and bool((s % 1 == 0).all())
+
+
+def compact_frame(df: pd.DataFrame, max_category_ratio: float = MAX_CATEGORY_RATIO) -> pd.DataFrame:
+    """Return a memory-compact copy of *df*.
+
+    ``attrs["memory_mb"]`` holds the (before, after) sizes so the dashboard
+    can report the saving.
+    """
+    before = frame_memory_mb(df)
+    out = df.copy()
+    n = max(len(out), 1)
+    for col in out.columns:
+        s = out[col]
+        if is_datetime_column(col):
+            if not pd.api.types.is_datetime64_any_dtype(s):
+                out[col] = pd.to_datetime(s, errors="coerce")
+        elif col in COUNT_COLUMNS:
+            out[col] = pd.to_numeric(pd.to_numeric(s, errors="coerce").fillna(0), downcast="unsigned")
+        elif pd.api.types.is_float_dtype(s) and _is_integral(s):
+            out[col] = pd.to_numeric(s, downcast="integer")
+        elif s.dtype == object and s.nunique(dropna=True) <= max_category_ratio * n:
+            try:
+                as_categoricals(out, [col])
+            except TypeError:  # mixed label types cannot be sorted
+                out[col] = s.astype("category")
+    out.attrs["memory_mb"] = (before, frame_memory_mb(out))
+    return out
+
+
+def memory_report(df: pd.DataFrame) -> str | None:
+    """Before → after size for frames produced by compact_frame, else None."""
+    sizes: Tuple[float, float] | None = df.attrs.get("memory_mb")
+    if not sizes:
+        return None
+    before, after = sizes
+    return f"{before:,.1f} MB → {after:,.1f} MB"
+
+
+# ---------------------------------------------------------------------------
+# Derived columns
+# ---------------------------------------------------------------------------
+
+def ref_base(ref_ids: pd.Series) -> pd.Series:
+    """Pin-level Ref IDs collapsed to their base (C100.2 → C100)."""
+    if isinstance(ref_ids.dtype, pd.CategoricalDtype):
+        cats = ref_ids.cat.categories
+        return ref_ids.map(dict(zip(cats, cats.astype(str).str.split(".").str[0])))
+    return ref_ids.astype(str).str.split(".").str[0]
+
+
+def add_derived_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Add ISO_Week (e.g. 2025-W27) and RF_Base in place and return *df*."""
+    if "EventDate" in df.columns:
+        df["ISO_Week"] = df["EventDate"].dt.strftime("%G-W%V").astype("category")
+    if "Ref_Id" in df.columns:
+        df["RF_Base"] = ref_base(df["Ref_Id"])
+    return df
+
+
+def _prepare(df: pd.DataFrame, compact: bool) -> pd.DataFrame:
+    for col in df.columns:
+        if is_datetime_column(col) and not pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+    df = compact_frame(df) if compact else as_categoricals(df)
+    if "EventDate" in df.columns:  # sorted once so DateIndex can binary-search it
+        df = df.sort_values("EventDate", kind="stable", na_position="last", ignore_index=True)
+    return add_derived_columns(df)
+
+
+# ---------------------------------------------------------------------------
+# Cached loaders (shared by all pages)
+# ---------------------------------------------------------------------------
+
+@st.cache_resource(show_spinner=False)
+def ensure_schema(db_path: Path = DB_PATH) -> int:
+    """Run pending schema migrations once per process (see migrations.py)."""
+    return migrate_db(db_path)
+
+
+def read_data_version(db_path: Path = DB_PATH) -> int:
+    """Cheap per-rerun lookup of the database's data version (cache key)."""
+    if not Path(db_path).exists():
+        return 0
+    with pooled(db_path) as conn:
+        return get_data_version(conn)
+
+
+def month_span(start: dt.date, end: dt.date) -> Tuple[dt.date, dt.date]:
+    """First day of *start*'s month and last day of *end*'s month.
+
+    Windowed loads are keyed by this span, so every window inside the same
+    months (dashboard and tracker alike) shares one cached frame.  An empty
+    window (*end* before *start*) spans *start*'s month.
+    """
+    end = max(start, end)
+    last = (dt.date(end.year, end.month, 1) + dt.timedelta(days=32)).replace(day=1) - dt.timedelta(days=1)
+    return dt.date(start.year, start.month, 1), last
+
+
+@cached_stage("load_db", show_spinner=False)
+def load_defects(db_path: Path = DB_PATH, data_version: int = 0, compact: bool = True,
+                 start: Optional[dt.date] = None, end: Optional[dt.date] = None) -> pd.DataFrame:
+    """The hot defects dataset, loaded once per *data_version* for every page.
+
+    With *start*/*end* (a ``month_span``) only those months are read: the
+    snapshot's other partitions are never opened and SQLite seeks the
+    EventDate index.  Prefers the typed Parquet snapshot written by
+    ingestion; falls back to SQLite when the snapshot is missing or older
+    than *data_version*.
+    """
+    if not Path(db_path).exists():
+        return pd.DataFrame()
+    windowed = start is not None and end is not None
+    df = read_months(db_path, start, end) if snapshot_is_fresh(db_path, data_version) else pd.DataFrame()
+    if df.columns.empty:  # no fresh snapshot, or no partition in the window: SQLite keeps the columns
+        sql, params = "SELECT * FROM defects", None
+        if windowed:
+            sql += " WHERE EventDate >= ? AND EventDate < ?"
+            params = (start.isoformat(), (end + dt.timedelta(days=1)).isoformat())
+        with pooled(db_path) as conn:
+            try:
+                df = pd.read_sql(sql, conn, params=params)
+            except (sqlite3.OperationalError, pd.errors.DatabaseError):  # nothing ingested yet
+                return pd.DataFrame()
+    return _prepare(df, compact)
+
+
+@cached_stage("latest_date", show_spinner=False)
+def latest_defect_date(db_path: Path = DB_PATH, data_version: int = 0) -> Optional[dt.date]:
+    """Newest EventDate without loading the dataset (snapshot manifest, else one SQL MAX)."""
+    if not Path(db_path).exists():
+        return None
+    if snapshot_is_fresh(db_path, data_version):
+        return latest_event_date(db_path)
+    with pooled(db_path) as conn:
+        try:
+            latest = conn.execute("SELECT MAX(EventDate) FROM defects").fetchone()[0]
+        except sqlite3.OperationalError:  # nothing ingested yet
+            return None
+    latest = pd.to_datetime(latest, errors="coerce")
+    return None if pd.isna(latest) else latest.date()
+
+
+@cached_stage("load_archive", show_spinner=False)
+def load_archive(db_path: Path, start: dt.date, end: dt.date, data_version: int = 0) -> pd.DataFrame:
+    """Rows the retention job moved to the Parquet archive for [start, end]."""
+    if not PYARROW_AVAILABLE:
+        return pd.DataFrame()
+    df = read_archive(db_path, start, end)
+    return _prepare(df, compact=True) if not df.empty else df
+
+
+def compact_preference() -> bool:
+    """This session's "Compact in-memory mode" choice (on unless the dashboard turned it off)."""
+    return bool(st.session_state.get(COMPACT_STATE_KEY, True))
+
+
+@cached_stage("load_defect_window", show_spinner=False)
+def load_defect_window(db_path: Path, start: dt.date, end: dt.date, data_version: int = 0,
+                       compact: bool = True) -> pd.DataFrame:
+    """Defects with EventDate in the inclusive [start, end] window.
+
+    A slice of the shared frame of the window's months (the same *compact*
+    copy the dashboard holds for them), plus archived rows when the window
+    reaches months moved out by compact_db.py.
+    """
+    span = month_span(start, end)
+    df = load_defects(db_path, data_version, compact, *span)
+    if df.empty:
+        return df
+    lo, hi = date_index(db_path, data_version, compact, *span).bounds(start, end)
+    out = df.iloc[lo:hi]
+    archived = load_archive(db_path, start, end, data_version)
+    if not archived.empty:
+        out = as_categoricals(pd.concat([out, archived], ignore_index=True))
+    return out
+
+
+def clear_defect_caches() -> None:
+    """Drop every cached dataset (after ingestion or compaction)."""
+    for loader in (load_defects, latest_defect_date, load_archive, load_defect_window, date_index):
+        loader.clear()
+
+
+# ---------------------------------------------------------------------------
+# Date index + range counts
+# ---------------------------------------------------------------------------
+
+class DateIndex:
+    """Typed EventDate index over a frame sorted by EventDate.
+
+    Row bounds for a date window are two binary searches, and outcome counts
+    for any window are the difference of two rows of per-day prefix sums.
+    """
+
+    def __init__(self, df: pd.DataFrame, column: str = "EventDate"):
+        ts = df[column].to_numpy(dtype="datetime64[ns]") if column in df.columns else np.array([], "datetime64[ns]")
+        self.ts = ts[~np.isnat(ts)]  # NaT rows are sorted last and never match
+        days = self.ts.astype("datetime64[D]")
+        self.days, day_of_row = np.unique(days, return_inverse=True)
+
+        outcome = df["Outcome"].iloc[:len(self.ts)] if "Outcome" in df.columns else pd.Series(dtype=object)
+        codes, self.outcomes = pd.factorize(outcome, sort=True)
+        per_day = np.zeros((len(self.days), len(self.outcomes)), dtype=np.int64)
+        valid = codes >= 0
+        np.add.at(per_day, (day_of_row[valid], codes[valid]), 1)
+        self.cum = np.vstack([np.zeros((1, len(self.outcomes)), np.int64), per_day.cumsum(axis=0)])
+
+    def bounds(self, start: dt.date, end: dt.date) -> Tuple[int, int]:
+        """Row positions [lo, hi) of the inclusive [start, end] day window."""
+        lo = np.datetime64(start, "ns")
+        hi = np.datetime64(end + dt.timedelta(days=1), "ns")
+        return int(self.ts.searchsorted(lo, "left")), int(self.ts.searchsorted(hi, "left"))
+
+    def outcome_counts(self, start: dt.date, end: dt.date) -> Dict[str, int]:
+        """Rows per Outcome in [start, end] from the prefix sums."""
+        lo = self.days.searchsorted(np.datetime64(start, "D"), "left")
+        hi = self.days.searchsorted(np.datetime64(end, "D"), "right")
+        return {str(o): int(n) for o, n in zip(self.outcomes, self.cum[hi] - self.cum[lo]) if n}
+
+
+@st.cache_resource(show_spinner=False)
+def date_index(db_path: Path = DB_PATH, data_version: int = 0, compact: bool = True,
+               start: Optional[dt.date] = None, end: Optional[dt.date] = None) -> DateIndex:
+    """DateIndex over the shared dataset (of one month span), built once per data version."""
+    return DateIndex(load_defects(db_path, data_version, compact, start, end))
+
+
+def range_outcome_counts(db_path: Path, start: dt.date, end: dt.date, data_version: int = 0,
+                         compact: bool = True) -> Dict[str, int]:
+    """Outcome counts for [start, end] including archived months."""
+    span = month_span(start, end)
+    counts = date_index(db_path, data_version, compact, *span).outcome_counts(start, end)
+    archived = load_archive(db_path, start, end, data_version)
+    if not archived.empty and "Outcome" in archived.columns:
+        for outcome, n in archived["Outcome"].value_counts().items():
+            counts[str(outcome)] = counts.get(str(outcome), 0) + int(n)
+    return counts
+
+
+# ---------------------------------------------------------------------------
+# Filter primitives
+# ---------------------------------------------------------------------------
+
+def date_window(df: pd.DataFrame, start: dt.date, end: dt.date, column: str = "EventDate") -> pd.Series:
+    """Boolean mask: *column* falls on a day in the inclusive [start, end]."""
+    lo = pd.Timestamp(start)
+    hi = pd.Timestamp(end) + pd.Timedelta(days=1)
+    return (df[column] >= lo) & (df[column] < hi)
+
+
+def slice_window(df: pd.DataFrame, start: dt.date, end: dt.date, column: str = "EventDate") -> pd.DataFrame:
+    """Rows of *df* whose *column* falls in [start, end].
+
+    Frames derived from the shared dataset stay sorted by EventDate, so the
+    window is found by binary search; anything else falls back to a mask.
+    """
+    if df.empty or column not in df.columns:
+        return df
+    if df[column].is_monotonic_increasing:
+        lo, hi = df[column].searchsorted([pd.Timestamp(start), pd.Timestamp(end) + pd.Timedelta(days=1)])
+        return df.iloc[lo:hi]
+    return df[date_window(df, start, end, column)]
+
+
+def filter_frame(df: pd.DataFrame, filters: Dict[str, Sequence] | None = None,
+                 outcomes: Sequence[str] | None = None, datetime_col: str | None = None,
+                 start_dt=None, end_dt=None) -> pd.DataFrame:
+    """Rows matching outcome / column selections and a datetime range.
+
+    Empty selections do not filter.
+    """
+    mask = pd.Series(True, index=df.index)
+    if outcomes:
+        mask &= df["Outcome"].isin(outcomes)
+    for col, sel in (filters or {}).items():
+        if sel:
+            mask &= df[col].isin(sel)
+    if datetime_col and start_dt is not None and end_dt is not None:
+        mask &= df[datetime_col].between(start_dt, end_dt)
+    return df[mask]
+
+
+def deduplicate_pins(df: pd.DataFrame) -> pd.DataFrame:
+    """Count C100, C100.1, C100.2 on one board/run as a single defect.
+
+    Rows are unique per SerialNumber + RF_Base + DefectCode + EventDate minute
+    (so distinct runs hours apart are kept).
+    """
+    if df.empty or "Ref_Id" not in df.columns:
+        return df
+    d = df.copy()
+    if "RF_Base" not in d.columns:
+        d["RF_Base"] = ref_base(d["Ref_Id"])
+    cols = ["SerialNumber", "RF_Base"]
+    if "DefectCode" in d.columns:
+        cols.append("DefectCode")
+    if "EventDate" in d.columns:
+        d["_event_min"] = pd.to_datetime(d["EventDate"]).dt.floor("min")
+        cols.append("_event_min")
+    return d.drop_duplicates(cols).drop(columns="_event_min", errors="ignore")
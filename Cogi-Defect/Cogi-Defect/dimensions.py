@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+dimensions.py
+-------------
+Star schema for the defects table.
+
+The low-cardinality text columns (machine, line, operation, part and
+component PN) are stored once in small ``dim_*`` tables with integer
+surrogate keys; the physical fact table ``defect_facts`` only holds the
+``<column>_id`` integers.  A ``defects`` view joins them back, so every
+reader keeps using ``SELECT ... FROM defects`` with the original column
+names and order.  Writers go through ingest_to_db.upsert_df.
+
+    dim_machine(id, value)  ─┐
+    dim_line(id, value)     ─┼─<  defect_facts(..., MachineName_id, ...)
+    ...                     ─┘          └── view: defects
+"""
+from __future__ import annotations
+
+import sqlite3
+from typing import Dict, Iterable, List
+
+import pandas as pd
+
+FACT_TABLE = "defect_facts"
+VIEW_NAME = "defects"
+
+# column in the defects view -> dimension table
+DIMENSIONS = {
+    "MachineName": "dim_machine",
+    "LineName": "dim_line",
+    "OperationName": "dim_operation",
+    "PartNumber": "dim_part",
+    "ComponentPN": "dim_component",
+}
+
+
+def key_column(column: str) -> str:
+    """Name of the surrogate-key column that replaces *column* in the facts."""
+    return f"{column}_id"
+
+
+def ensure_dimension(conn: sqlite3.Connection, column: str) -> None:
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {DIMENSIONS[column]} "
+        "(id INTEGER PRIMARY KEY, value TEXT NOT NULL UNIQUE);"
+    )
+
+
+def _object_type(conn: sqlite3.Connection, name: str) -> str | None:
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = ?;", (name,)).fetchone()
+    return row[0] if row else None
+
+
+# ---------------------------------------------------------------------------
+# Schema
+# ---------------------------------------------------------------------------
+
+def create_view(conn: sqlite3.Connection) -> None:
+    """(Re)create the ``defects`` view over the facts, in fact-column order."""
+    select, joins = [], []
+    for _, name, *_ in conn.execute(f"PRAGMA table_info({FACT_TABLE});").fetchall():
+        column = name[:-3] if name.endswith("_id") else None
+        if column in DIMENSIONS:
+            alias = f"d{len(joins)}"
+            select.append(f"{alias}.value AS `{column}`")
+            joins.append(f"LEFT JOIN {DIMENSIONS[column]} {alias} ON {alias}.id = f.`{name}`")
+        else:
+            select.append(f"f.`{name}`")
+    conn.execute(f"DROP VIEW IF EXISTS {VIEW_NAME};")
+    conn.execute(
+        f"CREATE VIEW {VIEW_NAME} AS SELECT {', '.join(select)} "
+        f"FROM {FACT_TABLE} f {' '.join(joins)};"
+    )
+
+
+def migrate_legacy_table(conn: sqlite3.Connection) -> bool:
+    """Convert a pre-star ``defects`` *table* into facts + dimensions + view.
+
+    Runs in one transaction; returns False when there is nothing to migrate.
+    The space of the old table is reused by later inserts (or returned to the
+    filesystem by compact_db.py's incremental vacuum).
+    """
+    if _object_type(conn, VIEW_NAME) != "table":
+        return False
+
+    legacy = conn.execute(f"PRAGMA table_info({VIEW_NAME});").fetchall()
+    pk = [name for _, name, _, _, _, pk_pos in sorted(legacy, key=lambda r: r[5]) if pk_pos]
+    conn.commit()
+    with conn:
+        conn.execute("BEGIN;")  # DDL included, so the whole migration is atomic
+        conn.execute(f"ALTER TABLE {VIEW_NAME} RENAME TO defects_legacy;")
+        conn.execute("DROP INDEX IF EXISTS idx_defects_eventdate;")
+
+        columns_sql, select, joins = [], [], []
+        for _, name, decl, *_ in legacy:
+            if name in DIMENSIONS:
+                ensure_dimension(conn, name)
+                dim = DIMENSIONS[name]
+                conn.execute(
+                    f"INSERT OR IGNORE INTO {dim} (value) "
+                    f"SELECT DISTINCT CAST(`{name}` AS TEXT) FROM defects_legacy WHERE `{name}` IS NOT NULL;"
+                )
+                alias = f"d{len(joins)}"
+                columns_sql.append(f"`{key_column(name)}` INTEGER")
+                select.append(f"{alias}.id")
+                joins.append(f"LEFT JOIN {dim} {alias} ON {alias}.value = CAST(l.`{name}` AS TEXT)")
+            else:
+                columns_sql.append(f"`{name}` {decl}".rstrip())
+                select.append(f"l.`{name}`")
+        if pk:
+            columns_sql.append(f"PRIMARY KEY ({', '.join(pk)})")
+
+        conn.execute(f"CREATE TABLE {FACT_TABLE} ({', '.join(columns_sql)});")
+        conn.execute(
+            f"INSERT INTO {FACT_TABLE} SELECT {', '.join(select)} "
+            f"FROM defects_legacy l {' '.join(joins)};"
+        )
+        conn.execute("DROP TABLE defects_legacy;")
+        if any(name == "EventDate" for _, name, *_ in legacy):
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_defect_facts_eventdate ON {FACT_TABLE}(EventDate);")
+        create_view(conn)
+    return True
+
+
+# ---------------------------------------------------------------------------
+# Encoding / decoding
+# ---------------------------------------------------------------------------
+
+def encode_dimensions(conn: sqlite3.Connection, df: pd.DataFrame) -> pd.DataFrame:
+    """Return *df* with dimension columns replaced by their surrogate keys.
+
+    New values are added to the dimension tables (no commit).
+    """
+    out = df.copy()
+    for column, dim in DIMENSIONS.items():
+        if column not in out.columns:
+            continue
+        values = out[column].where(out[column].isna(), out[column].astype(str))
+        ensure_dimension(conn, column)
+        conn.executemany(
+            f"INSERT OR IGNORE INTO {dim} (value) VALUES (?);",
+            [(v,) for v in values.dropna().unique()],
+        )
+        ids = dict((v, i) for i, v in conn.execute(f"SELECT id, value FROM {dim};"))
+        out[column] = [None if pd.isna(k) else int(k) for k in values.map(ids)]
+        out = out.rename(columns={column: key_column(column)})
+    return out
+
+
+def read_dimensions(conn: sqlite3.Connection) -> Dict[str, List[str]]:
+    """Sorted values of every existing dimension – the filter option lists."""
+    out = {}
+    for column, dim in DIMENSIONS.items():
+        if _object_type(conn, dim) == "table":
+            out[column] = [r[0] for r in conn.execute(f"SELECT value FROM {dim} ORDER BY value;")]
+    return out
+
+
+def as_categoricals(df: pd.DataFrame, columns: Iterable[str] = DIMENSIONS) -> pd.DataFrame:
+    """Convert the dimension columns of *df* to Categoricals (sorted categories)."""
+    for col in columns:
+        if col in df.columns:
+            cat = df[col].astype("category")
+            df[col] = cat.cat.set_categories(sorted(cat.cat.categories))
+    return df
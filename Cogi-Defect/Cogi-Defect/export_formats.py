@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+export_formats.py
+-----------------
+Readers for the formats the AOI software exports "Defect RawData" in.
+
+* ``excel`` – the usual workbook (first sheet, ``pd.read_excel``)
+* ``csv``   – comma / semicolon / tab separated text (``.csv``, ``.tsv``)
+
+The format is detected from the first bytes of the file, not its name
+(workbooks are zip archives), and the delimiter from the header line, so
+a TSV saved as ``.csv`` or an upload without an extension still reads.
+
+CSV is parsed by ``pyarrow.csv`` (multithreaded, block-wise) when pyarrow
+is installed, with explicit types for the known AOI columns: serial
+numbers, Ref_Ids and part numbers stay text even when they look numeric,
+and nothing is inferred twice.  Without pyarrow ``pd.read_csv`` is used
+with the same text columns.  Either way the frame matches what
+``pd.read_excel`` gives for the same rows, so classification and upsert
+are shared.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Dict
+
+import pandas as pd
+
+from ingest_telemetry import Source
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    PYARROW_CSV_AVAILABLE = True
+except ImportError:
+    PYARROW_CSV_AVAILABLE = False
+
+EXPORT_PATTERNS = ("Defect RawData - *.xlsx", "Defect RawData - *.csv", "Defect RawData - *.tsv")
+DELIMITERS = (",", "\t", ";", "|")
+SNIFF_BYTES = 64 * 1024
+
+# Known AOI export columns; anything else is inferred
+TEXT_COLUMNS = ("LineName", "MachineName", "EventDate", "EventType", "OperationName", "SerialNumber",
+                "PartNumber", "ReworkStatus", "DefectCode", "Ref_Id", "ComponentPN")
+INT_COLUMNS = ("PartNumberRev", "LoopNumber")
+FLOAT_COLUMNS = ("RouteStep",)
+
+
+def _head(source: Source, n: int = SNIFF_BYTES) -> bytes:
+    if isinstance(source, (str, Path)):
+        with open(source, "rb") as f:
+            return f.read(n)
+    return bytes(source.getbuffer()[:n])
+
+
+def detect_format(source: Source) -> str:
+    """``excel`` for workbooks (zip, or the legacy OLE container), else ``csv``."""
+    head = _head(source, 8)
+    return "excel" if head.startswith((b"PK\x03\x04", b"\xd0\xcf\x11\xe0")) else "csv"
+
+
+def sniff_delimiter(head: bytes) -> str:
+    """The candidate delimiter that occurs most often in the header line."""
+    header = head.lstrip(b"\xef\xbb\xbf").split(b"\n", 1)[0]
+    counts = {d: header.count(d.encode()) for d in DELIMITERS}
+    best = max(counts, key=counts.get)
+    return best if counts[best] else ","
+
+
+def arrow_column_types() -> Dict[str, "pa.DataType"]:
+    return {**{c: pa.string() for c in TEXT_COLUMNS},
+            **{c: pa.int64() for c in INT_COLUMNS},
+            **{c: pa.float64() for c in FLOAT_COLUMNS}}
+
+
+def read_csv_export(source: Source) -> pd.DataFrame:
+    """One delimited export as a DataFrame; uploads are read from their buffer without a copy."""
+    delimiter = sniff_delimiter(_head(source))
+    if not PYARROW_CSV_AVAILABLE:
+        if not isinstance(source, (str, Path)):
+            source.seek(0)
+        return pd.read_csv(source, sep=delimiter, dtype={c: str for c in TEXT_COLUMNS})
+    data = str(source) if isinstance(source, (str, Path)) else pa.BufferReader(pa.py_buffer(source.getbuffer()))
+    table = pa_csv.read_csv(
+        data,
+        read_options=pa_csv.ReadOptions(use_threads=True),
+        parse_options=pa_csv.ParseOptions(delimiter=delimiter),
+        convert_options=pa_csv.ConvertOptions(column_types=arrow_column_types(), strings_can_be_null=True),
+    )
+    return table.to_pandas()
+
+
+def read_any_export(source: Source) -> pd.DataFrame:
+    """First sheet of a workbook or the rows of a delimited export."""
+    if detect_format(source) == "csv":
+        return read_csv_export(source)
+    if not isinstance(source, (str, Path)):
+        source.seek(0)
+    return pd.read_excel(source, sheet_name=0)
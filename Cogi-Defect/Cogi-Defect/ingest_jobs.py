@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+ingest_jobs.py
+--------------
+Background ingestion jobs for the Streamlit pages.
+
+``JobRunner.submit`` records a job in the ``ingest_jobs`` table and hands it
+to a process pool, so the page that asked for it returns immediately and
+nobody's dashboard waits for ``pd.read_excel``.  The worker process updates
+the job row after every file (done / failed counts, current file), which is
+what the pages poll; the row – not the browser tab or the Streamlit session
+– is the job's state, so reruns, refreshes and closed tabs don't affect it.
+
+Statuses: ``queued`` → ``running`` → ``done`` | ``failed`` | ``cancelled``.
+``cancel`` drops a queued job at once and stops a running one before its
+next file; the files already ingested are published as usual.
+
+Jobs run one at a time by default (``AOI_INGEST_WORKERS``): they all write
+the same SQLite file, so more workers mostly wait on its write lock.  When
+the server restarts, jobs that were running are marked failed and queued
+ones are submitted again.
+
+Uploads (``submit_uploads``) are ingested from the uploaded buffers on a
+thread of the server process instead: handing them to the pool would copy
+them, and writing them to disk first is what this avoids.  Such jobs cannot
+outlive the server, so a restart fails them even when still queued.
+"""
+from __future__ import annotations
+
+import contextlib
+import datetime as dt
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import types
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import pandas as pd
+
+from connections import connect
+from ingest_telemetry import Source, source_name
+
+WORKERS_ENV = "AOI_INGEST_WORKERS"
+ACTIVE = ("queued", "running")
+FINISHED = ("done", "failed", "cancelled")
+
+
+def _now() -> str:
+    return dt.datetime.now().isoformat(sep=" ", timespec="seconds")
+
+
+def ensure_jobs_table(conn: sqlite3.Connection) -> None:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ingest_jobs (
+            id               INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at       TEXT NOT NULL,
+            started_at       TEXT,
+            finished_at      TEXT,
+            status           TEXT NOT NULL DEFAULT 'queued',
+            files            TEXT NOT NULL,      -- JSON list of paths
+            total_files      INTEGER NOT NULL,
+            done_files       INTEGER NOT NULL DEFAULT 0,
+            failed_files     INTEGER NOT NULL DEFAULT 0,
+            current_file     TEXT,
+            cancel_requested INTEGER NOT NULL DEFAULT 0,
+            data_version     INTEGER,
+            message          TEXT
+        );
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ingest_jobs_status ON ingest_jobs(status);")
+
+
+def ensure_upload_jobs(conn: sqlite3.Connection) -> None:
+    """Columns for in-memory uploads and duplicate skipping."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(ingest_jobs);")}
+    for name, sql in [("source", "TEXT NOT NULL DEFAULT 'disk'"),  # disk | upload
+                      ("skip_duplicates", "INTEGER NOT NULL DEFAULT 0"),
+                      ("skipped_files", "INTEGER NOT NULL DEFAULT 0")]:
+        if name not in columns:
+            conn.execute(f"ALTER TABLE ingest_jobs ADD COLUMN {name} {sql};")
+
+
+def create_job(conn: sqlite3.Connection, paths: Sequence[Source], source: str = "disk",
+               skip_duplicates: bool = False) -> int:
+    """Uploads are recorded by name; their buffers are handed to ``run_job`` directly."""
+    files = [str(p) if source == "disk" else source_name(p) for p in paths]
+    with conn:
+        cur = conn.execute(
+            "INSERT INTO ingest_jobs (created_at, files, total_files, source, skip_duplicates) "
+            "VALUES (?, ?, ?, ?, ?);",
+            (_now(), json.dumps(files), len(files), source, int(skip_duplicates)),
+        )
+    return cur.lastrowid
+
+
+def read_jobs(conn: sqlite3.Connection, limit: int = 20) -> pd.DataFrame:
+    """Newest jobs first."""
+    return pd.read_sql("SELECT * FROM ingest_jobs ORDER BY id DESC LIMIT ?", conn, params=(limit,))
+
+
+def cancel_job(conn: sqlite3.Connection, job_id: int) -> str | None:
+    """Cancel a queued job now or ask a running one to stop; returns its new status."""
+    with conn:
+        conn.execute("UPDATE ingest_jobs SET status = 'cancelled', finished_at = ?, message = 'Cancelled' "
+                     "WHERE id = ? AND status = 'queued';", (_now(), job_id))
+        conn.execute("UPDATE ingest_jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running';",
+                     (job_id,))
+    row = conn.execute("SELECT status FROM ingest_jobs WHERE id = ?;", (job_id,)).fetchone()
+    return row[0] if row else None
+
+
+def _update(conn: sqlite3.Connection, job_id: int, **values) -> None:
+    with conn:
+        conn.execute(f"UPDATE ingest_jobs SET {', '.join(f'{k} = ?' for k in values)} WHERE id = ?;",
+                     (*values.values(), job_id))
+
+
+# ---------------------------------------------------------------------------
+# Worker (runs in the pool's process, or a server thread for uploads)
+# ---------------------------------------------------------------------------
+
+def run_job(db_path: str, job_id: int, uploads: Sequence[Source] | None = None) -> str:
+    """Ingest one job's files (or *uploads*), updating its row after each one; returns the final status."""
+    from ingest_to_db import ingest_batch  # ingest_to_db → migrations → this module
+
+    with connect(Path(db_path)) as conn:
+        with conn:  # claim the job unless it was cancelled while queued
+            claimed = conn.execute(
+                "UPDATE ingest_jobs SET status = 'running', started_at = ? WHERE id = ? AND status = 'queued';",
+                (_now(), job_id)).rowcount
+        if not claimed:
+            return conn.execute("SELECT status FROM ingest_jobs WHERE id = ?;", (job_id,)).fetchone()[0]
+        files, skip_duplicates = conn.execute(
+            "SELECT files, skip_duplicates FROM ingest_jobs WHERE id = ?;", (job_id,)).fetchone()
+        paths = list(uploads) if uploads is not None else [Path(p) for p in json.loads(files)]
+        counts = {"done_files": 0, "failed_files": 0, "skipped_files": 0}
+        errors: List[str] = []
+        duplicates: List[str] = []
+
+        def cancelled() -> bool:
+            return bool(conn.execute("SELECT cancel_requested FROM ingest_jobs WHERE id = ?;",
+                                     (job_id,)).fetchone()[0])
+
+        def file_done(path: Source, run: Dict) -> None:
+            counts["done_files"] += 1
+            _update(conn, job_id, done_files=counts["done_files"], current_file=source_name(path))
+
+        def file_failed(path: Source, exc: Exception) -> None:
+            counts["failed_files"] += 1
+            errors.append(f"{source_name(path)}: {exc}")
+            _update(conn, job_id, failed_files=counts["failed_files"], current_file=source_name(path))
+
+        def file_skipped(path: Source, previous: Dict) -> None:
+            counts["skipped_files"] += 1
+            duplicates.append(f"{source_name(path)} (= {previous['file']})")
+            _update(conn, job_id, skipped_files=counts["skipped_files"], current_file=source_name(path))
+
+        try:
+            version = ingest_batch(conn, Path(db_path), paths, report=lambda message: None,
+                                   on_error=file_failed, on_file=file_done, cancelled=cancelled,
+                                   skip_duplicates=bool(skip_duplicates), on_duplicate=file_skipped)
+        except Exception as exc:  # publishing / linking failed: nothing was made visible
+            conn.rollback()
+            _update(conn, job_id, status="failed", finished_at=_now(), message=f"{exc!r}")
+            return "failed"
+
+        if cancelled() and sum(counts.values()) < len(paths):
+            status = "cancelled"
+        elif counts["failed_files"] and not counts["done_files"]:
+            status = "failed"
+        else:
+            status = "done"
+        message = f"{counts['done_files']} of {len(paths)} file(s) ingested"
+        if duplicates:
+            message += f"; {len(duplicates)} already ingested – " + "; ".join(duplicates)
+        if errors:
+            message += f"; {len(errors)} failed – " + "; ".join(errors)
+        _update(conn, job_id, status=status, finished_at=_now(), data_version=version,
+                current_file=None, message=message)
+        return status
+
+
+# ---------------------------------------------------------------------------
+# Runner (one per server process)
+# ---------------------------------------------------------------------------
+
+def worker_count() -> int:
+    try:
+        return max(1, int(os.environ.get(WORKERS_ENV, "1")))
+    except ValueError:
+        return 1
+
+
+@contextlib.contextmanager
+def _bare_main():
+    """Streamlit runs each page as ``__main__``; spawn would run it again in the worker."""
+    main = sys.modules["__main__"]
+    sys.modules["__main__"] = types.ModuleType("__main__")
+    try:
+        yield
+    finally:
+        sys.modules["__main__"] = main
+
+
+class JobRunner:
+    """Process pool (and upload thread) plus the jobs table of one database."""
+
+    def __init__(self, db_path: Path, workers: int | None = None) -> None:
+        self.db_path = Path(db_path)
+        # spawn: never fork the threads of a running Streamlit server
+        self.pool = ProcessPoolExecutor(max_workers=workers or worker_count(),
+                                        mp_context=multiprocessing.get_context("spawn"))
+        self.threads = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest-upload")
+        self.futures: Dict[int, Future] = {}
+        with connect(self.db_path) as conn:
+            with conn:
+                ensure_jobs_table(conn)
+                ensure_upload_jobs(conn)
+            self.resumed = self._recover(conn)
+
+    def _recover(self, conn: sqlite3.Connection) -> List[int]:
+        """Jobs of a previous server process: running ones failed, queued ones resubmitted."""
+        with conn:
+            conn.execute("UPDATE ingest_jobs SET status = 'failed', finished_at = ?, "
+                         "message = 'Interrupted (server restarted)' WHERE status = 'running';", (_now(),))
+            conn.execute("UPDATE ingest_jobs SET status = 'failed', finished_at = ?, "
+                         "message = 'Upload lost (server restarted)' WHERE status = 'queued' "
+                         "AND source = 'upload';", (_now(),))
+        queued = [row[0] for row in conn.execute("SELECT id FROM ingest_jobs WHERE status = 'queued' ORDER BY id;")]
+        for job_id in queued:
+            self._submit(job_id)
+        return queued
+
+    def _submit(self, job_id: int) -> None:
+        with _bare_main():  # workers start on demand, inside submit
+            self.futures[job_id] = self.pool.submit(run_job, str(self.db_path), job_id)
+
+    def submit(self, paths: Sequence[Path], skip_duplicates: bool = False) -> int:
+        with connect(self.db_path) as conn:
+            job_id = create_job(conn, paths, skip_duplicates=skip_duplicates)
+        self._submit(job_id)
+        return job_id
+
+    def submit_uploads(self, uploads: Sequence[Source], skip_duplicates: bool = False) -> int:
+        """Ingest in-memory uploads on the server's upload thread (the job holds the buffers)."""
+        uploads = list(uploads)
+        with connect(self.db_path) as conn:
+            job_id = create_job(conn, uploads, source="upload", skip_duplicates=skip_duplicates)
+        self.futures[job_id] = self.threads.submit(run_job, str(self.db_path), job_id, uploads)
+        return job_id
+
+    def cancel(self, job_id: int) -> str | None:
+        with connect(self.db_path) as conn:
+            status = cancel_job(conn, job_id)
+        future = self.futures.get(job_id)
+        if status == "cancelled" and future is not None:
+            future.cancel()  # not started yet: never reaches a worker
+        return status
+
+    def jobs(self, limit: int = 20) -> pd.DataFrame:
+        with connect(self.db_path) as conn:
+            return read_jobs(conn, limit)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self.pool.shutdown(wait=wait)
+        self.threads.shutdown(wait=wait)
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+ingest_telemetry.py
+-------------------
+Per-file ingestion timings and throughput history.
+
+Every ingested export adds one ``ingest_runs`` row: the wall time of each
+pipeline stage, raw and classified row counts and raw rows per second.
+
+* ``read``     – ``pd.read_excel`` of the first sheet, or the typed CSV read
+* ``groupby``  – loop collapse (metadata + disposition counts)
+* ``classify`` – outcome per pad defect
+* ``merge``    – dispositions joined back to their metadata
+* ``upsert``   – dimension keys + ``INSERT OR REPLACE`` into the fact table
+* ``index``    – daily / per-part count tables of the touched days
+
+A file is flagged slow when its throughput drops below ``SLOW_FACTOR`` × the
+median of the ``SLOW_WINDOW`` files ingested before it, so a growing export
+or a schema change shows up as a trend rather than a single bad day.
+
+Exports are recorded with the SHA-256 of their content, so an upload or a
+copy of a file that was ingested before can be recognised and skipped.
+"""
+from __future__ import annotations
+
+import datetime as dt
+import hashlib
+import io
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Union
+
+import pandas as pd
+
+INGEST_STAGES = ("read", "groupby", "classify", "merge", "upsert", "index")
+SLOW_FACTOR = 0.5
+SLOW_WINDOW = 20
+MIN_HISTORY = 3
+
+Source = Union[Path, io.BytesIO]  # an export on disk or an in-memory upload (with a ``name``)
+
+
+class StageTimer:
+    """Accumulates wall-clock seconds per stage."""
+
+    def __init__(self) -> None:
+        self.seconds: Dict[str, float] = {}
+
+    @contextmanager
+    def __call__(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + time.perf_counter() - start
+
+
+def ensure_ingest_runs_table(conn: sqlite3.Connection) -> None:
+    stages_sql = ", ".join(f"{stage}_s REAL" for stage in INGEST_STAGES)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS ingest_runs (
+            id          INTEGER PRIMARY KEY AUTOINCREMENT,
+            run_started TEXT NOT NULL,
+            file        TEXT NOT NULL,
+            file_bytes  INTEGER,
+            raw_rows    INTEGER,
+            rows        INTEGER,
+            {stages_sql},
+            total_s     REAL,
+            rows_per_s  REAL
+        );
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ingest_runs_started ON ingest_runs(run_started);")
+
+
+def ensure_content_hash_column(conn: sqlite3.Connection) -> None:
+    if "content_sha256" not in {row[1] for row in conn.execute("PRAGMA table_info(ingest_runs);")}:
+        conn.execute("ALTER TABLE ingest_runs ADD COLUMN content_sha256 TEXT;")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ingest_runs_sha256 ON ingest_runs(content_sha256);")
+
+
+def source_name(source: Source) -> str:
+    return Path(source).name if isinstance(source, (str, Path)) else Path(source.name).name
+
+
+def source_bytes(source: Source) -> int | None:
+    if isinstance(source, (str, Path)):
+        return Path(source).stat().st_size if Path(source).exists() else None
+    return source.getbuffer().nbytes
+
+
+def content_sha256(source: Source) -> str:
+    """Hash of the export's bytes; uploads are hashed in place, not copied."""
+    if not isinstance(source, (str, Path)):
+        return hashlib.sha256(source.getbuffer()).hexdigest()
+    digest = hashlib.sha256()
+    with open(source, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def find_ingested(conn: sqlite3.Connection, sha256: str) -> Dict | None:
+    """The first ``ingest_runs`` row (file, run_started) with this content, if any."""
+    try:
+        row = conn.execute("SELECT file, run_started FROM ingest_runs WHERE content_sha256 = ? "
+                           "ORDER BY id LIMIT 1;", (sha256,)).fetchone()
+    except sqlite3.OperationalError:  # not migrated yet
+        return None
+    return {"file": row[0], "run_started": row[1]} if row else None
+
+
+def run_started() -> str:
+    """Timestamp shared by every file of one ingestion batch."""
+    return dt.datetime.now().isoformat(sep=" ", timespec="seconds")
+
+
+def record_file(conn: sqlite3.Connection, started: str, source: Source, raw_rows: int, rows: int,
+                timer: StageTimer, sha256: str | None = None) -> Dict:
+    """Store one file's timings (committed) and return the row with its ``slow`` flag."""
+    seconds = {stage: round(timer.seconds.get(stage, 0.0), 4) for stage in INGEST_STAGES}
+    total = sum(seconds.values())
+    row = {
+        "run_started": started,
+        "file": source_name(source),
+        "file_bytes": source_bytes(source),
+        "raw_rows": raw_rows,
+        "rows": rows,
+        **{f"{stage}_s": s for stage, s in seconds.items()},
+        "total_s": round(total, 4),
+        "rows_per_s": round(raw_rows / total, 1) if total else None,
+    }
+    if sha256 is not None:
+        row["content_sha256"] = sha256
+    with conn:
+        conn.execute(f"INSERT INTO ingest_runs ({', '.join(row)}) VALUES ({', '.join('?' * len(row))});",
+                     list(row.values()))
+    history = read_ingest_runs(conn, limit=SLOW_WINDOW + 1)
+    row["slow"] = bool(history["slow"].iloc[-1]) if not history.empty else False
+    return row
+
+
+def read_ingest_runs(conn: sqlite3.Connection, limit: int | None = None) -> pd.DataFrame:
+    """Latest *limit* files in ingestion order, with the ``slow`` flag."""
+    sql = "SELECT * FROM ingest_runs ORDER BY id DESC"
+    try:
+        df = pd.read_sql(f"{sql} LIMIT ?" if limit else sql, conn, params=(limit,) if limit else None)
+    except (sqlite3.OperationalError, pd.errors.DatabaseError):  # not migrated yet
+        return pd.DataFrame()
+    return flag_slow(df.iloc[::-1].reset_index(drop=True))
+
+
+def flag_slow(df: pd.DataFrame, factor: float = SLOW_FACTOR, window: int = SLOW_WINDOW) -> pd.DataFrame:
+    """``typical_rows_per_s`` (median of the previous *window* files) and ``slow``."""
+    df = df.copy()
+    df["typical_rows_per_s"] = (df["rows_per_s"].shift(1)
+                                .rolling(window, min_periods=MIN_HISTORY).median())
+    df["slow"] = df["rows_per_s"] < factor * df["typical_rows_per_s"]
+    return df
@@ -2,7 +2,7 @@
 """
 ingest_to_db.py
 ---------------
-Batch-process all AOI export workbooks in the current directory (or those
+Batch-process all AOI exports in the current directory (or those
 passed on the command line), classify each pad-defect combo into its Outcome
 bucket, and upsert the results into a local SQLite database so the
 Streamlit dashboard can query a single consolidated source.
@@ -11,9 +11,35 @@ Duplicates (same SerialNumber + Ref_Id + DefectCode) are automatically
 REPLACEd rather than appended, so re-processing the same file won’t create
 multiple copies.
 
+Machine, line, operation, part and component names are stored once in small
+dimension tables and referenced by integer keys (see dimensions.py); the
+``defects`` view presents the familiar wide rows.  Per-day outcome counts
+(see rollups.py) are refreshed for every day a file touches.
+
+Every run bumps the ``data_version`` stored in the database and refreshes
+the month-partitioned Parquet snapshot next to it (see parquet_snapshot.py)
+when pyarrow is installed, so the dashboard can cold-start from columnar
+files instead of SQLite.
+
+Stage timings, row counts and throughput of every file are recorded in the
+``ingest_runs`` table (see ingest_telemetry.py); files much slower than the
+recent ones are reported with a warning.
+
+Besides paths, ``ingest_batch`` accepts in-memory uploads (a ``BytesIO``
+with a ``name``, e.g. Streamlit's ``UploadedFile``), which are parsed
+straight from the buffer.  With ``skip_duplicates`` a file whose content
+hash is already in ``ingest_runs`` is skipped.
+
+Workbooks and CSV/TSV exports are both accepted; the format is detected
+from the file's content (see export_formats.py) and only the read differs.
+
+Rows dated before the ``archived_before`` watermark of compact_db.py are
+left out (and reported): those months live in the Parquet archive and its
+rollups, and upserting them again would count them twice.
+
 Usage
 -----
-$ python ingest_to_db.py               # scans for all matching xlsx files
+$ python ingest_to_db.py               # scans for all matching xlsx/csv/tsv files
 $ python ingest_to_db.py file1.xlsx ...
 """
 from __future__ import annotations
@@ -21,104 +47,312 @@ from __future__ import annotations
 import sqlite3
 import sys
 from pathlib import Path
-from typing import List
+from typing import Callable, Dict, Iterable, List, Set, Tuple
 
 import pandas as pd
 
 from aoi_classify import classify  # reuse helper
+from connections import connect
+from dimensions import DIMENSIONS, FACT_TABLE, create_view, encode_dimensions, key_column
+from export_formats import EXPORT_PATTERNS, read_any_export
+from ingest_telemetry import (Source, StageTimer, content_sha256, find_ingested, record_file, run_started,
+                              source_name)
+from issue_effectiveness import link_issues
+from migrations import migrate
+from parquet_snapshot import PYARROW_AVAILABLE, months_of, snapshot_version, write_snapshot
+from rollups import days_of, refresh_daily_counts
 
 DB_PATH = Path("aoi_defects.db")
 DATA_PATTERN = "Defect RawData - *.xlsx"
 PRIMARY_KEY = ("SerialNumber", "Ref_Id", "DefectCode")
+ARCHIVED_BEFORE = "archived_before"  # ingest_meta key written by compact_db.py
 
 def find_xlsx_files(pattern: str = DATA_PATTERN) -> List[Path]:
     return sorted(Path.cwd().glob(pattern))
 
 
-def process_file(path: Path) -> pd.DataFrame:
+def find_export_files(patterns: Iterable[str] = EXPORT_PATTERNS) -> List[Path]:
+    """Workbook and CSV/TSV exports in the current directory."""
+    return sorted({path for pattern in patterns for path in Path.cwd().glob(pattern)})
+
+
+def read_export(source: Source, timer: StageTimer | None = None) -> pd.DataFrame:
+    """Rows of one raw export (a path or an in-memory upload, workbook or CSV).
+
+    Uploads are read straight from their buffer: no copy, no temp file.
+    """
+    with (timer or StageTimer())("read"):
+        return read_any_export(source)
+
+
+def process_file(path: Path, timer: StageTimer | None = None) -> pd.DataFrame:
     """Read *path*, collapse loops, classify, return final DataFrame."""
-    # Read first sheet
-    df = pd.read_excel(path, sheet_name=0)
+    return classify_frame(read_export(path, timer), timer)
+
 
+def classify_frame(df: pd.DataFrame, timer: StageTimer | None = None) -> pd.DataFrame:
+    """Collapse the loop rows of one raw export and classify each pad defect."""
+    timer = timer or StageTimer()
     # Identify keys and metadata
     base_keys = ["SerialNumber", "Ref_Id", "DefectCode"]
     skip_cols = set(base_keys + ["ReworkStatus"])
     meta_cols = [c for c in df.columns if c not in skip_cols]
 
-    meta = (
-        df.groupby(base_keys, dropna=False)[meta_cols]
-        .first()
-        .reset_index()
-    )
+    with timer("groupby"):
+        meta = (
+            df.groupby(base_keys, dropna=False)[meta_cols]
+            .first()
+            .reset_index()
+        )
 
-    # Count dispositions
-    grp = (
-        df.groupby(base_keys + ["ReworkStatus"], dropna=False)
-        .size()
-        .unstack(fill_value=0)
-        .reset_index()
-    )
+        # Count dispositions
+        grp = (
+            df.groupby(base_keys + ["ReworkStatus"], dropna=False)
+            .size()
+            .unstack(fill_value=0)
+            .reset_index()
+        )
 
     for col in ["False call", "Overridden", "Reworkable"]:
         if col not in grp:
             grp[col] = 0
 
-    grp["Outcome"] = grp.apply(classify, axis=1)
-    final = grp[grp["Outcome"] != "None"].merge(meta, on=base_keys, how="left")
+    with timer("classify"):
+        grp["Outcome"] = grp.apply(classify, axis=1)
+    with timer("merge"):
+        final = grp[grp["Outcome"] != "None"].merge(meta, on=base_keys, how="left")
     return final
 
 
 def ensure_table(conn: sqlite3.Connection, df: pd.DataFrame) -> None:
+    """Create/extend the star schema (see dimensions.py) for *df*'s columns.
+
+    Legacy layouts and indexes are handled by migrations.migrate, which the
+    callers run once at startup.
+    """
     cur = conn.cursor()
-    # Create table if it doesn’t exist (dynamic columns)
-    columns_sql = ", ".join(
-        [
-            *(f"`{pk}` TEXT" for pk in PRIMARY_KEY),
-            *(
-                f"`{col}` TEXT" if df[col].dtype == "O" else f"`{col}` REAL"
-                for col in df.columns
-                if col not in PRIMARY_KEY
-            ),
-            f"PRIMARY KEY ({', '.join(PRIMARY_KEY)})"
-        ]
-    )
-    cur.execute(f"CREATE TABLE IF NOT EXISTS defects ({columns_sql});")
-
-    # Add any missing columns
-    cur.execute("PRAGMA table_info(defects);")
+
+    def col_def(col: str) -> str:
+        if col in DIMENSIONS:
+            return f"`{key_column(col)}` INTEGER"
+        return f"`{col}` TEXT" if df[col].dtype == "O" else f"`{col}` REAL"
+
+    cur.execute(f"PRAGMA table_info({FACT_TABLE});")
     existing_cols = {row[1] for row in cur.fetchall()}
-    for col in df.columns:
-        if col not in existing_cols:
-            col_type = "TEXT" if df[col].dtype == "O" else "REAL"
-            cur.execute(f"ALTER TABLE defects ADD COLUMN `{col}` {col_type};")
+    if not existing_cols:
+        # Create table (dynamic columns) with its view and EventDate index
+        columns_sql = ", ".join(
+            [
+                *(f"`{pk}` TEXT" for pk in PRIMARY_KEY),
+                *(col_def(col) for col in df.columns if col not in PRIMARY_KEY),
+                f"PRIMARY KEY ({', '.join(PRIMARY_KEY)})"
+            ]
+        )
+        cur.execute(f"CREATE TABLE {FACT_TABLE} ({columns_sql});")
+        if "EventDate" in df.columns:
+            cur.execute(f"CREATE INDEX IF NOT EXISTS idx_defect_facts_eventdate ON {FACT_TABLE}(EventDate);")
+        create_view(conn)
+    else:
+        # Add any missing columns
+        added = False
+        for col in df.columns:
+            if col not in existing_cols and key_column(col) not in existing_cols:
+                cur.execute(f"ALTER TABLE {FACT_TABLE} ADD COLUMN {col_def(col)};")
+                added = True
+        if added:
+            create_view(conn)
 
     conn.commit()
 
 
-def upsert_df(conn: sqlite3.Connection, df: pd.DataFrame) -> None:
-    cols = df.columns.tolist()
-    placeholders = ",".join(["?"] * len(cols))
-    col_names_sql = ",".join(f"`{c}`" for c in cols)
-    sql = f"INSERT OR REPLACE INTO defects ({col_names_sql}) VALUES ({placeholders});"
-    conn.executemany(sql, df.values.tolist())
+def stored_days(conn: sqlite3.Connection, df: pd.DataFrame) -> Set[str]:
+    """ISO days the rows with *df*'s keys are stored under now (a re-export may move them)."""
+    present = {row[1] for row in conn.execute(f"PRAGMA table_info({FACT_TABLE});")}
+    if df.empty or "EventDate" not in present or not set(PRIMARY_KEY) <= set(df.columns):
+        return set()
+    keys_sql = ", ".join(f"`{pk}` TEXT" for pk in PRIMARY_KEY)
+    conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS incoming_keys ({keys_sql});")
+    conn.execute("DELETE FROM incoming_keys;")
+    conn.executemany(f"INSERT INTO incoming_keys VALUES ({', '.join('?' * len(PRIMARY_KEY))});",
+                     df[list(PRIMARY_KEY)].values.tolist())
+    join_sql = " AND ".join(f"f.`{pk}` = k.`{pk}`" for pk in PRIMARY_KEY)
+    rows = conn.execute(
+        f"SELECT DISTINCT date(f.EventDate) FROM incoming_keys k JOIN {FACT_TABLE} f ON {join_sql} "
+        "WHERE date(f.EventDate) IS NOT NULL;"
+    ).fetchall()
+    return {day for (day,) in rows}
+
+
+def upsert_df(conn: sqlite3.Connection, df: pd.DataFrame, timer: StageTimer | None = None) -> Set[str]:
+    """Insert or replace *df*'s rows and refresh the daily counts; returns the refreshed days.
+
+    Those are *df*'s days plus the days its keys were stored under before,
+    so a row that moved to another day leaves no count behind.
+    """
+    timer = timer or StageTimer()
+    days = days_of(df)
+    with timer("upsert"):
+        days |= stored_days(conn, df)
+        df = encode_dimensions(conn, df)
+        cols = df.columns.tolist()
+        placeholders = ",".join(["?"] * len(cols))
+        col_names_sql = ",".join(f"`{c}`" for c in cols)
+        sql = f"INSERT OR REPLACE INTO {FACT_TABLE} ({col_names_sql}) VALUES ({placeholders});"
+        conn.executemany(sql, df.values.tolist())
+    # Keep the daily outcome counts of the touched days in the same commit
+    with timer("index"):
+        refresh_daily_counts(conn, days)
+        conn.commit()
+    return days
+
+
+# ---------------------------------------------------------------------------
+# Data version + Parquet snapshot
+# ---------------------------------------------------------------------------
+
+def get_meta(conn: sqlite3.Connection, key: str, default: str | None = None) -> str | None:
+    """Read a value from the small ingest_meta key/value table."""
+    try:
+        row = conn.execute("SELECT value FROM ingest_meta WHERE key = ?;", (key,)).fetchone()
+    except sqlite3.OperationalError:  # table not created yet
+        return default
+    return row[0] if row else default
+
+
+def set_meta(conn: sqlite3.Connection, key: str, value: str) -> None:
+    conn.execute("CREATE TABLE IF NOT EXISTS ingest_meta (key TEXT PRIMARY KEY, value TEXT);")
+    conn.execute("INSERT OR REPLACE INTO ingest_meta (key, value) VALUES (?, ?);", (key, value))
     conn.commit()
 
 
+def get_data_version(conn: sqlite3.Connection) -> int:
+    """Return the current data version (0 for databases that never had one)."""
+    return int(get_meta(conn, "data_version", "0"))
+
+
+def bump_data_version(conn: sqlite3.Connection) -> int:
+    """Increment and return the data version; call after every ingestion."""
+    version = get_data_version(conn) + 1
+    set_meta(conn, "data_version", str(version))
+    return version
+
+
+def publish_ingest(conn: sqlite3.Connection, db_path: Path, months: Iterable[str]) -> int:
+    """Bump the data version and refresh the Parquet snapshot for *months*.
+
+    Only the touched month partitions are rewritten when the existing snapshot
+    is exactly one version behind; anything else triggers a full rebuild.
+    """
+    previous = get_data_version(conn)
+    version = bump_data_version(conn)
+    if PYARROW_AVAILABLE:
+        incremental = snapshot_version(db_path) == previous
+        write_snapshot(conn, db_path, version, set(months) if incremental else None)
+    return version
+
+
+def drop_archived(conn: sqlite3.Connection, df: pd.DataFrame) -> Tuple[pd.DataFrame, int]:
+    """*df* without the rows dated before the archive watermark, and how many were dropped."""
+    watermark = get_meta(conn, ARCHIVED_BEFORE)
+    if not watermark or df.empty or "EventDate" not in df.columns:
+        return df, 0
+    archived = pd.to_datetime(df["EventDate"], errors="coerce") < pd.Timestamp(watermark)
+    return df[~archived].reset_index(drop=True), int(archived.sum())
+
+
+def ingest_file(conn: sqlite3.Connection, source: Source, started: str,
+                sha256: str | None = None) -> Tuple[pd.DataFrame, Dict, Set[str]]:
+    """Classify and upsert one export, recording its timings in ``ingest_runs``.
+
+    Returns the upserted rows, the ``ingest_runs`` row (with the number of
+    ``archived_rows`` left out) and the days whose counts were refreshed.
+    """
+    timer = StageTimer()
+    raw = read_export(source, timer)
+    df, archived = drop_archived(conn, classify_frame(raw, timer))
+    ensure_table(conn, df)
+    days = upsert_df(conn, df, timer)
+    run = record_file(conn, started, source, len(raw), len(df), timer, sha256)
+    run["archived_rows"] = archived
+    return df, run, days
+
+
+def ingest_batch(conn: sqlite3.Connection, db_path: Path, paths: Iterable[Source],
+                 report: Callable[[str], None] = print,
+                 on_error: Callable[[Source, Exception], None] | None = None,
+                 on_file: Callable[[Source, Dict], None] | None = None,
+                 cancelled: Callable[[], bool] | None = None,
+                 skip_duplicates: bool = False,
+                 on_duplicate: Callable[[Source, Dict], None] | None = None) -> int:
+    """Ingest *paths* file by file, relink issues and publish one new data version.
+
+    Without *on_error* a failing file aborts the batch; with it, the error is
+    handed over and the remaining files are still ingested and published.
+    *on_file* gets each ingested file's ``ingest_runs`` row; when *cancelled*
+    returns True the remaining files are skipped and the finished ones are
+    still published.  With *skip_duplicates*, files whose content was
+    ingested before are skipped and handed to *on_duplicate* with the
+    earlier run.  A batch that ingested nothing keeps the current version.
+    """
+    months = set()
+    ingested = 0
+    started = run_started()
+    for p in paths:
+        if cancelled is not None and cancelled():
+            report("[WARN] Cancelled – remaining files skipped")
+            break
+        name = source_name(p)
+        try:
+            sha256 = content_sha256(p)
+            previous = find_ingested(conn, sha256) if skip_duplicates else None
+            if previous is not None:
+                report(f"  → {name}: skipped, same content as {previous['file']} "
+                       f"(ingested {previous['run_started']})")
+                if on_duplicate is not None:
+                    on_duplicate(p, previous)
+                continue
+            df, run, days = ingest_file(conn, p, started, sha256)
+        except Exception as exc:
+            if on_error is None:
+                raise
+            conn.rollback()
+            on_error(p, exc)
+            continue
+        report(f"  → {name}: {run['raw_rows']:,} rows in {run['total_s']:.1f}s "
+               f"({run['rows_per_s'] or 0:,.0f} rows/s)")
+        if run["slow"]:
+            report(f"[WARN] {name} ingested much slower than recent files")
+        if run["archived_rows"]:
+            report(f"[WARN] {name}: {run['archived_rows']:,} row(s) from archived months left out "
+                   f"(before {get_meta(conn, ARCHIVED_BEFORE)})")
+        months |= months_of(df) | {day[:7] for day in days}  # incl. months rows moved out of
+        ingested += 1
+        if on_file is not None:
+            on_file(p, run)
+    if not ingested:
+        return get_data_version(conn)
+    with conn:  # new defects may match existing issues
+        links = link_issues(conn)
+    report(f"[INFO] {links:,} issue-defect link(s)")
+    return publish_ingest(conn, db_path, months)
+
+
 def main(paths: List[Path]) -> None:
     if not paths:
-        paths = find_xlsx_files()
+        paths = find_export_files()
         if not paths:
-            print("[WARN] No Excel files found to process.")
+            print("[WARN] No export files found to process.")
             return
 
     print(f"[INFO] Processing {len(paths)} file(s)…")
 
-    with sqlite3.connect(DB_PATH) as conn:
-        for p in paths:
-            print(f"  → {p.name}")
-            df = process_file(p)
-            ensure_table(conn, df)
-            upsert_df(conn, df)
+    with connect(DB_PATH) as conn:
+        migrate(conn, verbose=True)
+        version = ingest_batch(conn, DB_PATH, paths)
+
+    if not PYARROW_AVAILABLE:
+        print("[WARN] pyarrow not installed – Parquet snapshot skipped.")
+    print(f"[INFO] Data version: {version}")
 
     print(f"[DONE] Database updated: {DB_PATH.resolve()}")
 
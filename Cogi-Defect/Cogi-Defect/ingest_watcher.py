@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+ingest_watcher.py
+-----------------
+Long-running ingestion service: watches the export folder and ingests new
+"Defect RawData" exports (workbooks or CSV/TSV) as they land, so the dashboard follows the line
+within a minute instead of waiting for someone to run ingest_to_db.py.
+
+* The folder is polled every ``--interval`` seconds; with ``watchdog``
+  installed, file-system events (inotify on Linux) wake the scanner early.
+* A file is ready once its size and mtime have not changed for
+  ``--settle`` seconds and it opens as a complete workbook (exports are
+  copied over the network and written in several steps).
+* Ready files go through a bounded queue (``--queue-size``).  When it is
+  full the scanner leaves the rest for a later scan instead of growing
+  without limit.
+* Arrivals less than ``--batch-window`` seconds apart are ingested as one
+  batch (at most ``--max-batch`` files) through ingest_to_db.ingest_batch:
+  the usual per-file pipeline and telemetry, issue relinking and one
+  data-version bump, which the dashboard picks up on its next rerun.
+* Files already in ``ingest_runs`` with the same name and size are skipped
+  on startup; a file that fails is logged and retried only when it changes.
+* SIGINT / SIGTERM finish the current batch and exit; a second signal
+  aborts.
+
+Usage
+-----
+$ python ingest_watcher.py                         # watch the current folder
+$ python ingest_watcher.py //server/aoi_exports --db aoi_defects.db --settle 30
+$ python ingest_watcher.py --once                  # ingest what is ready and exit
+$ python ingest_watcher.py --pattern "Defect RawData - *.csv"   # CSV exports only
+"""
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import queue
+import signal
+import sqlite3
+import sys
+import threading
+import time
+import zipfile
+from pathlib import Path
+from typing import Callable, Dict, List, Sequence, Set, Tuple
+
+from connections import connect
+from export_formats import EXPORT_PATTERNS
+from ingest_to_db import DB_PATH, ingest_batch
+from migrations import migrate
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+    WATCHDOG_AVAILABLE = True
+except ImportError:
+    WATCHDOG_AVAILABLE = False
+
+INTERVAL_S = 5.0
+SETTLE_S = 10.0
+BATCH_WINDOW_S = 30.0
+MAX_BATCH = 20
+QUEUE_SIZE = 100
+
+Signature = Tuple[int, int]  # (size, mtime_ns)
+
+
+def log(message: str) -> None:
+    print(f"{dt.datetime.now():%Y-%m-%d %H:%M:%S} {message}", flush=True)
+
+
+def is_complete(path: Path) -> bool:
+    """Workbooks are zip archives: a half-written one has no central directory yet."""
+    return path.suffix.lower() != ".xlsx" or zipfile.is_zipfile(path)
+
+
+def ingested_files(conn: sqlite3.Connection) -> Set[Tuple[str, int]]:
+    """(file name, size) of every export recorded in ``ingest_runs``."""
+    try:
+        return set(conn.execute("SELECT file, file_bytes FROM ingest_runs;").fetchall())
+    except sqlite3.OperationalError:
+        return set()
+
+
+# ---------------------------------------------------------------------------
+# Scanner
+# ---------------------------------------------------------------------------
+
+class FolderScanner:
+    """Finds exports that stopped changing and were not claimed in this form yet."""
+
+    def __init__(self, folder: Path, patterns: Sequence[str] = EXPORT_PATTERNS, settle_s: float = SETTLE_S,
+                 ingested: Set[Tuple[str, int]] = frozenset()) -> None:
+        self.folder = Path(folder)
+        self.patterns = tuple(patterns)
+        self.settle_s = settle_s
+        self.ingested = set(ingested)
+        self.pending: Dict[Path, Tuple[Signature, float]] = {}  # signature, unchanged since
+        self.claimed: Dict[Path, Signature] = {}
+
+    def scan(self, now: float | None = None) -> List[Path]:
+        """Files that are ready to ingest, oldest first; call ``claim`` for each one taken."""
+        now = time.monotonic() if now is None else now
+        ready = []
+        present = sorted({path for pattern in self.patterns for path in self.folder.glob(pattern)})
+        for path in present:
+            if path.name.startswith("~$"):  # Excel lock file
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:  # moved away between glob and stat
+                continue
+            sig = (stat.st_size, stat.st_mtime_ns)
+            if self.claimed.get(path) == sig or (path.name, stat.st_size) in self.ingested:
+                continue
+            seen = self.pending.get(path)
+            if seen is None or seen[0] != sig:
+                self.pending[path] = (sig, now)
+            elif now - seen[1] >= self.settle_s and is_complete(path):
+                ready.append((stat.st_mtime_ns, path))
+        for gone in set(self.pending) - set(present):
+            del self.pending[gone]
+        return [path for _, path in sorted(ready)]
+
+    def claim(self, path: Path) -> None:
+        sig, _ = self.pending.pop(path)
+        self.claimed[path] = sig
+        self.ingested.discard((path.name, sig[0]))
+
+
+# ---------------------------------------------------------------------------
+# Service
+# ---------------------------------------------------------------------------
+
+class IngestWatcher:
+    """Scanner thread → bounded queue → batching ingestion loop."""
+
+    def __init__(self, folder: Path, db_path: Path = DB_PATH, patterns: Sequence[str] = EXPORT_PATTERNS,
+                 interval_s: float = INTERVAL_S, settle_s: float = SETTLE_S,
+                 batch_window_s: float = BATCH_WINDOW_S, max_batch: int = MAX_BATCH,
+                 queue_size: int = QUEUE_SIZE, use_events: bool = True,
+                 report: Callable[[str], None] = log) -> None:
+        self.folder = Path(folder)
+        self.db_path = Path(db_path)
+        self.interval_s = interval_s
+        self.batch_window_s = batch_window_s
+        self.max_batch = max_batch
+        self.use_events = use_events and WATCHDOG_AVAILABLE
+        self.report = report
+        self.queue: queue.Queue[Path] = queue.Queue(maxsize=queue_size)
+        self.stop = threading.Event()
+        self.wake = threading.Event()
+        with connect(self.db_path) as conn:
+            migrate(conn)
+            ingested = ingested_files(conn)
+        self.scanner = FolderScanner(self.folder, patterns, settle_s, ingested)
+        self.batches = 0
+        self.failed: List[Path] = []
+
+    def enqueue_ready(self) -> int:
+        """One scan; returns the files queued (the rest wait while the queue is full)."""
+        queued = 0
+        for path in self.scanner.scan():
+            try:
+                self.queue.put_nowait(path)
+            except queue.Full:
+                self.report(f"[WARN] Queue full ({self.queue.maxsize}); {path.name} waits for the next scan")
+                break
+            self.scanner.claim(path)
+            queued += 1
+        return queued
+
+    def _poll(self) -> None:
+        while not self.stop.is_set():
+            self.enqueue_ready()
+            self.wake.wait(self.interval_s)
+            self.wake.clear()
+
+    def next_batch(self) -> List[Path]:
+        """Block for the first file, then take arrivals until *batch_window_s* passes quietly."""
+        batch: List[Path] = []
+        while not batch and not self.stop.is_set():
+            try:
+                batch.append(self.queue.get(timeout=0.5))
+            except queue.Empty:
+                continue
+        quiet_until = time.monotonic() + self.batch_window_s
+        give_up = time.monotonic() + 4 * self.batch_window_s  # steady trickle: don't wait forever
+        while batch and len(batch) < self.max_batch and not self.stop.is_set():
+            now = time.monotonic()
+            if now >= min(quiet_until, give_up):
+                break
+            try:
+                batch.append(self.queue.get(timeout=min(quiet_until, give_up) - now))
+                quiet_until = time.monotonic() + self.batch_window_s
+            except queue.Empty:
+                break
+        return batch
+
+    def ingest(self, paths: List[Path]) -> int:
+        def failed(path: Path, exc: Exception) -> None:
+            self.failed.append(path)
+            self.report(f"[WARN] {path.name} failed: {exc!r} (retried once it changes)")
+
+        self.report(f"[INFO] Ingesting {len(paths)} file(s)…")
+        with connect(self.db_path) as conn:
+            version = ingest_batch(conn, self.db_path, paths, report=self.report, on_error=failed)
+        self.batches += 1
+        self.report(f"[INFO] Data version: {version}")
+        return version
+
+    def _start_observer(self):
+        handler = FileSystemEventHandler()
+        handler.on_any_event = lambda event: None if event.is_directory else self.wake.set()
+        observer = Observer()
+        observer.schedule(handler, str(self.folder), recursive=False)
+        observer.daemon = True
+        observer.start()
+        return observer
+
+    def run(self) -> None:
+        """Serve until ``stop`` is set; the batch in progress is always finished."""
+        observer = None
+        if self.use_events:
+            try:
+                observer = self._start_observer()
+            except OSError as exc:  # e.g. inotify watch limit reached
+                self.report(f"[WARN] File events unavailable ({exc}); polling only")
+        poller = threading.Thread(target=self._poll, name="ingest-scanner", daemon=True)
+        poller.start()
+        mode = "file events + polling" if observer else "polling"
+        self.report(f"[INFO] Watching {self.folder.resolve()} ({mode} every {self.interval_s:g}s)")
+        try:
+            while not self.stop.is_set():
+                batch = self.next_batch()
+                if batch:
+                    self.ingest(batch)
+        finally:
+            self.stop.set()
+            self.wake.set()
+            poller.join()
+            if observer is not None:
+                observer.stop()
+                observer.join()
+        self.report(f"[DONE] Stopped after {self.batches} batch(es)")
+
+    def run_once(self) -> int:
+        """Ingest every file that is ready now (waits one settle period); returns files ingested."""
+        self.enqueue_ready()
+        time.sleep(self.scanner.settle_s)
+        self.enqueue_ready()
+        paths = []
+        while not self.queue.empty():
+            paths.append(self.queue.get_nowait())
+        for start in range(0, len(paths), self.max_batch):
+            self.ingest(paths[start:start + self.max_batch])
+        return len(paths)
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def parse_args(argv: List[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Watch a folder and ingest new AOI exports")
+    parser.add_argument("folder", nargs="?", type=Path, default=Path.cwd())
+    parser.add_argument("--db", type=Path, default=DB_PATH)
+    parser.add_argument("--pattern", action="append", dest="patterns",
+                        help=f"glob of the exports to watch, repeatable (default: {', '.join(EXPORT_PATTERNS)})")
+    parser.add_argument("--interval", type=float, default=INTERVAL_S, help="seconds between scans")
+    parser.add_argument("--settle", type=float, default=SETTLE_S, help="seconds a file must stay unchanged")
+    parser.add_argument("--batch-window", type=float, default=BATCH_WINDOW_S,
+                        help="quiet seconds that close a batch")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE)
+    parser.add_argument("--poll-only", action="store_true", help="ignore file-system events")
+    parser.add_argument("--once", action="store_true", help="ingest the files ready now and exit")
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str] | None = None) -> int:
+    args = parse_args(argv)
+    if not args.folder.is_dir():
+        print(f"[WARN] Not a folder: {args.folder}")
+        return 2
+    watcher = IngestWatcher(args.folder, args.db, args.patterns or EXPORT_PATTERNS, args.interval, args.settle,
+                            args.batch_window, args.max_batch, args.queue_size, use_events=not args.poll_only)
+    if args.once:
+        n = watcher.run_once()
+        print(f"[DONE] {n} file(s) ingested" if n else "[DONE] Nothing new to ingest")
+        return 1 if watcher.failed else 0
+
+    def shutdown(signum, frame):
+        if watcher.stop.is_set():
+            raise KeyboardInterrupt  # second signal: abort the batch in progress
+        watcher.report("[INFO] Stopping after the current batch…")
+        watcher.stop.set()
+        watcher.wake.set()
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+    watcher.run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+issue_analytics.py
+------------------
+KPIs and trend series for the action tracker, computed in SQLite.
+
+Every function takes the tracker's filters (date range, status, line,
+category; see issues_db.issue_filters) and returns small frames or dicts,
+so the page caches them per filter combination instead of re-parsing dates
+in pandas on each rerun.
+
+* ``issue_kpis``            – count, overdue, average resolution days
+* ``weekly_closure``        – issues per Monday-start week and share closed
+* ``issues_per_day``        – issues reported per day
+* ``cycle_time_percentiles``– created → closed, from issue_changelog
+* ``backlog_series``        – open backlog per day, a running sum over the
+                              ``issue_backlog_daily`` transitions that
+                              save_issue appends to (never a changelog scan)
+"""
+from __future__ import annotations
+
+import datetime as dt
+import sqlite3
+from typing import Dict, Sequence
+
+import numpy as np
+import pandas as pd
+
+from issues_db import issue_filters
+
+ACTIVE_STATUSES = ("Open", "In Progress")
+PERCENTILES = (50, 75, 90, 95)
+
+
+def issue_kpis(conn: sqlite3.Connection, start: dt.date, end: dt.date, statuses: Sequence[str] = (),
+               lines: Sequence[str] = (), categories: Sequence[str] = (),
+               now: dt.datetime | None = None) -> Dict[str, float | int | None]:
+    """Issue count, overdue active issues and mean whole days to resolution.
+
+    ``avg_resolution_days`` is None when no matching issue is closed.
+    """
+    where, params = issue_filters(start, end, statuses, lines, categories)
+    now = now or dt.datetime.now()
+    total, overdue, avg_days = conn.execute(
+        f"""
+        SELECT COUNT(*),
+               COALESCE(SUM(status IN (?, ?) AND julianday(due_date) < julianday(?)), 0),
+               AVG(CASE WHEN status = 'Closed'
+                        THEN CAST(julianday(updated_at) - julianday(created_at) AS INTEGER) END)
+        FROM issues WHERE {where}
+        """,
+        [*ACTIVE_STATUSES, now.isoformat(sep=" "), *params],
+    ).fetchone()
+    return {"total": total, "overdue": overdue, "avg_resolution_days": avg_days}
+
+
+def weekly_closure(conn: sqlite3.Connection, start: dt.date, end: dt.date, statuses: Sequence[str] = (),
+                   lines: Sequence[str] = (), categories: Sequence[str] = ()) -> pd.DataFrame:
+    """Same columns as the backends' ``weekly_closure`` (week, total, closed, closure_rate, week_str)."""
+    where, params = issue_filters(start, end, statuses, lines, categories)
+    weekly = pd.read_sql(
+        f"""
+        SELECT date(date_reported, 'weekday 0', '-6 days') AS week_start,
+               COUNT(*) AS total,
+               SUM(status = 'Closed') AS closed
+        FROM issues WHERE {where}
+        GROUP BY week_start ORDER BY week_start
+        """,
+        conn,
+        params=params,
+    )
+    weekly.insert(0, "week", pd.to_datetime(weekly.pop("week_start")).dt.to_period("W"))
+    weekly["closure_rate"] = (weekly["closed"] / weekly["total"] * 100).fillna(0)
+    weekly["week_str"] = weekly["week"].astype(str)
+    return weekly
+
+
+def issues_per_day(conn: sqlite3.Connection, start: dt.date, end: dt.date, statuses: Sequence[str] = (),
+                   lines: Sequence[str] = (), categories: Sequence[str] = ()) -> pd.DataFrame:
+    where, params = issue_filters(start, end, statuses, lines, categories)
+    daily = pd.read_sql(
+        f"SELECT date(date_reported) AS date_reported, COUNT(*) AS count FROM issues WHERE {where} "
+        "GROUP BY 1 ORDER BY 1",
+        conn,
+        params=params,
+    )
+    daily["date_reported"] = pd.to_datetime(daily["date_reported"])
+    return daily
+
+
+def cycle_time_percentiles(conn: sqlite3.Connection, start: dt.date, end: dt.date,
+                           statuses: Sequence[str] = (), lines: Sequence[str] = (),
+                           categories: Sequence[str] = (),
+                           percentiles: Sequence[int] = PERCENTILES) -> Dict[str, float]:
+    """Days from creation to the last change of status to Closed, as ``{"p50": ...}``.
+
+    Empty when no matching issue has been closed.  The changelog is reached
+    through its (issue_id, changed_at) index.
+    """
+    where, params = issue_filters(start, end, statuses, lines, categories)
+    days = np.array([r[0] for r in conn.execute(
+        f"""
+        SELECT julianday(MAX(c.changed_at)) - julianday(i.created_at)
+        FROM issues i
+        JOIN issue_changelog c ON c.issue_id = i.id AND c.field_name = 'status' AND c.new_value = 'Closed'
+        WHERE {where}
+        GROUP BY i.id
+        """,
+        params,
+    ) if r[0] is not None], dtype=float)
+    if not len(days):
+        return {}
+    return {f"p{q}": float(v) for q, v in zip(percentiles, np.percentile(days, percentiles))}
+
+
+def backlog_series(conn: sqlite3.Connection, start: dt.date, end: dt.date) -> pd.DataFrame:
+    """Open issues at the end of each day in [start, end] with a status change.
+
+    The running total starts at the first recorded day, so it is correct for
+    any window without reading the changelog.
+    """
+    return pd.read_sql(
+        """
+        SELECT day, opened, closed, backlog FROM (
+            SELECT day, opened, closed, SUM(opened - closed) OVER (ORDER BY day) AS backlog
+            FROM issue_backlog_daily
+        ) WHERE day BETWEEN ? AND ? ORDER BY day
+        """,
+        conn,
+        params=(start.isoformat(), end.isoformat()),
+        parse_dates=["day"],
+    )
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+issue_effectiveness.py
+----------------------
+Links issues to the AOI defects they describe and measures whether the
+corrective action changed the defect rate.
+
+``issue_defect_links`` holds one row per issue × (ComponentPN, Ref_Id,
+LineName) that has defects in ``part_daily_counts`` (see rollups.py).  An
+issue links on its component PN; an empty ref or line matches every ref /
+line of that component, and a ref also matches its pins (D1001 links
+D1001.1, D1001.2 – the RF_Base rule).  ``link_issues`` rebuilds the links of some or all
+issues with one join on the part index — save_issue relinks an issue when
+its part fields change, ingestion relinks every issue.
+
+``effectiveness`` compares each linked issue's defect rate in the
+*window_days* before and after its action day (the day it was last closed,
+otherwise the day it was reported), reading only the per-part daily counts:
+hundreds of actions are evaluated in one query.
+"""
+from __future__ import annotations
+
+import sqlite3
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# Issue fields that decide which defects an issue links to
+LINK_FIELDS = ("component_pn", "ref_id", "line_name")
+# Confirmed defects; False calls and unreviewed Suspects are not product defects
+DEFECT_OUTCOMES = ("Real",)
+WINDOW_DAYS = 14
+
+# Sorts after every Ref_Id / LineName, so '' -> [lo, hi] matches any value,
+# a ref -> [ref, ref.<max>] its pins and a line -> [line, line]; all of
+# them keep the part index usable
+_MAX_TEXT = "char(1114111)"
+
+
+def ensure_link_table(conn: sqlite3.Connection) -> None:
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS issue_defect_links (
+            issue_id    INTEGER NOT NULL,
+            ComponentPN TEXT NOT NULL,
+            Ref_Id      TEXT NOT NULL,
+            LineName    TEXT NOT NULL,
+            first_day   TEXT NOT NULL,
+            last_day    TEXT NOT NULL,
+            n           INTEGER NOT NULL,
+            PRIMARY KEY (issue_id, ComponentPN, Ref_Id, LineName)
+        );
+    """)
+
+
+def _id_filter(column: str, issue_ids: Optional[Iterable[int]]) -> tuple[str, list]:
+    if issue_ids is None:
+        return "1", []
+    ids = [int(i) for i in issue_ids]
+    return f"{column} IN ({', '.join('?' * len(ids)) or 'NULL'})", ids
+
+
+def link_issues(conn: sqlite3.Connection, issue_ids: Optional[Iterable[int]] = None) -> int:
+    """Rebuild the defect links of *issue_ids* (all issues when None); returns rows written.
+
+    Does not commit, so save_issue can make it part of the save.
+    """
+    where, ids = _id_filter("issue_id", issue_ids)
+    conn.execute(f"DELETE FROM issue_defect_links WHERE {where};", ids)
+    where, ids = _id_filter("i.id", issue_ids)
+    cur = conn.execute(
+        f"""
+        INSERT INTO issue_defect_links (issue_id, ComponentPN, Ref_Id, LineName, first_day, last_day, n)
+        SELECT i.id, p.ComponentPN, p.Ref_Id, p.LineName, MIN(p.day), MAX(p.day), SUM(p.n)
+        FROM (
+            SELECT id, TRIM(component_pn) AS pn,
+                   TRIM(COALESCE(ref_id, '')) AS ref, TRIM(COALESCE(line_name, '')) AS line
+            FROM issues
+        ) i
+        JOIN part_daily_counts p
+          ON p.ComponentPN = i.pn
+         AND p.Ref_Id BETWEEN i.ref AND CASE WHEN i.ref = '' THEN {_MAX_TEXT} ELSE i.ref || '.' || {_MAX_TEXT} END
+         AND (i.ref = '' OR p.Ref_Id = i.ref OR substr(p.Ref_Id, 1, length(i.ref) + 1) = i.ref || '.')
+         AND p.LineName BETWEEN i.line AND CASE WHEN i.line = '' THEN {_MAX_TEXT} ELSE i.line END
+        WHERE i.pn <> '' AND {where}
+        GROUP BY i.id, p.ComponentPN, p.Ref_Id, p.LineName;
+        """,
+        ids,
+    )
+    return cur.rowcount
+
+
+def _covered_days(first: pd.Series, last: pd.Series, data_first: str, data_last: str) -> pd.Series:
+    """Days of [first, last] that fall inside the loaded data, per row."""
+    lo = first.clip(lower=pd.Timestamp(data_first))
+    hi = last.clip(upper=pd.Timestamp(data_last))
+    return ((hi - lo).dt.days + 1).clip(lower=0)
+
+
+def effectiveness(conn: sqlite3.Connection, issue_ids: Optional[Iterable[int]] = None,
+                  window_days: int = WINDOW_DAYS,
+                  outcomes: Sequence[str] = DEFECT_OUTCOMES) -> pd.DataFrame:
+    """Defect rate before vs. after each linked issue's action day.
+
+    One row per linked issue: issue_id, action_day, before_n, after_n,
+    before_days, after_days, before_rate, after_rate (defects per day of
+    data in the window; NaN when the window has no data yet) and change_pct.
+    The action day itself is in neither window.
+    """
+    columns = ["issue_id", "action_day", "before_n", "after_n", "before_days", "after_days",
+               "before_rate", "after_rate", "change_pct"]
+    data_first, data_last = conn.execute("SELECT MIN(day), MAX(day) FROM part_daily_counts;").fetchone()
+    where, ids = _id_filter("i.id", issue_ids)
+    outcomes = list(outcomes)
+    if data_first is None or not outcomes:
+        return pd.DataFrame(columns=columns)
+
+    df = pd.read_sql(
+        f"""
+        WITH actions AS (
+            SELECT i.id AS issue_id,
+                   COALESCE(date(MAX(c.changed_at)), date(i.date_reported)) AS action_day
+            FROM issues i
+            LEFT JOIN issue_changelog c
+              ON c.issue_id = i.id AND c.field_name = 'status' AND c.new_value = 'Closed'
+            WHERE i.id IN (SELECT issue_id FROM issue_defect_links) AND {where}
+            GROUP BY i.id
+        )
+        SELECT a.issue_id, a.action_day,
+               COALESCE(SUM(CASE WHEN p.day < a.action_day THEN p.n END), 0) AS before_n,
+               COALESCE(SUM(CASE WHEN p.day > a.action_day THEN p.n END), 0) AS after_n
+        FROM actions a
+        JOIN issue_defect_links l ON l.issue_id = a.issue_id
+        LEFT JOIN part_daily_counts p
+          ON p.ComponentPN = l.ComponentPN AND p.Ref_Id = l.Ref_Id AND p.LineName = l.LineName
+         AND p.day BETWEEN date(a.action_day, ?) AND date(a.action_day, ?)
+         AND p.Outcome IN ({', '.join('?' * len(outcomes))})
+        GROUP BY a.issue_id
+        ORDER BY a.issue_id
+        """,
+        conn,
+        params=[*ids, f"-{int(window_days)} days", f"+{int(window_days)} days", *outcomes],
+    )
+    action = pd.to_datetime(df["action_day"])
+    window = pd.Timedelta(days=int(window_days))
+    one = pd.Timedelta(days=1)
+    df["before_days"] = _covered_days(action - window, action - one, data_first, data_last)
+    df["after_days"] = _covered_days(action + one, action + window, data_first, data_last)
+    df["before_rate"] = df["before_n"] / df["before_days"].replace(0, np.nan)
+    df["after_rate"] = df["after_n"] / df["after_days"].replace(0, np.nan)
+    df["change_pct"] = (df["after_rate"] - df["before_rate"]) / df["before_rate"].replace(0, np.nan) * 100
+    return df[columns]
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+issue_search.py
+---------------
+Ranked full-text search over issues and their change history.
+
+Two external-content FTS5 tables index the text already stored in SQLite,
+so nothing is duplicated besides the inverted index:
+
+* ``issues_fts``    – description, what_issue, root_cause_final,
+                      long_term_action (rowid = issues.id)
+* ``changelog_fts`` – old_value, new_value (rowid = issue_changelog.id)
+
+Triggers keep both in sync with every INSERT/UPDATE/DELETE, so saves need
+no extra code; ``create_search_index`` (migration 9) builds them and
+backfills existing rows.  On SQLite builds without FTS5 the search falls
+back to ``LIKE`` over the same columns.
+"""
+from __future__ import annotations
+
+import re
+import sqlite3
+from typing import List
+
+import pandas as pd
+
+from issues_db import GRID_COLUMNS
+
+ISSUE_TEXT_COLUMNS = ["description", "what_issue", "root_cause_final", "long_term_action"]
+# bm25 column weights: a hit in the description counts most
+ISSUE_TEXT_WEIGHTS = [4.0, 2.0, 2.0, 1.0]
+# changelog hits rank below direct hits with the same bm25 score
+CHANGELOG_WEIGHT = 0.5
+
+
+def fts5_available(conn: sqlite3.Connection) -> bool:
+    return conn.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5');").fetchone()[0] == 1
+
+
+def _has_table(conn: sqlite3.Connection, name: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?;", (name,)).fetchone() is not None
+
+
+def _sync_triggers(fts: str, table: str, columns: List[str]) -> List[str]:
+    """The standard external-content triggers for *fts* over *table*."""
+    cols = ", ".join(columns)
+    new = ", ".join(f"new.{c}" for c in columns)
+    old = ", ".join(f"old.{c}" for c in columns)
+    delete = f"INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.id, {old});"
+    insert = f"INSERT INTO {fts} (rowid, {cols}) VALUES (new.id, {new});"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN {insert} END;",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN {delete} END;",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN {delete} {insert} END;",
+    ]
+
+
+def create_search_index(conn: sqlite3.Connection) -> bool:
+    """Create, backfill and wire up both FTS tables; False without FTS5."""
+    if not fts5_available(conn):
+        return False
+    with conn:
+        for fts, table, columns in (("issues_fts", "issues", ISSUE_TEXT_COLUMNS),
+                                    ("changelog_fts", "issue_changelog", ["old_value", "new_value"])):
+            conn.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                f"{', '.join(columns)}, content='{table}', content_rowid='id', tokenize='porter unicode61');"
+            )
+            for sql in _sync_triggers(fts, table, columns):
+                conn.execute(sql)
+            conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild');")
+    return True
+
+
+def fts_query(text: str) -> str:
+    """User text -> FTS5 query: every word must match, as a prefix.
+
+    Words are quoted, so operators and punctuation typed by users can never
+    produce a syntax error.
+    """
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", text))
+
+
+def search_issues(conn: sqlite3.Connection, text: str, limit: int = 50) -> pd.DataFrame:
+    """Best *limit* issues for *text*: ``GRID_COLUMNS`` + ``match`` snippet, best first."""
+    query = fts_query(text)
+    if not query:
+        return pd.DataFrame(columns=[*GRID_COLUMNS, "match"])
+    if not _has_table(conn, "issues_fts"):
+        return _search_like(conn, text, limit)
+
+    # Rank with bm25 only (LIMIT per source); snippets are built in Python
+    # for the final rows, which is far cheaper than FTS5's snippet() here
+    weights = ", ".join(str(w) for w in ISSUE_TEXT_WEIGHTS)
+    best = conn.execute(
+        f"""
+        WITH hits AS (
+            SELECT * FROM (
+                SELECT rowid AS issue_id, bm25(issues_fts, {weights}) AS score, NULL AS log_id
+                FROM issues_fts WHERE issues_fts MATCH :q ORDER BY score LIMIT :limit
+            )
+            UNION ALL
+            SELECT * FROM (
+                SELECT c.issue_id, bm25(changelog_fts) * {CHANGELOG_WEIGHT} AS score, c.id
+                FROM changelog_fts JOIN issue_changelog c ON c.id = changelog_fts.rowid
+                WHERE changelog_fts MATCH :q ORDER BY score LIMIT :limit
+            )
+        )
+        SELECT issue_id, log_id FROM (
+            SELECT issue_id, log_id, score,
+                   ROW_NUMBER() OVER (PARTITION BY issue_id ORDER BY score) AS n
+            FROM hits
+        ) WHERE n = 1 ORDER BY score LIMIT :limit
+        """,
+        {"q": query, "limit": int(limit)},
+    ).fetchall()
+    if not best:
+        return pd.DataFrame(columns=[*GRID_COLUMNS, "match"])
+
+    order = [issue_id for issue_id, _ in best]
+    text_cols = [c for c in ISSUE_TEXT_COLUMNS if c not in GRID_COLUMNS]
+    rows = pd.read_sql(
+        f"SELECT {', '.join(GRID_COLUMNS + text_cols)} FROM issues "
+        f"WHERE id IN ({', '.join('?' * len(order))})",
+        conn,
+        params=order,
+    ).set_index("id", drop=False).loc[order].reset_index(drop=True)
+
+    log_ids = [log_id for _, log_id in best if log_id is not None]
+    log_text = {issue_id: f"{field}: {old} → {new}" for issue_id, field, old, new in conn.execute(
+        f"SELECT issue_id, field_name, old_value, new_value FROM issue_changelog "
+        f"WHERE id IN ({', '.join('?' * len(log_ids))})",
+        log_ids,
+    )} if log_ids else {}
+
+    words = re.findall(r"\w+", text)
+    rows["match"] = [
+        highlight(log_text[row.id] if log_id is not None else
+                  next((t for t in (getattr(row, c) for c in ISSUE_TEXT_COLUMNS) if _matches(t, words)), ""),
+                  words)
+        for row, (_, log_id) in zip(rows.itertuples(index=False), best)
+    ]
+    return rows[[*GRID_COLUMNS, "match"]]
+
+
+def _word_pattern(words: List[str]) -> "re.Pattern[str]":
+    return re.compile(r"\b(" + "|".join(re.escape(w) for w in words) + r")\w*", re.IGNORECASE)
+
+
+def _matches(text, words: List[str]) -> bool:
+    return isinstance(text, str) and _word_pattern(words).search(text) is not None
+
+
+def highlight(text: str, words: List[str], width: int = 80) -> str:
+    """A *width*-character window of *text* around the first hit, hits in «»."""
+    if not text:
+        return ""
+    pattern = _word_pattern(words)
+    hit = pattern.search(text)
+    start = 0 if len(text) <= width else max(0, (hit.start() if hit else 0) - width // 4)
+    window = text[start:start + width]
+    out = pattern.sub(lambda m: f"«{m.group(0)}»", window)
+    return ("…" if start else "") + out + ("…" if start + width < len(text) else "")
+
+
+def _search_like(conn: sqlite3.Connection, text: str, limit: int) -> pd.DataFrame:
+    """Unranked fallback: issues whose text fields contain every word."""
+    words = re.findall(r"\w+", text)
+    haystack = " || ' ' || ".join(f"COALESCE({c}, '')" for c in ISSUE_TEXT_COLUMNS)
+    where = " AND ".join(f"({haystack}) LIKE ?" for _ in words)
+    return pd.read_sql(
+        f"SELECT {', '.join(GRID_COLUMNS)}, '' AS match FROM issues WHERE {where} "
+        "ORDER BY date_reported DESC LIMIT ?",
+        conn,
+        params=[*(f"%{w}%" for w in words), int(limit)],
+    )
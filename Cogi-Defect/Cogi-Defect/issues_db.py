@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+issues_db.py
+------------
+SQLite access for the action tracker's ``issues`` and ``issue_changelog``
+tables.
+
+The Issue List tab never loads the whole table for display: it asks
+``query_issue_page`` for one sorted, filtered page (``LIMIT``/``OFFSET``)
+plus the total row count, so rendering cost depends on the page size, not
+on how many issues have been logged.
+
+``save_issue`` writes an issue and its changelog rows in one transaction:
+the field diff is computed once and every changed field is inserted with a
+single ``executemany``, so a save is all-or-nothing and costs one commit.
+The same transaction adds the save's status transitions to
+``issue_backlog_daily`` (see issue_analytics.backlog_series) and relinks
+the issue to its defects when its part fields change (see
+issue_effectiveness.py).
+
+The tables themselves are created by migrations.py at startup.
+"""
+from __future__ import annotations
+
+import datetime as dt
+import sqlite3
+from typing import Any, Dict, List, Sequence, Tuple
+
+import pandas as pd
+
+from issue_effectiveness import LINK_FIELDS, link_issues
+
+# Columns shown in the issue grid (full rows are read by id for editing)
+GRID_COLUMNS = [
+    "id", "date_reported", "line_name", "component_pn", "ref_id",
+    "issue_category", "issue_type", "description", "status",
+    "responsible_person", "due_date",
+]
+
+# Sortable columns: label shown in the UI -> column
+SORT_COLUMNS = {
+    "Date reported": "date_reported",
+    "Due date": "due_date",
+    "Status": "status",
+    "Line": "line_name",
+    "Category": "issue_category",
+    "ID": "id",
+}
+
+
+# ---------------------------------------------------------------------------
+# Schema
+# ---------------------------------------------------------------------------
+
+def ensure_issues_table(conn: sqlite3.Connection) -> None:
+    """Create comprehensive issues tracking table"""
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS issues (
+            id                  INTEGER PRIMARY KEY AUTOINCREMENT,
+            date_reported       TEXT NOT NULL,
+            line_name           TEXT,
+            shift               TEXT,
+            serial_number       TEXT,
+            component_pn        TEXT,
+            ref_id              TEXT,
+            issue_category      TEXT,
+            issue_type          TEXT,
+            description         TEXT,
+
+            -- 5W2H Framework
+            what_issue          TEXT,
+            where_occurred      TEXT,
+            why_preliminary     TEXT,
+            when_happened       TEXT,
+            who_detected        TEXT,
+            how_detected        TEXT,
+            how_much_impact     TEXT,
+
+            -- Action tracking
+            short_term_fix      TEXT,
+            long_term_action    TEXT,
+            responsible_person  TEXT,
+            due_date           TEXT,
+            status             TEXT,
+
+            -- RCA tracking
+            rca_completed      INTEGER DEFAULT 0,
+            rca_method         TEXT,
+            root_cause_final   TEXT,
+            effectiveness_check INTEGER DEFAULT 0,
+
+            -- Rework/Scrap
+            disposition        TEXT,
+            rework_time_mins   REAL,
+            rework_cost        REAL,
+
+            -- AOI outcome counts for selected date range
+            aoi_false          INTEGER DEFAULT 0,
+            aoi_real           INTEGER DEFAULT 0,
+            aoi_fixed          INTEGER DEFAULT 0,
+            aoi_suspect        INTEGER DEFAULT 0,
+
+            -- Timestamps
+            created_at         TEXT DEFAULT CURRENT_TIMESTAMP,
+            updated_at         TEXT DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    conn.commit()
+
+    # Ensure AOI columns exist even on older DB versions
+    cur.execute("PRAGMA table_info(issues);")
+    existing_cols = {row[1] for row in cur.fetchall()}
+    for col in ["aoi_false", "aoi_real", "aoi_fixed", "aoi_suspect"]:
+        if col not in existing_cols:
+            cur.execute(f"ALTER TABLE issues ADD COLUMN {col} INTEGER DEFAULT 0;")
+    conn.commit()
+
+
+def ensure_changelog_table(conn: sqlite3.Connection) -> None:
+    """Create changelog table for tracking changes"""
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS issue_changelog (
+            id                  INTEGER PRIMARY KEY AUTOINCREMENT,
+            issue_id           INTEGER NOT NULL,
+            field_name         TEXT NOT NULL,
+            old_value          TEXT,
+            new_value          TEXT,
+            changed_by         TEXT,
+            changed_at         TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (issue_id) REFERENCES issues (id)
+        );
+    """)
+    conn.commit()
+
+
+# Status values that do not count toward the open backlog ('None' is how
+# str(None) of a missing old value was logged)
+NOT_OPEN = ("", "None", "Closed")
+
+
+def ensure_backlog_table(conn: sqlite3.Connection) -> None:
+    """Per-day count of issues entering / leaving the open backlog."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS issue_backlog_daily (
+            day     TEXT PRIMARY KEY,
+            opened  INTEGER NOT NULL DEFAULT 0,
+            closed  INTEGER NOT NULL DEFAULT 0
+        );
+    """)
+
+
+def rebuild_issue_backlog(conn: sqlite3.Connection) -> None:
+    """Recompute ``issue_backlog_daily`` from the status rows of the changelog (no commit).
+
+    A 'Created' row stands for the issue's initial status: the old value of
+    its first later status change, or its current status if it never changed.
+    """
+    ensure_backlog_table(conn)
+    not_open = ", ".join("?" * len(NOT_OPEN))
+    conn.execute("DELETE FROM issue_backlog_daily;")
+    conn.execute(
+        f"""
+        INSERT INTO issue_backlog_daily (day, opened, closed)
+        SELECT day, SUM(now_open AND NOT was_open), SUM(was_open AND NOT now_open) FROM (
+            SELECT day, old_value NOT IN ({not_open}) AS was_open, new_value NOT IN ({not_open}) AS now_open
+            FROM (
+                SELECT date(c.changed_at) AS day,
+                       COALESCE(c.old_value, '') AS old_value,
+                       CASE WHEN c.new_value = 'Created' THEN COALESCE(
+                           (SELECT n.old_value FROM issue_changelog n
+                            WHERE n.issue_id = c.issue_id AND n.field_name = 'status' AND n.id > c.id
+                            ORDER BY n.id LIMIT 1),
+                           (SELECT i.status FROM issues i WHERE i.id = c.issue_id), '')
+                       ELSE COALESCE(c.new_value, '') END AS new_value
+                FROM issue_changelog c WHERE c.field_name = 'status'
+            )
+        ) GROUP BY day;
+        """,
+        [*NOT_OPEN, *NOT_OPEN],
+    )
+
+
+# ---------------------------------------------------------------------------
+# Writes
+# ---------------------------------------------------------------------------
+
+def clean_issue(data: Dict[str, Any]) -> Dict[str, Any]:
+    """None -> '', non-numeric values -> str (what the form stores)."""
+    return {
+        key: "" if value is None else value if isinstance(value, (int, float)) else str(value)
+        for key, value in data.items()
+    }
+
+
+def issue_changes(existing: Dict[str, Any], new: Dict[str, Any]) -> List[Tuple[str, str, str]]:
+    """(field, old, new) for every field of *new* whose text differs from *existing*."""
+    return [
+        (key, str(existing[key]), str(value))
+        for key, value in new.items()
+        if key != "id" and key in existing and str(existing[key]) != str(value)
+    ]
+
+
+def backlog_delta(changes: Sequence[Tuple[str, str, str]]) -> Tuple[int, int]:
+    """(opened, closed) backlog transitions caused by *changes*."""
+    opened = closed = 0
+    for field, old, new in changes:
+        if field == "status":
+            was_open, now_open = old not in NOT_OPEN, new not in NOT_OPEN
+            opened += now_open and not was_open
+            closed += was_open and not now_open
+    return opened, closed
+
+
+class IssueConflictError(RuntimeError):
+    """The issue was changed by someone else since the editor loaded it."""
+
+
+def save_issue(conn: sqlite3.Connection, data: Dict[str, Any], changed_by: str = "System",
+               expected_version: int | None = None) -> int:
+    """Insert (no ``id``) or update an issue with its changelog, atomically.
+
+    ``BEGIN IMMEDIATE`` takes the write lock before the current row is read,
+    so concurrent editors cannot interleave between the diff and the UPDATE.
+    Every update bumps the row's ``version``; pass the version the editor
+    started from as *expected_version* to raise IssueConflictError (and
+    write nothing) instead of overwriting a newer save.
+    """
+    clean = clean_issue(data)
+    issue_id = clean.pop("id", None) or None
+    cols = list(clean)
+
+    conn.commit()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE;")
+        if issue_id:
+            cur = conn.execute("SELECT * FROM issues WHERE id = ?", (issue_id,))
+            row = cur.fetchone()
+            existing = dict(zip([d[0] for d in cur.description], row)) if row else {}
+            if expected_version is not None and existing.get("version") != expected_version:
+                raise IssueConflictError(f"Issue #{issue_id} was modified by another user")
+            clean.pop("version", None)
+            cols = list(clean)
+            changes = issue_changes(existing, clean)
+            status_changes = changes
+            set_clause = ", ".join(f"`{col}` = ?" for col in cols)
+            conn.execute(
+                f"UPDATE issues SET {set_clause}, version = version + 1, "
+                "updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                [clean[col] for col in cols] + [issue_id],
+            )
+        else:
+            col_names = ", ".join(f"`{col}`" for col in cols)
+            cur = conn.execute(
+                f"INSERT INTO issues ({col_names}) VALUES ({', '.join('?' * len(cols))})",
+                [clean[col] for col in cols],
+            )
+            issue_id = cur.lastrowid
+            existing = {}
+            changes = [("status", "", "Created")]
+            # The backlog counts the initial status, not the 'Created' marker
+            status_changes = [("status", "", clean.get("status", ""))]
+        conn.executemany(
+            "INSERT INTO issue_changelog (issue_id, field_name, old_value, new_value, changed_by) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [(issue_id, field, old, new, changed_by) for field, old, new in changes],
+        )
+        opened, closed = backlog_delta(status_changes)
+        if opened or closed:
+            conn.execute(
+                "INSERT INTO issue_backlog_daily (day, opened, closed) VALUES (date('now'), ?, ?) "
+                "ON CONFLICT(day) DO UPDATE SET opened = opened + excluded.opened, closed = closed + excluded.closed",
+                (opened, closed),
+            )
+        if not existing or any(field in LINK_FIELDS for field, _, _ in changes):
+            link_issues(conn, [issue_id])
+    return issue_id
+
+
+# ---------------------------------------------------------------------------
+# Paged reads
+# ---------------------------------------------------------------------------
+
+def issue_filters(start: dt.date, end: dt.date, statuses: Sequence[str] = (),
+                  lines: Sequence[str] = (), categories: Sequence[str] = ()) -> Tuple[str, list]:
+    """WHERE clause + parameters for the tracker's issue filters."""
+    # a half-open text range matches 'YYYY-MM-DD' and 'YYYY-MM-DD HH:MM:SS' values
+    where = ["date_reported >= ?", "date_reported < date(?, '+1 day')"]
+    params: list = [start.isoformat(), end.isoformat()]
+    for col, sel in (("status", statuses), ("line_name", lines), ("issue_category", categories)):
+        if sel:
+            where.append(f"{col} IN ({', '.join('?' * len(sel))})")
+            params.extend(sel)
+    return " AND ".join(where), params
+
+
+def count_issues(conn: sqlite3.Connection) -> int:
+    return conn.execute("SELECT COUNT(*) FROM issues").fetchone()[0]
+
+
+def issue_lines(conn: sqlite3.Connection, start: dt.date, end: dt.date) -> List[str]:
+    """Distinct line names of the issues reported in [start, end]."""
+    where, params = issue_filters(start, end)
+    return [r[0] for r in conn.execute(
+        f"SELECT DISTINCT line_name FROM issues WHERE {where} AND line_name IS NOT NULL ORDER BY 1", params
+    )]
+
+
+def read_issues(conn: sqlite3.Connection, start: dt.date, end: dt.date, statuses: Sequence[str] = (),
+                lines: Sequence[str] = (), categories: Sequence[str] = (),
+                columns: Sequence[str] = ()) -> pd.DataFrame:
+    """Issue rows matching the tracker filters, newest first (only *columns* when given)."""
+    where, params = issue_filters(start, end, statuses, lines, categories)
+    select = ", ".join(columns) or "*"
+    return pd.read_sql(f"SELECT {select} FROM issues WHERE {where} ORDER BY date_reported DESC", conn, params=params)
+
+
+def query_issue_page(conn: sqlite3.Connection, start: dt.date, end: dt.date,
+                     statuses: Sequence[str] = (), lines: Sequence[str] = (),
+                     categories: Sequence[str] = (), sort: str = "date_reported",
+                     descending: bool = True, page: int = 0,
+                     page_size: int = 50) -> Tuple[pd.DataFrame, int]:
+    """One page of issues (``GRID_COLUMNS``) and the total number of matches.
+
+    *sort* must be one of ``SORT_COLUMNS``' values; ties are broken by id so
+    pages never overlap.
+    """
+    if sort not in SORT_COLUMNS.values():
+        raise ValueError(f"Cannot sort issues by {sort!r}")
+    where, params = issue_filters(start, end, statuses, lines, categories)
+    total = conn.execute(f"SELECT COUNT(*) FROM issues WHERE {where}", params).fetchone()[0]
+
+    order = "DESC" if descending else "ASC"
+    page_df = pd.read_sql(
+        f"SELECT {', '.join(GRID_COLUMNS)} FROM issues WHERE {where} "
+        f"ORDER BY {sort} {order}, id {order} LIMIT ? OFFSET ?",
+        conn,
+        params=[*params, int(page_size), int(page) * int(page_size)],
+    )
+    return page_df, int(total)
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+migrations.py
+-------------
+Versioned schema migrations for the AOI database.
+
+``schema_version`` records every migration that has been applied.  The
+ingestion CLI, compact_db.py and the Streamlit pages call ``migrate`` once
+at startup, so table creation, column upgrades and indexes are no longer
+probed on every save, cache fill or ingested file.
+
+Migrations are idempotent (``IF NOT EXISTS`` / existence checks): a run
+that stops between a migration and its ``schema_version`` row simply
+applies it again next time.  New migrations are appended to ``MIGRATIONS``
+with the next version number; never renumber or edit a released one.
+
+Usage
+-----
+$ python migrations.py                 # migrate aoi_defects.db
+$ python migrations.py path/to/other.db
+"""
+from __future__ import annotations
+
+import sqlite3
+import sys
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+from connections import connect
+from dimensions import FACT_TABLE, migrate_legacy_table
+from issue_effectiveness import ensure_link_table, link_issues
+from ingest_jobs import ensure_jobs_table, ensure_upload_jobs
+from ingest_telemetry import ensure_content_hash_column, ensure_ingest_runs_table
+from issue_search import create_search_index
+from issues_db import ensure_changelog_table, ensure_issues_table, rebuild_issue_backlog
+from rollups import ensure_daily_tables, refresh_daily_counts
+
+
+def _has_object(conn: sqlite3.Connection, name: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?;", (name,)).fetchone() is not None
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> set:
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table});")}
+
+
+# ---------------------------------------------------------------------------
+# Migrations (version, description, function)
+# ---------------------------------------------------------------------------
+
+def _star_schema(conn: sqlite3.Connection) -> None:
+    migrate_legacy_table(conn)
+
+
+def _defect_eventdate_index(conn: sqlite3.Connection) -> None:
+    if "EventDate" in _columns(conn, FACT_TABLE):
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_defect_facts_eventdate ON {FACT_TABLE}(EventDate);")
+
+
+def _issue_tables(conn: sqlite3.Connection) -> None:
+    ensure_issues_table(conn)
+    ensure_changelog_table(conn)
+
+
+def _changelog_index(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_issue_changelog_issue ON issue_changelog(issue_id, changed_at);"
+    )
+
+
+def _daily_counts(conn: sqlite3.Connection) -> None:
+    if _has_object(conn, "defects") and not _has_object(conn, "daily_outcome_counts"):
+        refresh_daily_counts(conn)  # full backfill
+
+
+def _issue_indexes(conn: sqlite3.Connection) -> None:
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_issues_date_reported ON issues(date_reported);")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_issues_status_due ON issues(status, due_date);")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_issues_line ON issues(line_name);")
+
+
+def _issue_backlog(conn: sqlite3.Connection) -> None:
+    with conn:
+        rebuild_issue_backlog(conn)
+
+
+def _issue_version(conn: sqlite3.Connection) -> None:
+    if "version" not in _columns(conn, "issues"):
+        conn.execute("ALTER TABLE issues ADD COLUMN version INTEGER NOT NULL DEFAULT 0;")
+        conn.commit()
+
+
+def _search_index(conn: sqlite3.Connection) -> None:
+    create_search_index(conn)  # skipped on SQLite builds without FTS5
+
+
+def _issue_defect_links(conn: sqlite3.Connection) -> None:
+    with conn:
+        if _has_object(conn, "defects"):
+            refresh_daily_counts(conn)  # backfills part_daily_counts
+        else:
+            ensure_daily_tables(conn)
+        ensure_link_table(conn)
+        link_issues(conn)
+
+
+def _ingest_runs(conn: sqlite3.Connection) -> None:
+    with conn:
+        ensure_ingest_runs_table(conn)
+
+
+def _ingest_jobs(conn: sqlite3.Connection) -> None:
+    with conn:
+        ensure_jobs_table(conn)
+
+
+def _ingest_content_hash(conn: sqlite3.Connection) -> None:
+    with conn:
+        ensure_content_hash_column(conn)
+        ensure_upload_jobs(conn)
+
+
+def _relink_issues(conn: sqlite3.Connection) -> None:
+    with conn:
+        link_issues(conn)
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, "star schema for defects", _star_schema),
+    (2, "index defect_facts(EventDate)", _defect_eventdate_index),
+    (3, "issue and changelog tables", _issue_tables),
+    (4, "index issue_changelog(issue_id, changed_at)", _changelog_index),
+    (5, "daily outcome counts backfill", _daily_counts),
+    (6, "index issues(date_reported), (status, due_date), (line_name)", _issue_indexes),
+    (7, "daily open-backlog transitions", _issue_backlog),
+    (8, "issues.version for optimistic locking", _issue_version),
+    (9, "FTS5 search over issue text and changelog values", _search_index),
+    (10, "per-part daily counts and issue-defect links", _issue_defect_links),
+    (11, "ingest_runs telemetry", _ingest_runs),
+    (12, "background ingestion jobs", _ingest_jobs),
+    (13, "ingest_runs content hash and upload jobs", _ingest_content_hash),
+    (14, "issue backlog counts from initial statuses", _issue_backlog),
+    (15, "relink issues to the pins of their Ref_Id", _relink_issues),
+]
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    """Highest applied migration (0 for a database that was never migrated)."""
+    if not _has_object(conn, "schema_version"):
+        return 0
+    return conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version;").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection, verbose: bool = False) -> int:
+    """Apply every pending migration in order; returns the schema version."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version     INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at  TEXT DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    conn.commit()
+    current = schema_version(conn)
+    for version, description, apply in MIGRATIONS:
+        if version <= current:
+            continue
+        apply(conn)
+        with conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO schema_version (version, description) VALUES (?, ?);",
+                (version, description),
+            )
+        if verbose:
+            print(f"[INFO] Migration {version}: {description}")
+        current = version
+    return current
+
+
+def migrate_db(db_path: Path, verbose: bool = False) -> int:
+    with connect(db_path) as conn:
+        return migrate(conn, verbose)
+
+
+if __name__ == "__main__":
+    from ingest_to_db import DB_PATH
+
+    target = Path(sys.argv[1]) if len(sys.argv) > 1 else DB_PATH
+    print(f"[DONE] {target}: schema version {migrate_db(target, verbose=True)}")
@@ -12,7 +12,6 @@ from __future__ import annotations
 
 import datetime as dt
 import sqlite3
-from pathlib import Path
 from typing import List, Dict, Any
 
 import altair as alt
@@ -20,17 +19,37 @@ import altair as alt
 import pandas as pd
 import streamlit as st
 
+from connections import pooled
+from defect_data import (
+    DB_PATH,
+    compact_preference,
+    deduplicate_pins,
+    ensure_schema,
+    load_defect_window,
+    range_outcome_counts,
+    read_data_version,
+    slice_window,
+)
+from issue_effectiveness import DEFECT_OUTCOMES, WINDOW_DAYS, effectiveness
+from issue_analytics import backlog_series, cycle_time_percentiles, issue_kpis, issues_per_day, weekly_closure
+from issue_search import search_issues
+from issues_db import (
+    SORT_COLUMNS,
+    IssueConflictError,
+    count_issues,
+    issue_lines,
+    query_issue_page,
+    read_issues,
+    save_issue,
+)
+from parquet_snapshot import latest_event_date, snapshot_is_fresh
+from query_backend import FilterSpec, make_frame_backend
+from rollups import outcome_counts_between
+
 # ---------------------------------------------------------------------------
-# DB helpers (re-use same DB path logic as the main dashboard)
+# DB helpers (same DB_PATH and cached dataset as the main dashboard, see
+# defect_data.py)
 # ---------------------------------------------------------------------------
-SCRIPT_DIR = Path(__file__).resolve().parent
-ROOT_DIR = SCRIPT_DIR.parent  # → Cogi-Defect/
-POSSIBLE_DB_PATHS = [
-    Path.cwd() / "aoi_defects.db",
-    ROOT_DIR / "aoi_defects.db",
-    ROOT_DIR.parent / "aoi_defects.db",
-]
-DB_PATH = next((p for p in POSSIBLE_DB_PATHS if p.exists()), POSSIBLE_DB_PATHS[0])
 
 # Issue categories for dropdown
 ISSUE_CATEGORIES = [
@@ -51,20 +70,6 @@ ISSUE_TYPES = {
 
 STATUS_OPTIONS = ["Open", "In Progress", "Closed", "On Hold", "Reopened"]
 
-# In-memory caches for performance
-@st.cache_data(show_spinner=False)
-def load_defects() -> pd.DataFrame:
-    """Load AOI defects once, parse EventDate to datetime."""
-    if not DB_PATH.exists():
-        return pd.DataFrame()
-    with sqlite3.connect(DB_PATH) as conn:
-        df = pd.read_sql("SELECT * FROM defects", conn)
-    if "EventDate" in df.columns:
-        df["EventDate"] = pd.to_datetime(df["EventDate"], errors="coerce")
-        # Add ISO work week column (e.g. 2025-W27)
-        df["ISO_Week"] = df["EventDate"].dt.strftime('%G-W%V')
-    return df
-
 # ---------------------------------------------------------------------------
 # Cached slicer for AOI defects (date, machine, part filters)
 # ---------------------------------------------------------------------------
@@ -75,7 +80,7 @@ def slice_defects(df: pd.DataFrame, start: dt.date, end: dt.date,
     """Return a filtered copy of *df* based on date + optional machine / part / ISO week filters."""
     if df.empty:
         return df
-    out = df[df["EventDate"].dt.date.between(start, end)].copy()
+    out = slice_window(df, start, end)
     if enable_filters and machines:
         out = out[out["MachineName"].isin(machines)]
     if enable_filters and parts:
@@ -88,204 +93,82 @@ def slice_defects(df: pd.DataFrame, start: dt.date, end: dt.date,
 # Helper: AOI outcome counts per selected date range
 # ---------------------------------------------------------------------------
 
-def get_defect_counts(df: pd.DataFrame, start: dt.date, end: dt.date) -> dict[str, int]:
-    """Return counts of AOI outcomes within *start*→*end*."""
-    if df.empty or "Outcome" not in df.columns:
-        return {"False": 0, "Real": 0, "Fixed": 0, "Suspect": 0}
-
-    rng = filter_defects_by_range(df, start, end)
-    counts = rng["Outcome"].value_counts() if not rng.empty else pd.Series(dtype=int)
+def get_defect_counts(start: dt.date, end: dt.date) -> dict[str, int]:
+    """Return counts of AOI outcomes within *start*→*end* (prefix-sum lookup)."""
+    counts = None
+    if DB_PATH.exists():
+        with pooled(DB_PATH) as conn:
+            counts = outcome_counts_between(conn, start, end)
+    if counts is None:  # database predates the daily count table
+        counts = range_outcome_counts(DB_PATH, start, end, DATA_VERSION, compact_preference())
     return {
-        "False": int(counts.get("False", 0)),
-        "Real": int(counts.get("Real", 0)),
-        "Fixed": int(counts.get("Fixed from previously caught", 0)),
-        "Suspect": int(counts.get("Suspect", 0)),
+        "False": counts.get("False", 0),
+        "Real": counts.get("Real", 0),
+        "Fixed": counts.get("Fixed from previously caught", 0),
+        "Suspect": counts.get("Suspect", 0),
     }
 
 # Helper: filter defects to the selected date range
 def filter_defects_by_range(df: pd.DataFrame, start: dt.date, end: dt.date) -> pd.DataFrame:
-    """Return *df* limited to rows whose date column falls within *start*→*end*."""
-    if df.empty:
-        return df
+    """Return *df* limited to rows whose EventDate falls within *start*→*end*."""
+    return slice_window(df, start, end)
 
-    # Detect first plausible date column
-    date_col = None
-    for col in df.columns:
-        if "date" in col.lower() or "time" in col.lower():
-            try:
-                df[col] = pd.to_datetime(df[col], errors="coerce")
-                if pd.api.types.is_datetime64_any_dtype(df[col]):
-                    date_col = col
-                    break
-            except Exception:
-                continue
-
-    if date_col is None:
-        return df  # no date information available
-
-    return df[df[date_col].dt.date.between(start, end)].copy()
-
-def ensure_issues_table(conn: sqlite3.Connection) -> None:
-    """Create comprehensive issues tracking table"""
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS issues (
-            id                  INTEGER PRIMARY KEY AUTOINCREMENT,
-            date_reported       TEXT NOT NULL,
-            line_name           TEXT,
-            shift               TEXT,
-            serial_number       TEXT,
-            component_pn        TEXT,
-            ref_id              TEXT,
-            issue_category      TEXT,
-            issue_type          TEXT,
-            description         TEXT,
-            
-            -- 5W2H Framework
-            what_issue          TEXT,
-            where_occurred      TEXT,
-            why_preliminary     TEXT,
-            when_happened       TEXT,
-            who_detected        TEXT,
-            how_detected        TEXT,
-            how_much_impact     TEXT,
-            
-            -- Action tracking
-            short_term_fix      TEXT,
-            long_term_action    TEXT,
-            responsible_person  TEXT,
-            due_date           TEXT,
-            status             TEXT,
-            
-            -- RCA tracking
-            rca_completed      INTEGER DEFAULT 0,
-            rca_method         TEXT,
-            root_cause_final   TEXT,
-            effectiveness_check INTEGER DEFAULT 0,
-            
-            -- Rework/Scrap
-            disposition        TEXT,
-            rework_time_mins   REAL,
-            rework_cost        REAL,
-
-            -- AOI outcome counts for selected date range
-            aoi_false          INTEGER DEFAULT 0,
-            aoi_real           INTEGER DEFAULT 0,
-            aoi_fixed          INTEGER DEFAULT 0,
-            aoi_suspect        INTEGER DEFAULT 0,
-            
-            -- Timestamps
-            created_at         TEXT DEFAULT CURRENT_TIMESTAMP,
-            updated_at         TEXT DEFAULT CURRENT_TIMESTAMP
-        );
-    """)
-    conn.commit()
-
-    # Ensure AOI columns exist even on older DB versions
-    cur.execute("PRAGMA table_info(issues);")
-    existing_cols = {row[1] for row in cur.fetchall()}
-    for col in ["aoi_false", "aoi_real", "aoi_fixed", "aoi_suspect"]:
-        if col not in existing_cols:
-            cur.execute(f"ALTER TABLE issues ADD COLUMN {col} INTEGER DEFAULT 0;")
-    conn.commit()
-
-def ensure_changelog_table(conn: sqlite3.Connection) -> None:
-    """Create changelog table for tracking changes"""
-    cur = conn.cursor()
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS issue_changelog (
-            id                  INTEGER PRIMARY KEY AUTOINCREMENT,
-            issue_id           INTEGER NOT NULL,
-            field_name         TEXT NOT NULL,
-            old_value          TEXT,
-            new_value          TEXT,
-            changed_by         TEXT,
-            changed_at         TEXT DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (issue_id) REFERENCES issues (id)
-        );
-    """)
-    conn.commit()
-
-def log_change(conn: sqlite3.Connection, issue_id: int, field_name: str, old_value: str, new_value: str, changed_by: str = "System") -> None:
-    """Log a field change to the changelog"""
-    ensure_changelog_table(conn)
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO issue_changelog (issue_id, field_name, old_value, new_value, changed_by)
-        VALUES (?, ?, ?, ?, ?)
-    """, (issue_id, field_name, str(old_value), str(new_value), changed_by))
-    conn.commit()
-
-def save_issue(conn: sqlite3.Connection, data: Dict[str, Any]) -> int:
-    """Save or update issue record with changelog"""
-    ensure_issues_table(conn)
-    ensure_changelog_table(conn)
-    
-    # Clean data - remove None values and convert to strings where needed
-    clean_data = {}
-    for key, value in data.items():
-        if value is not None:
-            clean_data[key] = str(value) if not isinstance(value, (int, float)) else value
-        else:
-            clean_data[key] = ""
-    
-    if 'id' in clean_data and clean_data['id']:
-        # Update existing - track changes
-        issue_id = clean_data['id']
-        
-        # Get current values for changelog
-        cur = conn.cursor()
-        cur.execute("SELECT * FROM issues WHERE id = ?", (issue_id,))
-        existing = cur.fetchone()
-        
-        if existing:
-            # Get column names
-            columns = [description[0] for description in cur.description]
-            existing_dict = dict(zip(columns, existing))
-            
-            # Compare and log changes
-            for key, new_value in clean_data.items():
-                if key != 'id' and key in existing_dict:
-                    old_value = existing_dict[key]
-                    if str(old_value) != str(new_value):
-                        log_change(conn, issue_id, key, old_value, new_value)
-        
-        # Update the record
-        cols = [k for k in clean_data.keys() if k != 'id']
-        set_clause = ", ".join([f"`{col}` = ?" for col in cols])
-        sql = f"UPDATE issues SET {set_clause}, updated_at = CURRENT_TIMESTAMP WHERE id = ?"
-        values = [clean_data[col] for col in cols] + [issue_id]
-        conn.execute(sql, values)
-        conn.commit()
-        return issue_id
-    else:
-        # Insert new record
-        cols = [k for k in clean_data.keys() if k != 'id']
-        placeholders = ", ".join(["?"] * len(cols))
-        col_names = ", ".join([f"`{col}`" for col in cols])
-        sql = f"INSERT INTO issues ({col_names}) VALUES ({placeholders})"
-        
-        # Debug the SQL
-        print(f"SQL: {sql}")
-        print(f"Values: {[clean_data[col] for col in cols]}")
-        
-        cur = conn.execute(sql, [clean_data[col] for col in cols])
-        issue_id = cur.lastrowid
-        conn.commit()
-        
-        # Log creation
-        log_change(conn, issue_id, "status", "", "Created", "System")
-        
-        return issue_id
+@st.cache_data(show_spinner=False)
+def load_issue_summaries(start: dt.date, end: dt.date, statuses: tuple = (), lines: tuple = (),
+                         categories: tuple = ()) -> pd.DataFrame:
+    """id / description / status of the issues matching the sidebar filters (filtered in SQLite)"""
+    with pooled(DB_PATH) as conn:
+        return read_issues(conn, start, end, statuses, lines, categories, columns=("id", "description", "status"))
+
+@st.cache_data(show_spinner=False)
+def load_issue_overview(start: dt.date, end: dt.date) -> tuple[int, list[str]]:
+    """Total issue count and the line names reported in the date range"""
+    with pooled(DB_PATH) as conn:
+        return count_issues(conn), issue_lines(conn, start, end)
+
+@st.cache_data(show_spinner=False)
+def load_issue_page(start: dt.date, end: dt.date, statuses: tuple, lines: tuple, categories: tuple,
+                    sort: str, descending: bool, page: int, page_size: int) -> tuple[pd.DataFrame, int]:
+    """One page of the Issue List grid, sorted and filtered in SQLite"""
+    with pooled(DB_PATH) as conn:
+        return query_issue_page(conn, start, end, statuses, lines, categories,
+                                sort, descending, page, page_size)
+
+@st.cache_data(show_spinner=False)
+def load_issue_analytics(start: dt.date, end: dt.date, statuses: tuple, lines: tuple, categories: tuple,
+                         now: dt.datetime) -> dict:
+    """KPIs and trend series for the Issue List / Analytics tabs (see issue_analytics.py)"""
+    filters = (start, end, statuses, lines, categories)
+    with pooled(DB_PATH) as conn:
+        return {
+            "kpis": issue_kpis(conn, *filters, now=now),
+            "daily": issues_per_day(conn, *filters),
+            "weekly": weekly_closure(conn, *filters),
+            "cycle": cycle_time_percentiles(conn, *filters),
+            "backlog": backlog_series(conn, start, end),
+        }
+
+@st.cache_data(show_spinner=False)
+def load_issue_search(text: str) -> pd.DataFrame:
+    """Ranked full-text matches (see issue_search.py)"""
+    with pooled(DB_PATH) as conn:
+        return search_issues(conn, text)
 
 @st.cache_data(show_spinner=False)
-def load_issues() -> pd.DataFrame:
-    """Load all issues from database"""
-    if not DB_PATH.exists():
-        return pd.DataFrame()
-    with sqlite3.connect(DB_PATH) as conn:
-        ensure_issues_table(conn)
-        return pd.read_sql("SELECT * FROM issues ORDER BY date_reported DESC", conn)
+def load_issue_effectiveness(issue_ids: tuple, window_days: int, outcomes: tuple,
+                             data_version: int) -> pd.DataFrame:
+    """Linked defect rate before/after each issue's action day (see issue_effectiveness.py)"""
+    with pooled(DB_PATH) as conn:
+        return effectiveness(conn, issue_ids, window_days, outcomes)
+
+def clear_issue_caches() -> None:
+    """Drop cached issue reads after a save"""
+    load_issue_summaries.clear()
+    load_issue_overview.clear()
+    load_issue_page.clear()
+    load_issue_analytics.clear()
+    load_issue_search.clear()
+    load_issue_effectiveness.clear()
 
 # ---------------------------------------------------------------------------
 # Page layout
@@ -296,28 +179,40 @@ st.title("🔧 SMT Issue Tracker")
 if not DB_PATH.exists():
     st.error("Database not found. Please run the ingestion step first (see main dashboard).")
     st.stop()
+ensure_schema(DB_PATH)  # pending migrations, once per process
 
 # ---------------------------------------------------------------------------
 # Sidebar filters and controls
 # ---------------------------------------------------------------------------
 st.sidebar.header("📊 Dashboard Controls")
 
+DATA_VERSION = read_data_version(DB_PATH)
+
+def latest_defect_date() -> dt.date | None:
+    """Newest EventDate from the snapshot manifest or the EventDate index."""
+    if snapshot_is_fresh(DB_PATH, DATA_VERSION):
+        return latest_event_date(DB_PATH)
+    with pooled(DB_PATH) as conn:
+        try:
+            latest = conn.execute("SELECT MAX(EventDate) FROM defects").fetchone()[0]
+        except sqlite3.OperationalError:
+            return None
+    return pd.Timestamp(latest).date() if latest else None
+
 # Determine default ISO week (latest in data) on first load
-def latest_iso_week_dates(df: pd.DataFrame):
-    if df.empty or "ISO_Week" not in df.columns:
+def latest_iso_week_dates(latest: dt.date | None):
+    if latest is None:
         today = dt.date.today()
         start = today - dt.timedelta(days=today.weekday())
         end = start + dt.timedelta(days=6)
         return start, end
-    latest_week_str = df["ISO_Week"].max()  # e.g. "2025-W27"
-    year, week = map(int, latest_week_str.split("-W"))
-    start = dt.date.fromisocalendar(year, week, 1)  # Monday
+    start = latest - dt.timedelta(days=latest.weekday())  # ISO Monday
     end = start + dt.timedelta(days=6)
     return start, end
 
 # Set default date range only once
 if "date_default_set" not in st.session_state:
-    def_start, def_end = latest_iso_week_dates(load_defects())
+    def_start, def_end = latest_iso_week_dates(latest_defect_date())
     st.session_state.date_from_default = def_start
     st.session_state.date_to_default = def_end
     st.session_state.date_default_set = True
@@ -325,17 +220,17 @@ if "date_default_set" not in st.session_state:
 start_date = st.date_input("From", value=st.session_state.date_from_default)
 end_date = st.date_input("To", value=st.session_state.date_to_default)
 
-# Load issues data
-issues_df = load_issues()
+# Issue totals and filter options (issue rows are loaded after the sidebar filters)
+issue_total, issue_line_options = load_issue_overview(start_date, end_date)
 
 # ---------------------------------------------------------------------------
 # Universal AOI defect filters (date + sidebar machine/part)
 # ---------------------------------------------------------------------------
 
-defects_df = load_defects()
+defects_df = load_defect_window(DB_PATH, start_date, end_date, DATA_VERSION, compact_preference())
 
 # Collect sidebar machine / part filters dynamically (after date filter applied for options)
-temp_df = defects_df[defects_df["EventDate"].dt.date.between(start_date, end_date)] if not defects_df.empty else pd.DataFrame()
+temp_df = defects_df  # already limited to [start_date, end_date]
 
 machines = []
 parts = []
@@ -370,19 +265,6 @@ defects_filtered = slice_defects(defects_df, start_date, end_date, tuple(machine
 # Optional pin-level Ref_Id deduplication (C100, C100.1 → C100)
 # ---------------------------------------------------------------------------
 
-def deduplicate_pins(df: pd.DataFrame) -> pd.DataFrame:
-    if df.empty or "Ref_Id" not in df.columns:
-        return df
-    d = df.copy()
-    d["RF_Base"] = d["Ref_Id"].str.split(".").str[0]
-    cols = ["SerialNumber", "RF_Base"]
-    if "DefectCode" in d.columns:
-        cols.append("DefectCode")
-    if "EventDate" in d.columns:
-        d["_event_min"] = pd.to_datetime(d["EventDate"]).dt.floor("T")
-        cols.append("_event_min")
-    return d.drop_duplicates(cols)
-
 dedup_pins = st.sidebar.checkbox("Deduplicate pin-level Ref IDs", value=True, help="Treat C100, C100.1 as one ref toward counts")
 
 if dedup_pins:
@@ -394,15 +276,15 @@ st.session_state['defects_filtered'] = defects_filtered
 with st.sidebar:
     st.markdown("---")
     st.markdown("**Debug Info:**")
-    if not issues_df.empty:
-        st.write(f"📊 Total issues in DB: {len(issues_df)}")
-        st.write(f"🔄 Filtered issues: {len(filtered_issues) if 'filtered_issues' in locals() else 0}")
+    if issue_total:
+        st.write(f"📊 Total issues in DB: {issue_total}")
+        st.write(f"🔄 Filtered issues: {filtered_count if 'filtered_count' in locals() else 0}")
     else:
         st.write("❌ No issues found in database")
         # Try to check if database exists and has the table
         if DB_PATH.exists():
             try:
-                with sqlite3.connect(DB_PATH) as conn:
+                with pooled(DB_PATH) as conn:
                     cur = conn.cursor()
                     cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='issues';")
                     table_exists = cur.fetchone()
@@ -415,30 +297,19 @@ with st.sidebar:
             except Exception as e:
                 st.write(f"❌ Database error: {e}")
 
-if not issues_df.empty:
-    # Convert date column
-    issues_df['date_reported'] = pd.to_datetime(issues_df['date_reported']).dt.date
-
-    # Filter by date range
-    mask = issues_df['date_reported'].between(start_date, end_date)
-    filtered_issues = issues_df.loc[mask].copy()
-    
-    # Sidebar filters
-    if 'line_name' in filtered_issues.columns:
-        lines = st.sidebar.multiselect("Lines", options=sorted(filtered_issues['line_name'].dropna().unique()))
-        if lines:
-            filtered_issues = filtered_issues[filtered_issues['line_name'].isin(lines)]
-    
-    if 'issue_category' in filtered_issues.columns:
-        categories = st.sidebar.multiselect("Issue Categories", options=ISSUE_CATEGORIES)
-        if categories:
-            filtered_issues = filtered_issues[filtered_issues['issue_category'].isin(categories)]
-    
+lines, categories, status_filter = [], [], []
+if issue_total:
+    # Sidebar filters, applied in SQL together with the date range
+    lines = st.sidebar.multiselect("Lines", options=issue_line_options)
+    categories = st.sidebar.multiselect("Issue Categories", options=ISSUE_CATEGORIES)
     status_filter = st.sidebar.multiselect("Status", options=STATUS_OPTIONS)
-    if status_filter:
-        filtered_issues = filtered_issues[filtered_issues['status'].isin(status_filter)]
+
+    issue_filter_args = (start_date, end_date, tuple(status_filter), tuple(lines), tuple(categories))
+    # Overdue is relative to now; the hour keeps the cache key stable between reruns
+    analytics = load_issue_analytics(*issue_filter_args, dt.datetime.now().replace(minute=0, second=0, microsecond=0))
+    filtered_count = analytics["kpis"]["total"]  # counted in SQL, no rows loaded
 else:
-    filtered_issues = pd.DataFrame()
+    filtered_count = 0
 
 # ---------------------------------------------------------------------------
 # Main dashboard tabs
@@ -466,22 +337,20 @@ with tab1:
                 false_calls = len(ranged_defects[ranged_defects['Outcome'] == 'False'])
                 st.metric("False Calls", false_calls)
         with col4:
-            if not filtered_issues.empty:
-                st.metric("Tracked Issues", len(filtered_issues))
-            else:
-                st.metric("Tracked Issues", 0)
+            st.metric("Tracked Issues", filtered_count)
     
     # AOI Defects charts (filtered by date range)
     if not defects_df.empty:
         # Restrict to sidebar date range for component analysis
         ranged_defects = filter_defects_by_range(defects_df, start_date, end_date)
+        backend = make_frame_backend(ranged_defects)
 
         col1, col2 = st.columns(2)
 
         with col1:
             st.subheader("AOI Outcomes Distribution")
             if 'Outcome' in ranged_defects.columns:
-                outcome_counts = ranged_defects['Outcome'].value_counts()
+                outcome_counts = backend.outcome_counts()
                 if not outcome_counts.empty:
                     chart = alt.Chart(outcome_counts.reset_index()).mark_arc().encode(
                         theta=alt.Theta('count:Q'),
@@ -497,10 +366,8 @@ with tab1:
                 tab_real, tab_false = st.tabs(["Real", "False"])
 
                 # --- Top REAL defects — Altair bar chart
-                real_df = ranged_defects[ranged_defects['Outcome'] == 'Real']
-                if not real_df.empty:
-                    top_real = real_df['ComponentPN'].value_counts().head(5)
-                    real_df_chart = top_real.reset_index(name='count').rename(columns={'index':'ComponentPN'})
+                real_df_chart = backend.top_counts('ComponentPN', FilterSpec(outcomes=('Real',)), top_n=5)
+                if not real_df_chart.empty:
                     real_chart = (
                         alt.Chart(real_df_chart)
                         .mark_bar(color="#ff6b6b")
@@ -515,10 +382,8 @@ with tab1:
                         st.altair_chart(real_chart, use_container_width=True)
 
                 # --- Top FALSE calls — Altair bar chart
-                false_df = ranged_defects[ranged_defects['Outcome'] == 'False']
-                if not false_df.empty:
-                    top_false = false_df['ComponentPN'].value_counts().head(5)
-                    false_df_chart = top_false.reset_index(name='count').rename(columns={'index':'ComponentPN'})
+                false_df_chart = backend.top_counts('ComponentPN', FilterSpec(outcomes=('False',)), top_n=5)
+                if not false_df_chart.empty:
                     false_chart = (
                         alt.Chart(false_df_chart)
                         .mark_bar(color="#4ecdc4")
@@ -539,7 +404,7 @@ with tab2:
     st.subheader("➕ Report New Issue")
 
     # --- AOI outcome overview for the selected date range ---
-    defect_counts = get_defect_counts(load_defects(), start_date, end_date)
+    defect_counts = get_defect_counts(start_date, end_date)
     col_f, col_r, col_fix, col_s = st.columns(4)
     with col_f:
         st.metric("False Calls", defect_counts["False"])
@@ -656,7 +521,7 @@ with tab2:
             }
 
             # Attach AOI outcome counts for the current date range
-            defect_counts = get_defect_counts(load_defects(), start_date, end_date)
+            defect_counts = get_defect_counts(start_date, end_date)
             issue_data.update({
                 'aoi_false': defect_counts['False'],
                 'aoi_real': defect_counts['Real'],
@@ -665,26 +530,18 @@ with tab2:
             })
             
             try:
-                with sqlite3.connect(DB_PATH) as conn:
-                    # Debug: Check if table exists
-                    cur = conn.cursor()
-                    cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='issues';")
-                    table_exists = cur.fetchone()
-                    
-                    if not table_exists:
-                        st.info("Creating issues table...")
-                        ensure_issues_table(conn)
-                    
+                with pooled(DB_PATH) as conn:
                     issue_id = save_issue(conn, issue_data)
                     
                     # Verify the save worked
+                    cur = conn.cursor()
                     cur.execute("SELECT COUNT(*) FROM issues WHERE id=?", (issue_id,))
                     count = cur.fetchone()[0]
                     
                     if count > 0:
                         st.success(f"✅ Issue saved successfully with ID: {issue_id}")
                         # Clear the cache to refresh data
-                        load_issues.clear()
+                        clear_issue_caches()
                         st.balloons()
                         st.rerun()
                     else:
@@ -698,35 +555,19 @@ with tab3:
     # Issue list with editing capabilities
     st.subheader("📋 Issue Management")
     
-    if not filtered_issues.empty:
+    if issue_total:
         # Quick stats
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.metric("Filtered Issues", len(filtered_issues))
+            st.metric("Filtered Issues", filtered_count)
         with col2:
-            overdue = 0
-            if 'due_date' in filtered_issues.columns:
-                filtered_issues = filtered_issues.assign(
-                    due_date_parsed=pd.to_datetime(filtered_issues['due_date'], errors='coerce')
-                )
-                overdue = len(filtered_issues[
-                    (filtered_issues['due_date_parsed'] < pd.Timestamp.now()) & 
-                    (filtered_issues['status'].isin(['Open', 'In Progress']))
-                ])
-            st.metric("⚠️ Overdue", overdue)
+            st.metric("⚠️ Overdue", analytics["kpis"]["overdue"])
         with col3:
-            avg_resolution = "N/A"
-            if 'created_at' in filtered_issues.columns:
-                closed_issues = filtered_issues[filtered_issues['status'] == 'Closed']
-                if not closed_issues.empty:
-                    closed_issues['created_parsed'] = pd.to_datetime(closed_issues['created_at'])
-                    closed_issues['updated_parsed'] = pd.to_datetime(closed_issues['updated_at'])
-                    resolution_times = (closed_issues['updated_parsed'] - closed_issues['created_parsed']).dt.days
-                    avg_resolution = f"{resolution_times.mean():.1f} days"
-            st.metric("Avg Resolution", avg_resolution)
+            avg_days = analytics["kpis"]["avg_resolution_days"]
+            st.metric("Avg Resolution", "N/A" if avg_days is None else f"{avg_days:.1f} days")
 
         # --- AOI outcomes on the same date range ---
-        defect_counts = get_defect_counts(load_defects(), start_date, end_date)
+        defect_counts = get_defect_counts(start_date, end_date)
         col_f, col_r, col_fix, col_s = st.columns(4)
         with col_f:
             st.metric("False Calls", defect_counts["False"])
@@ -737,53 +578,74 @@ with tab3:
         with col_s:
             st.metric("Suspect", defect_counts["Suspect"])
         
-        # Display issues table
-        display_columns = [
-            'id', 'date_reported', 'line_name', 'shift', 'serial_number', 
-            'issue_category', 'issue_type', 'description', 'status', 
-            'responsible_person', 'due_date'
-        ]
-        display_columns = [col for col in display_columns if col in filtered_issues.columns]
-        
-        if display_columns:
-            # Display issues table with action buttons
-            for idx, row in filtered_issues.iterrows():
-                col1, col2, col3, col4, col5, col6 = st.columns([1, 2, 2, 2, 1, 1])
-                
-                with col1:
-                    primary_name = row.get('component_pn') or f"Issue #{row['id']}"
-                    st.write(f"**{primary_name}**  (#{row['id']})")
-                with col2:
-                    st.write(f"📅 {row['date_reported']}")
-                    st.write(f"🏭 {row.get('line_name', 'N/A')}")
-                with col3:
-                    st.write(f"📦 {row.get('component_pn', 'N/A')}")
-                    st.write(f"🔧 {row['issue_category']}")
-                with col4:
-                    st.write(f"📝 {row['description'][:50]}..." if len(str(row['description'])) > 50 else row['description'])
-                    status_color = {"Open": "🔴", "In Progress": "🟡", "Closed": "🟢", "On Hold": "⏸️", "Reopened": "🔄"}
-                    st.write(f"{status_color.get(row['status'], '⚪')} {row['status']}")
-                with col5:
-                    if st.button("✏️ Edit", key=f"edit_{row['id']}"):
-                        st.session_state.edit_issue_id = row['id']
-                        st.rerun()
-                with col6:
-                    if st.button("📜 History", key=f"history_{row['id']}"):
-                        st.session_state.view_history_id = row['id']
-                        st.rerun()
-                
-                st.markdown("---")
+        # Full-text search (all dates, ranked) or the filtered, paged list
+        search_text = st.text_input("🔍 Search issues", key="issue_search",
+                                    placeholder="Words from description, 5W2H, root cause, actions or history")
+        if search_text.strip():
+            page_df = load_issue_search(search_text.strip())
+            st.caption(f"{len(page_df)} best match(es) across all dates · clear the search to browse by filters")
+        else:
+            # Issue grid: one page at a time, sorted and filtered in SQLite
+            ctl1, ctl2, ctl3, ctl4 = st.columns([2, 1, 1, 1])
+            with ctl1:
+                sort_label = st.selectbox("Sort by", list(SORT_COLUMNS), key="issue_sort")
+            with ctl2:
+                descending = st.radio("Order", ["Descending", "Ascending"], horizontal=True,
+                                      key="issue_order") == "Descending"
+            with ctl3:
+                page_size = st.selectbox("Rows per page", [25, 50, 100, 200], index=1, key="issue_page_size")
+            # The page count comes from the page query's own total
+            page_args = (*issue_filter_args, SORT_COLUMNS[sort_label], descending)
+            page_no = int(st.session_state.get("issue_page", 1))
+            page_df, total = load_issue_page(*page_args, page_no - 1, page_size)
+            n_pages = max(1, -(-total // page_size))
+            if page_no > n_pages:  # the filters shrank the list: show its last page
+                page_no = st.session_state["issue_page"] = n_pages
+                page_df, total = load_issue_page(*page_args, page_no - 1, page_size)
+            with ctl4:
+                st.number_input("Page", min_value=1, max_value=n_pages, step=1, key="issue_page")
+            st.caption(f"Page {page_no} of {n_pages} · {total} issue(s)")
+
+        grid = st.dataframe(
+            page_df,
+            use_container_width=True,
+            hide_index=True,
+            on_select="rerun",
+            selection_mode="single-row",
+            key="issue_grid",
+            column_config={
+                "id": st.column_config.NumberColumn("ID", format="%d"),
+                "description": st.column_config.TextColumn("Description", width="large"),
+                "match": st.column_config.TextColumn("Match", width="large"),
+            },
+        )
+        selected_rows = [r for r in grid.selection.rows if r < len(page_df)]
+        selected_id = int(page_df.iloc[selected_rows[0]]["id"]) if selected_rows else None
+
+        act1, act2, _ = st.columns([1, 1, 4])
+        with act1:
+            if st.button("✏️ Edit", key="edit_selected", disabled=selected_id is None):
+                st.session_state.edit_issue_id = selected_id
+                st.rerun()
+        with act2:
+            if st.button("📜 History", key="history_selected", disabled=selected_id is None):
+                st.session_state.view_history_id = selected_id
+                st.rerun()
+        if selected_id is None:
+            st.caption("Select a row to edit it or view its history.")
          
         # Interactive Edit Form
         if 'edit_issue_id' in st.session_state and st.session_state.edit_issue_id:
              edit_issue_id = st.session_state.edit_issue_id
-             edit_issue = filtered_issues[filtered_issues['id'] == edit_issue_id].iloc[0]
-             
              st.markdown("### ✏️ Edit Issue")
              
              # Get full issue data from database
-             with sqlite3.connect(DB_PATH) as conn:
+             with pooled(DB_PATH) as conn:
                  full_issue = pd.read_sql("SELECT * FROM issues WHERE id = ?", conn, params=(edit_issue_id,)).iloc[0]
+             # Version the edit started from; a newer save by someone else is
+             # reported instead of overwritten (see issues_db.save_issue)
+             if st.session_state.get('edit_issue_version', (None, None))[0] != edit_issue_id:
+                 st.session_state.edit_issue_version = (edit_issue_id, int(full_issue['version']))
              
              with st.form(f"edit_issue_form_{edit_issue_id}", clear_on_submit=False):
                  col1, col2, col3 = st.columns(3)
@@ -892,17 +754,25 @@ with tab3:
                      }
                      
                      try:
-                         with sqlite3.connect(DB_PATH) as conn:
-                             save_issue(conn, update_data)
+                         with pooled(DB_PATH) as conn:
+                             save_issue(conn, update_data,
+                                        expected_version=st.session_state.edit_issue_version[1])
                              st.success("✅ Issue updated successfully!")
-                             load_issues.clear()
+                             clear_issue_caches()
                              del st.session_state.edit_issue_id
+                             del st.session_state.edit_issue_version
                              st.rerun()
+                     except IssueConflictError:
+                         st.warning("⚠️ Someone else saved this issue while you were editing. "
+                                    "The form now shows their version – please re-apply your changes.")
+                         del st.session_state.edit_issue_version
+                         clear_issue_caches()
                      except Exception as e:
                          st.error(f"Error updating issue: {str(e)}")
                  
                  if cancel_edit:
                      del st.session_state.edit_issue_id
+                     st.session_state.pop('edit_issue_version', None)
                      st.rerun()
 
         # ---------------- Issue History Modal ----------------
@@ -910,8 +780,7 @@ with tab3:
             hist_id = st.session_state.view_history_id
             st.markdown(f"### 📜 Change History for Issue #{hist_id}")
 
-            with sqlite3.connect(DB_PATH) as conn:
-                ensure_changelog_table(conn)
+            with pooled(DB_PATH) as conn:
                 hist_df = pd.read_sql(
                     "SELECT field_name AS field, old_value AS old, new_value AS new, changed_by AS user, changed_at AS time "
                     "FROM issue_changelog WHERE issue_id = ? ORDER BY changed_at DESC",
@@ -934,46 +803,84 @@ with tab4:
     # Analytics and trends
     st.subheader("📊 Trend Analysis")
     
-    if not filtered_issues.empty and len(filtered_issues) > 1:
+    if filtered_count > 1:
         # Issues over time
-        if 'date_reported' in filtered_issues.columns:
-            st.subheader("Issues Over Time")
-            daily_issues = filtered_issues.groupby('date_reported').size().reset_index(name='count')
-            daily_issues['date_reported'] = pd.to_datetime(daily_issues['date_reported'])
-            
-            chart = alt.Chart(daily_issues).mark_line(point=True).encode(
-                x=alt.X('date_reported:T', title='Date'),
-                y=alt.Y('count:Q', title='Number of Issues'),
-                tooltip=['date_reported:T', 'count:Q']
-            )
-            st.altair_chart(chart, use_container_width=True)
+        st.subheader("Issues Over Time")
+        chart = alt.Chart(analytics["daily"]).mark_line(point=True).encode(
+            x=alt.X('date_reported:T', title='Date'),
+            y=alt.Y('count:Q', title='Number of Issues'),
+            tooltip=['date_reported:T', 'count:Q']
+        )
+        st.altair_chart(chart, use_container_width=True)
         
         # Closure rate trend
-        if 'status' in filtered_issues.columns:
-            st.subheader("Weekly Closure Rate")
-            filtered_issues['week'] = pd.to_datetime(filtered_issues['date_reported']).dt.to_period('W')
-            weekly_stats = filtered_issues.groupby('week').agg({
-                'status': ['count', lambda x: (x == 'Closed').sum()]
-            }).round(2)
-            weekly_stats.columns = ['total', 'closed']
-            weekly_stats['closure_rate'] = (weekly_stats['closed'] / weekly_stats['total'] * 100).fillna(0)
-            weekly_stats = weekly_stats.reset_index()
-            weekly_stats['week_str'] = weekly_stats['week'].astype(str)
-            
-            chart = alt.Chart(weekly_stats).mark_bar().encode(
-                x=alt.X('week_str:N', title='Week'),
-                y=alt.Y('closure_rate:Q', title='Closure Rate (%)', scale=alt.Scale(domain=[0, 100])),
-                color=alt.condition(
-                    alt.datum.closure_rate >= 80,
-                    alt.value('#28a745'),  # Green for good performance
-                    alt.value('#dc3545')   # Red for poor performance
-                ),
-                tooltip=['week_str', 'closure_rate', 'total', 'closed']
-            )
-            st.altair_chart(chart, use_container_width=True)
+        st.subheader("Weekly Closure Rate")
+        chart = alt.Chart(analytics["weekly"]).mark_bar().encode(
+            x=alt.X('week_str:N', title='Week'),
+            y=alt.Y('closure_rate:Q', title='Closure Rate (%)', scale=alt.Scale(domain=[0, 100])),
+            color=alt.condition(
+                alt.datum.closure_rate >= 80,
+                alt.value('#28a745'),  # Green for good performance
+                alt.value('#dc3545')   # Red for poor performance
+            ),
+            tooltip=['week_str', 'closure_rate', 'total', 'closed']
+        )
+        st.altair_chart(chart, use_container_width=True)
+
+        # Cycle time: created -> closed (from the changelog)
+        st.subheader("Cycle Time (days to close)")
+        cycle = analytics["cycle"]
+        if cycle:
+            for col, (label, days) in zip(st.columns(len(cycle)), cycle.items()):
+                col.metric(label.upper(), f"{days:.1f}")
+        else:
+            st.caption("No closed issues in the selection yet.")
     else:
         st.info("Need more data points for trend analysis.")
 
+    # Open backlog (all lines/categories) for the selected dates
+    backlog = analytics["backlog"] if issue_total else pd.DataFrame()
+    if not backlog.empty:
+        st.subheader("Open Backlog")
+        chart = alt.Chart(backlog).mark_line(point=True, interpolate='step-after').encode(
+            x=alt.X('day:T', title='Date'),
+            y=alt.Y('backlog:Q', title='Open Issues'),
+            tooltip=['day:T', 'backlog:Q', 'opened:Q', 'closed:Q']
+        )
+        st.altair_chart(chart, use_container_width=True)
+
+    # Measured effect of each action on the defects it is linked to
+    # (component PN + ref + line), from the per-part daily counts
+    if filtered_count:
+        st.subheader("Corrective Action Effectiveness")
+        col_w, col_o = st.columns(2)
+        with col_w:
+            window_days = st.slider("Window before/after action (days)", 3, 60, WINDOW_DAYS, key="effect_window")
+        with col_o:
+            effect_outcomes = st.multiselect("Count outcomes", ["Real", "Fixed from previously caught", "Suspect", "False"],
+                                             default=list(DEFECT_OUTCOMES), key="effect_outcomes")
+        issue_summaries = load_issue_summaries(*issue_filter_args)
+        effect = load_issue_effectiveness(tuple(int(i) for i in issue_summaries["id"]), window_days,
+                                          tuple(effect_outcomes), DATA_VERSION)
+        if effect.empty:
+            st.caption("No issue in the selection matches AOI defects by component PN, reference and line.")
+        else:
+            effect = issue_summaries.merge(
+                effect, left_on="id", right_on="issue_id").drop(columns="issue_id")
+            improved = int((effect["change_pct"] < 0).sum())
+            st.caption(f"{len(effect)} linked issue(s); defect rate down after the action for {improved}. "
+                       "The action day is the closing day (report day for open issues).")
+            st.dataframe(
+                effect,
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    "before_rate": st.column_config.NumberColumn("Before (/day)", format="%.2f"),
+                    "after_rate": st.column_config.NumberColumn("After (/day)", format="%.2f"),
+                    "change_pct": st.column_config.NumberColumn("Change", format="%+.0f%%"),
+                },
+            )
+
 # ---------------------------------------------------------------------------
 # Footer with quick actions
 # ---------------------------------------------------------------------------
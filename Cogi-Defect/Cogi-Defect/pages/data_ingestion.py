@@ -2,24 +2,33 @@
 """
 📥 Data Ingestion
 =================
-Standalone page that lets the user ingest new AOI Excel exports into the
+Standalone page that lets the user ingest new AOI exports (Excel or CSV) into the
 SQLite database.  Uses the existing helper functions from *ingest_to_db.py*
 so no business logic is duplicated.
+
+Ingestion runs as a background job (see ingest_jobs.py): the page only
+queues it and polls its progress, so it stays usable, and the job keeps
+going across reruns, refreshes and closed tabs.  Uploaded files are parsed
+straight from memory (nothing is written to disk) and, unless unticked,
+files whose content was ingested before are skipped.
 """
 from __future__ import annotations
 
-import io
 from pathlib import Path
-import sqlite3
 
+import altair as alt
 import pandas as pd
 import streamlit as st
 
-from ingest_to_db import find_xlsx_files, process_file, ensure_table, upsert_df
+from connections import pooled
+from defect_data import DB_PATH, clear_defect_caches, ensure_schema
+from ingest_jobs import ACTIVE, JobRunner
+from ingest_telemetry import INGEST_STAGES, read_ingest_runs
+from ingest_to_db import find_export_files
 
-SCRIPT_DIR = Path(__file__).resolve().parent
-ROOT_DIR = SCRIPT_DIR.parent
-DB_PATH = ROOT_DIR / "aoi_defects.db"
+HISTORY_FILES = 500
+STAGE_COLUMNS = [f"{stage}_s" for stage in INGEST_STAGES]
+JOB_POLL_S = 2
 
 st.set_page_config(page_title="Data Ingestion", layout="wide")
 st.title("📥 AOI Data Ingestion")
@@ -27,59 +36,138 @@ st.title("📥 AOI Data Ingestion")
 if not DB_PATH.exists():
     st.error("Database not found – create or import one first.")
     st.stop()
+ensure_schema(DB_PATH)  # pending migrations, once per process
+
+
+@st.cache_resource(show_spinner=False)
+def job_runner(db_path) -> JobRunner:
+    """One ingestion process pool per server, shared by every session."""
+    return JobRunner(db_path)
+
+
+runner = job_runner(DB_PATH)
 
 # ---------------------------------------------------------------------------
-# 1. Upload new Excel files (optional)
+# 1. Upload new export files (optional)
 # ---------------------------------------------------------------------------
 
-st.header("Upload Excel files")
-uploaded_files = st.file_uploader("Select one or more Excel files (.xlsx)", 
-                                 type=["xlsx"], accept_multiple_files=True)
+st.header("Upload export files")
+uploaded_files = st.file_uploader("Select one or more exports (.xlsx, .csv, .tsv)",
+                                 type=["xlsx", "csv", "tsv"], accept_multiple_files=True)
 
-uploaded_paths = []
 if uploaded_files:
-    temp_dir = ROOT_DIR / "uploads"
-    temp_dir.mkdir(exist_ok=True)
-    for up_file in uploaded_files:
-        temp_path = temp_dir / up_file.name
-        with open(temp_path, "wb") as f:
-            f.write(up_file.getvalue())
-        uploaded_paths.append(temp_path)
-    st.success(f"Uploaded {len(uploaded_files)} file(s) to {temp_dir}.")
+    st.success(f"Uploaded {len(uploaded_files)} file(s) – they are ingested straight from memory.")
 
 # ---------------------------------------------------------------------------
-# 2. Existing Excel files in project folder
+# 2. Existing export files in project folder
 # ---------------------------------------------------------------------------
 
-st.header("Existing Excel exports found on disk")
-existing_files = find_xlsx_files()
-all_files = existing_files + uploaded_paths
+st.header("Existing exports found on disk")
+existing_files = find_export_files()
+sources = {f.name: f for f in existing_files}
+sources.update({f"{up.name} (upload)": up for up in uploaded_files or []})
 
-if all_files:
-    file_names = [f.name for f in all_files]
-    selected = st.multiselect("Select Excel files to ingest", options=file_names, default=file_names)
+if sources:
+    file_names = list(sources)
+    selected = st.multiselect("Select export files to ingest", options=file_names, default=file_names)
+    skip_duplicates = st.checkbox("Skip files already ingested (same content)", value=True,
+                                  key="skip_duplicates")
 
     if selected and st.button("🚀 Run Ingestion", type="primary"):
-        sel_paths = [p for p in all_files if p.name in selected]
-        progress = st.progress(0.0)
-        status = st.empty()
-
-        with sqlite3.connect(DB_PATH) as conn:
-            total = len(sel_paths)
-            for idx, path in enumerate(sel_paths, start=1):
-                status.info(f"Processing {path.name} ({idx}/{total})…")
-                df_new = process_file(path)
-                ensure_table(conn, df_new)
-                upsert_df(conn, df_new)
-                progress.progress(idx/total)
-
-        status.success("✅ Ingestion complete. Database updated.")
-        # Clear cached defects in whichever module defines load_defects
-        try:
-            from pages.action_tracker import load_defects  # running via Streamlit page package
-        except ModuleNotFoundError:
-            from action_tracker import load_defects  # fallback when module is top-level
-        load_defects.clear()
-        st.balloons()
+        chosen = [sources[name] for name in selected]
+        sel_paths = [src for src in chosen if isinstance(src, Path)]
+        sel_uploads = [src for src in chosen if not isinstance(src, Path)]
+        jobs = []
+        if sel_paths:
+            jobs.append((runner.submit(sel_paths, skip_duplicates), len(sel_paths)))
+        if sel_uploads:
+            jobs.append((runner.submit_uploads(sel_uploads, skip_duplicates), len(sel_uploads)))
+        for job_id, n_files in jobs:
+            st.success(f"Ingestion job #{job_id} queued ({n_files} file(s)) – "
+                       "progress below; you can keep using the dashboard.")
+else:
+    st.info("No export files found. Upload new files above or copy them into the project directory.") 
+
+# ---------------------------------------------------------------------------
+# 3. Background jobs (polled)
+# ---------------------------------------------------------------------------
+
+st.header("Ingestion jobs")
+
+
+def render_jobs() -> None:
+    jobs = runner.jobs()
+    if jobs.empty:
+        st.info("No ingestion jobs yet.")
+        return
+    # A job that finished since the last poll published a new data version:
+    # drop the old cached copies now instead of waiting for eviction
+    finished = set(jobs.loc[jobs["status"] == "done", "id"])
+    if finished - st.session_state.setdefault("jobs_finished", finished):
+        clear_defect_caches()
+    st.session_state.jobs_finished = finished
+
+    for job in jobs[jobs["status"].isin(ACTIVE)].itertuples():
+        processed = job.done_files + job.failed_files + job.skipped_files
+        label = (f"Job #{job.id} – {job.status}: {processed}/{job.total_files} file(s)"
+                 + (f", last {job.current_file}" if job.current_file else ""))
+        col_bar, col_cancel = st.columns([5, 1])
+        col_bar.progress(processed / max(job.total_files, 1), text=label)
+        if job.cancel_requested:
+            col_cancel.caption("Cancelling after this file…")
+        elif col_cancel.button("Cancel", key=f"cancel_job_{job.id}"):
+            runner.cancel(job.id)
+            st.rerun()
+
+    done = jobs[~jobs["status"].isin(ACTIVE)]
+    if not done.empty:
+        st.dataframe(done[["id", "status", "created_at", "finished_at", "total_files", "done_files",
+                           "failed_files", "skipped_files", "data_version", "message"]],
+                     hide_index=True, use_container_width=True)
+
+
+if hasattr(st, "fragment"):  # poll without rerunning the whole page
+    render_jobs = st.fragment(run_every=JOB_POLL_S)(render_jobs)
+render_jobs()
+
+# ---------------------------------------------------------------------------
+# 4. Ingestion history (ingest_runs)
+# ---------------------------------------------------------------------------
+
+st.header("Ingestion history")
+with pooled(DB_PATH) as conn:
+    runs = read_ingest_runs(conn, limit=HISTORY_FILES)
+
+if runs.empty:
+    st.info("No ingestion recorded yet – timings appear here after the next run.")
 else:
-    st.info("No Excel files found. Upload new files above or copy them into the project directory.") 
\ No newline at end of file
+    runs["run_started"] = pd.to_datetime(runs["run_started"])
+    runs["flag"] = runs["slow"].map({True: "Slow", False: "Normal"})
+    points = (
+        alt.Chart(runs)
+        .mark_circle(size=60)
+        .encode(
+            x=alt.X("run_started:T", title="Ingested"),
+            y=alt.Y("rows_per_s:Q", title="Raw rows / s"),
+            color=alt.Color("flag:N", scale=alt.Scale(domain=["Normal", "Slow"], range=["#5E8BFF", "#E4572E"]),
+                            title=None),
+            tooltip=["file", "raw_rows", "rows", "total_s", "rows_per_s", "typical_rows_per_s", *STAGE_COLUMNS],
+        )
+    )
+    typical = alt.Chart(runs).mark_line(color="#999999", strokeDash=[4, 4]).encode(
+        x="run_started:T", y="typical_rows_per_s:Q")
+    st.altair_chart(points + typical, use_container_width=True)
+    st.caption("Dashed line: median throughput of the files before each one; "
+               "red points ran at less than half of it.")
+
+    slow = runs[runs["slow"]]
+    if not slow.empty:
+        st.warning(f"{len(slow)} slow file(s) in the last {len(runs)} ingested")
+        st.dataframe(slow[["run_started", "file", "raw_rows", "total_s", "rows_per_s", "typical_rows_per_s",
+                           *STAGE_COLUMNS]]
+                     .sort_values("run_started", ascending=False),
+                     hide_index=True, use_container_width=True)
+    with st.expander("Stage timings per file"):
+        st.dataframe(runs[["run_started", "file", "raw_rows", "rows", *STAGE_COLUMNS, "total_s", "rows_per_s"]]
+                     .sort_values("run_started", ascending=False),
+                     hide_index=True, use_container_width=True)
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+parquet_snapshot.py
+-------------------
+Columnar copy of the *defects* table for fast dashboard cold starts.
+
+After every ingestion run the defects are written as compressed, typed,
+dictionary-encoded Parquet files partitioned by month next to the SQLite
+database:
+
+    aoi_defects_parquet/
+        _snapshot.json          {"data_version": 7, ...}
+        month=2025-07/part-0.parquet
+        month=none/part-0.parquet   (rows without a parseable EventDate)
+
+The snapshot is only trusted when the ``data_version`` stored in
+``_snapshot.json`` matches the one in the database; otherwise callers fall
+back to SQLite.  The manifest also records rows and min/max EventDate per
+partition, so date-window reads open only the month files that overlap the
+window (partition pruning) and "latest date" lookups need no data scan.
+
+Rows moved out of SQLite by the retention job (compact_db.py) live in a
+sibling ``aoi_defects_archive/month=YYYY-MM/`` tree with the same schema;
+date-window reads pick those files up too, so drill-down into archived
+periods keeps working.
+
+pyarrow is optional – without it every helper reports the snapshot as
+unavailable.
+"""
+from __future__ import annotations
+
+import datetime as dt
+import json
+import os
+import shutil
+import sqlite3
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+import pandas as pd
+
+from dimensions import DIMENSIONS, as_categoricals
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+DATE_COLUMN = "EventDate"
+COUNT_COLUMNS = ["False call", "Overridden", "Reworkable"]
+PARTITION_FIELD = "month"
+NULL_PARTITION = "none"
+MANIFEST_NAME = "_snapshot.json"
+
+
+def snapshot_dir(db_path: Path) -> Path:
+    """Return the snapshot directory that belongs to *db_path*."""
+    db_path = Path(db_path)
+    return db_path.with_name(f"{db_path.stem}_parquet")
+
+
+def archive_dir(db_path: Path) -> Path:
+    """Return the cold archive directory that belongs to *db_path*."""
+    db_path = Path(db_path)
+    return db_path.with_name(f"{db_path.stem}_archive")
+
+
+def is_datetime_column(name: str) -> bool:
+    """Same rule the dashboard uses to decide which columns hold timestamps."""
+    return any(substr in name.lower() for substr in ["date", "time"])
+
+
+def months_of(df: pd.DataFrame) -> Set[str]:
+    """Return the month partitions ("YYYY-MM" / "none") touched by *df*."""
+    if df.empty or DATE_COLUMN not in df.columns:
+        return set()
+    ts = pd.to_datetime(df[DATE_COLUMN], errors="coerce")
+    months = set(ts.dropna().dt.strftime("%Y-%m").unique())
+    if ts.isna().any():
+        months.add(NULL_PARTITION)
+    return months
+
+
+# ---------------------------------------------------------------------------
+# Manifest
+# ---------------------------------------------------------------------------
+
+def read_manifest(db_path: Path) -> Dict:
+    """Return the parsed manifest, or {} if missing/corrupt."""
+    manifest = snapshot_dir(db_path) / MANIFEST_NAME
+    if not manifest.exists():
+        return {}
+    try:
+        return json.loads(manifest.read_text())
+    except ValueError:
+        return {}
+
+
+def snapshot_version(db_path: Path) -> Optional[int]:
+    """Data version the snapshot was built from, or None if there is none."""
+    try:
+        return int(read_manifest(db_path)["data_version"])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def snapshot_is_fresh(db_path: Path, data_version: int) -> bool:
+    """True when a usable snapshot exists for exactly *data_version*."""
+    return PYARROW_AVAILABLE and snapshot_version(db_path) == data_version
+
+
+# ---------------------------------------------------------------------------
+# Writing
+# ---------------------------------------------------------------------------
+
+def _arrow_schema(conn: sqlite3.Connection) -> "pa.Schema":
+    """Build one typed schema for all partitions from the SQLite declaration."""
+    fields = []
+    for _, name, decl, *_ in conn.execute("PRAGMA table_info(defects);"):
+        if is_datetime_column(name):
+            typ = pa.timestamp("ns")
+        elif name in COUNT_COLUMNS:
+            typ = pa.int32()
+        elif (decl or "").upper() == "REAL":
+            typ = pa.float64()
+        else:
+            typ = pa.string()
+        fields.append(pa.field(name, typ))
+    return pa.schema(fields)
+
+
+def _month_bounds(month: str) -> tuple[str, str]:
+    start = dt.date.fromisoformat(f"{month}-01")
+    end = (start + dt.timedelta(days=32)).replace(day=1)
+    return start.isoformat(), end.isoformat()
+
+
+def _read_month(conn: sqlite3.Connection, month: str) -> pd.DataFrame:
+    if month == NULL_PARTITION:
+        sql = f"SELECT * FROM defects WHERE date(`{DATE_COLUMN}`) IS NULL"
+        return pd.read_sql(sql, conn)
+    lo, hi = _month_bounds(month)
+    sql = f"SELECT * FROM defects WHERE `{DATE_COLUMN}` >= ? AND `{DATE_COLUMN}` < ?"
+    return pd.read_sql(sql, conn, params=(lo, hi))
+
+
+def _all_months(conn: sqlite3.Connection) -> Set[str]:
+    rows = conn.execute(
+        f"SELECT DISTINCT COALESCE(strftime('%Y-%m', `{DATE_COLUMN}`), ?) FROM defects",
+        (NULL_PARTITION,),
+    ).fetchall()
+    return {r[0] for r in rows}
+
+
+def _write_partition(target: Path, df: pd.DataFrame, schema: "pa.Schema") -> Optional[Dict]:
+    """Write one month file; return its manifest stats (None if now empty)."""
+    part_dir = target.parent
+    if df.empty:
+        shutil.rmtree(part_dir, ignore_errors=True)
+        return None
+    for col in df.columns:
+        if is_datetime_column(col):
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+        elif col in COUNT_COLUMNS:
+            df[col] = df[col].fillna(0).astype("int32")
+    table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+    part_dir.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_suffix(".tmp")
+    pq.write_table(table, tmp, compression="zstd", use_dictionary=True)
+    os.replace(tmp, target)
+
+    stats = {"rows": len(df)}
+    if DATE_COLUMN in df.columns and df[DATE_COLUMN].notna().any():
+        stats["min"] = df[DATE_COLUMN].min().isoformat()
+        stats["max"] = df[DATE_COLUMN].max().isoformat()
+    return stats
+
+
+def write_snapshot(conn: sqlite3.Connection, db_path: Path, data_version: int,
+                   months: Optional[Iterable[str]] = None) -> Path:
+    """Write (or refresh) the Parquet snapshot of *conn*'s defects table.
+
+    With *months* only those partitions are rewritten; otherwise the whole
+    snapshot is rebuilt.  The manifest is written last, so an interrupted run
+    leaves a stale – and therefore ignored – snapshot behind.
+    """
+    if not PYARROW_AVAILABLE:
+        raise RuntimeError("pyarrow is required to write the Parquet snapshot")
+
+    out = snapshot_dir(db_path)
+    out.mkdir(exist_ok=True)
+    schema = _arrow_schema(conn)
+
+    previous = read_manifest(db_path)
+    if "partitions" not in previous:
+        months = None  # no per-partition stats to update – rebuild everything
+
+    if months is None:
+        partitions: Dict[str, Dict] = {}
+        months = _all_months(conn)
+        keep = {f"{PARTITION_FIELD}={m}" for m in months}
+        for old in out.glob(f"{PARTITION_FIELD}=*"):
+            if old.name not in keep:
+                shutil.rmtree(old, ignore_errors=True)
+    else:
+        partitions = dict(previous["partitions"])
+
+    for month in sorted(months):
+        target = out / f"{PARTITION_FIELD}={month}" / "part-0.parquet"
+        stats = _write_partition(target, _read_month(conn, month), schema)
+        if stats is None:
+            partitions.pop(month, None)
+        else:
+            partitions[month] = stats
+
+    manifest = {
+        "data_version": data_version,
+        "written_at": dt.datetime.now().isoformat(timespec="seconds"),
+        "partitions": dict(sorted(partitions.items())),
+    }
+    (out / MANIFEST_NAME).write_text(json.dumps(manifest))
+    return out
+
+
+def write_archive(conn: sqlite3.Connection, db_path: Path, month: str,
+                  df: pd.DataFrame, tag: str) -> Path:
+    """Append *df* (rows of *month*) to the cold archive as ``part-<tag>``.
+
+    Re-running with the same *tag* overwrites the file instead of adding a
+    duplicate, which makes an interrupted compaction safe to retry.
+    """
+    if not PYARROW_AVAILABLE:
+        raise RuntimeError("pyarrow is required to write the Parquet archive")
+    target = archive_dir(db_path) / f"{PARTITION_FIELD}={month}" / f"part-{tag}.parquet"
+    _write_partition(target, df.copy(), _arrow_schema(conn))
+    return target
+
+
+# ---------------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------------
+
+def window_months(start: dt.date, end: dt.date) -> List[str]:
+    """Month partition names overlapping the inclusive [start, end] window."""
+    months, cur = [], dt.date(start.year, start.month, 1)
+    while cur <= end:
+        months.append(cur.strftime("%Y-%m"))
+        cur = (cur + dt.timedelta(days=32)).replace(day=1)
+    return months
+
+
+def partition_files(db_path: Path, start: dt.date | None = None,
+                    end: dt.date | None = None) -> List[Path]:
+    """Parquet files to open for a date window – every file when unbounded.
+
+    Only partitions listed in the manifest are considered.
+    """
+    out = snapshot_dir(db_path)
+    months = list(read_manifest(db_path).get("partitions", {}))
+    if start is not None and end is not None:
+        wanted = set(window_months(start, end))
+        months = [m for m in months if m in wanted]
+    return [out / f"{PARTITION_FIELD}={m}" / "part-0.parquet" for m in months]
+
+
+def archive_files(db_path: Path, start: dt.date | None = None,
+                  end: dt.date | None = None) -> List[Path]:
+    """Archived Parquet files overlapping the window (all when unbounded)."""
+    root = archive_dir(db_path)
+    if not root.exists():
+        return []
+    files = sorted(root.glob(f"{PARTITION_FIELD}=*/*.parquet"))
+    if start is not None and end is not None:
+        wanted = {f"{PARTITION_FIELD}={m}" for m in window_months(start, end)}
+        files = [f for f in files if f.parent.name in wanted]
+    return files
+
+
+def latest_event_date(db_path: Path) -> Optional[dt.date]:
+    """Newest EventDate recorded in the manifest, without reading any data."""
+    maxima = [p["max"] for p in read_manifest(db_path).get("partitions", {}).values() if "max" in p]
+    return pd.Timestamp(max(maxima)).date() if maxima else None
+
+
+def read_parquet_window(files: List[Path], start: dt.date | None = None,
+                        end: dt.date | None = None) -> pd.DataFrame:
+    """Read *files*, pushing the optional EventDate window down to row groups."""
+    if not files:
+        return pd.DataFrame()
+    filters = None
+    if start is not None and end is not None:
+        lo = pd.Timestamp(start)
+        hi = pd.Timestamp(end) + pd.Timedelta(days=1)
+        filters = [(DATE_COLUMN, ">=", lo), (DATE_COLUMN, "<", hi)]
+    # Dimension columns come back as Categoricals straight from the Parquet dictionaries
+    tables = [pq.read_table(f, filters=filters, read_dictionary=list(DIMENSIONS)) for f in files]
+    # Archive parts written before a column was added have a narrower schema
+    return as_categoricals(pa.concat_tables(tables, promote_options="default").to_pandas())
+
+
+def read_snapshot(db_path: Path, start: dt.date | None = None,
+                  end: dt.date | None = None) -> pd.DataFrame:
+    """Load the snapshot, limited to an optional inclusive [start, end] window.
+
+    Months outside the window are pruned before any file is opened; inside
+    the remaining files the EventDate predicate is pushed down to Parquet
+    row-group statistics.  Windowed reads also include archived months
+    (slower, but transparent); unbounded reads return the hot data only.
+    """
+    files = partition_files(db_path, start, end)
+    if start is not None and end is not None:
+        files += archive_files(db_path, start, end)
+    return read_parquet_window(files, start, end)
+
+
+def read_months(db_path: Path, start: dt.date | None = None, end: dt.date | None = None) -> pd.DataFrame:
+    """Whole hot partitions of the months overlapping [start, end] (all when unbounded).
+
+    Unlike ``read_snapshot`` no rows are filtered out and the archive is not
+    read, so the frame can back any window inside those months.
+    """
+    return read_parquet_window(partition_files(db_path, start, end))
+
+
+def read_archive(db_path: Path, start: dt.date, end: dt.date) -> pd.DataFrame:
+    """Archived rows inside the window – for callers reading hot data from SQLite."""
+    return read_parquet_window(archive_files(db_path, start, end), start, end)
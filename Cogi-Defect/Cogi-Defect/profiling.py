@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+profiling.py
+------------
+Opt-in timing of the dashboard's hot paths for a single rerun.
+
+* ``stage(name)``        – context manager timing a block;
+* ``timed(name)``        – the same as a decorator (section renderers);
+* ``cached_stage(name)`` – replaces ``st.cache_data`` and also records cache
+  hits/misses and how much of the call was hashing + lookup versus the
+  function body (which only runs on a miss);
+* ``rows``               – the first DataFrame argument's length (rows
+  processed), else the result's.
+
+Nothing is recorded unless ``begin_rerun`` started a profile for the
+current script run (the sidebar "Performance" toggle or ``AOI_PROFILE=1``),
+so the decorators cost one context-variable lookup otherwise.  Stages nest
+and report inclusive wall time.  ``render_panel`` shows the table in the
+sidebar and can run the next rerun under cProfile, dumping the stats to
+``profiles/``.
+"""
+from __future__ import annotations
+
+import contextvars
+import cProfile
+import datetime as dt
+import functools
+import io
+import os
+import pstats
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional
+
+import pandas as pd
+import streamlit as st
+
+PROFILE_ENV = "AOI_PROFILE"
+PROFILE_DIR = Path(__file__).resolve().parent / "profiles"
+TOP_FUNCTIONS = 30
+
+
+@dataclass
+class StageStats:
+    calls: int = 0
+    seconds: float = 0.0
+    compute_s: float = 0.0    # inside cached bodies (misses only)
+    hits: int = 0
+    misses: int = 0
+    rows: int = 0
+
+
+@dataclass
+class RerunProfile:
+    started: float = field(default_factory=time.perf_counter)
+    stages: Dict[str, StageStats] = field(default_factory=dict)
+    profiler: Optional[cProfile.Profile] = None
+    total_s: float = 0.0
+    stats_path: Optional[Path] = None
+    stats_text: str = ""
+
+    def record(self, name: str, **values) -> None:
+        stats = self.stages.setdefault(name, StageStats())
+        for key, value in values.items():
+            setattr(stats, key, getattr(stats, key) + value)
+
+    def table(self) -> pd.DataFrame:
+        """One row per stage in first-call order, with the rerun total last."""
+        rows = [{"stage": name, "calls": s.calls, "seconds": round(s.seconds, 4),
+                 "cache": f"{s.hits} hit / {s.misses} miss" if s.hits or s.misses else "",
+                 "cache_s": round(s.seconds - s.compute_s, 4) if s.hits or s.misses else None,
+                 "rows": s.rows or None}
+                for name, s in self.stages.items()]
+        rows.append({"stage": "rerun (total)", "calls": 1, "seconds": round(self.total_s, 4),
+                     "cache": "", "cache_s": None, "rows": None})
+        return pd.DataFrame(rows).astype({"rows": "Int64"})
+
+
+_current: contextvars.ContextVar[Optional[RerunProfile]] = contextvars.ContextVar("aoi_rerun_profile", default=None)
+
+
+def env_enabled() -> bool:
+    return os.environ.get(PROFILE_ENV, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def current() -> Optional[RerunProfile]:
+    return _current.get()
+
+
+def begin_rerun(enabled: bool, cprofile: bool = False) -> Optional[RerunProfile]:
+    """Start recording this script run (or clear a previous run's profile)."""
+    if not enabled:
+        _current.set(None)
+        return None
+    profile = RerunProfile()
+    if cprofile:
+        profile.profiler = cProfile.Profile()
+        profile.profiler.enable()
+    _current.set(profile)
+    return profile
+
+
+def end_rerun(profile: Optional[RerunProfile], out_dir: Path = PROFILE_DIR) -> None:
+    """Stop the clock; with cProfile, dump ``rerun-<time>.prof`` and keep the top functions."""
+    if profile is None:
+        return
+    _current.set(None)
+    profile.total_s = time.perf_counter() - profile.started
+    if profile.profiler is None:
+        return
+    profile.profiler.disable()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    profile.stats_path = out_dir / f"rerun-{dt.datetime.now():%Y%m%d-%H%M%S}.prof"
+    profile.profiler.dump_stats(str(profile.stats_path))
+    buf = io.StringIO()
+    pstats.Stats(profile.profiler, stream=buf).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+    profile.stats_text = buf.getvalue()
+
+
+def _rows(args, result) -> int:
+    frame = next((a for a in args if isinstance(a, pd.DataFrame)), result)
+    return len(frame) if isinstance(frame, pd.DataFrame) else 0
+
+
+# ---------------------------------------------------------------------------
+# Instrumentation
+# ---------------------------------------------------------------------------
+
+@contextmanager
+def stage(name: str, rows: int = 0) -> Iterator[None]:
+    """Time a block of the current rerun (no-op when profiling is off)."""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.record(name, calls=1, seconds=time.perf_counter() - start, rows=rows)
+
+
+def timed(name: str) -> Callable:
+    """Decorator form of ``stage``; rows come from the arguments or result."""
+    def decorate(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            profile = _current.get()
+            if profile is None:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            result = fn(*args, **kwargs)
+            profile.record(name, calls=1, seconds=time.perf_counter() - start, rows=_rows(args, result))
+            return result
+        if hasattr(fn, "clear"):
+            wrapper.clear = fn.clear
+        return wrapper
+    return decorate
+
+
+def cached_stage(name: str, **cache_kwargs) -> Callable:
+    """``st.cache_data(**cache_kwargs)`` that also records hits, misses and hashing time."""
+    def decorate(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def compute(*args, **kwargs):
+            profile = _current.get()
+            if profile is None:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                profile.record(name, misses=1, compute_s=time.perf_counter() - start)
+
+        cached = st.cache_data(**cache_kwargs)(compute)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            profile = _current.get()
+            if profile is None:
+                return cached(*args, **kwargs)
+            misses = profile.stages.get(name, StageStats()).misses
+            start = time.perf_counter()
+            result = cached(*args, **kwargs)
+            hit = profile.stages.get(name, StageStats()).misses == misses
+            profile.record(name, calls=1, seconds=time.perf_counter() - start,
+                           hits=int(hit), rows=_rows(args, result))
+            return result
+
+        wrapper.clear = cached.clear
+        return wrapper
+    return decorate
+
+
+# ---------------------------------------------------------------------------
+# Sidebar panel
+# ---------------------------------------------------------------------------
+
+def sidebar_toggle() -> Optional[RerunProfile]:
+    """The "Performance" toggle; call first thing in the script and pass the result to ``render_panel``."""
+    enabled = st.sidebar.toggle("⏱️ Performance", value=env_enabled(), key="perf_enabled",
+                                help="Time loaders, filters and sections for each rerun")
+    cprofile = st.session_state.pop("perf_cprofile_next", False)
+    return begin_rerun(enabled, cprofile=enabled and cprofile)
+
+
+def render_panel(profile: Optional[RerunProfile]) -> None:
+    """Per-stage wall time, cache hits and rows for this rerun (call last)."""
+    if profile is None:
+        return
+    end_rerun(profile)
+    with st.sidebar.expander("Performance – this rerun", expanded=True):
+        st.dataframe(profile.table(), hide_index=True, use_container_width=True)
+        st.caption("Inclusive wall time; cache_s is hashing + lookup (seconds minus the cached body).")
+        st.button("Profile next rerun (cProfile)", key="perf_cprofile",
+                  on_click=lambda: st.session_state.update(perf_cprofile_next=True))
+        if profile.stats_path is not None:
+            st.caption(f"cProfile stats: {profile.stats_path}")
+            st.code(profile.stats_text, language="text")
+            st.download_button("Download .prof", profile.stats_path.read_bytes(),
+                               file_name=profile.stats_path.name, key="perf_download")
@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+query_backend.py
+----------------
+Pluggable engine for the analytical queries behind the dashboards
+(top-N charts, pivots, outcome mixes, weekly closure rates).
+
+Two interchangeable backends expose the same methods:
+
+    PandasBackend   – single-threaded pandas over an in-memory DataFrame
+                      (the original behaviour, always available)
+    DuckDBBackend   – embedded DuckDB running multi-core vectorized group-bys,
+                      either over the Parquet snapshot / SQLite database on
+                      disk or over a DataFrame that is already in memory;
+                      EventDate windows only open the overlapping month
+                      partitions of the snapshot
+
+Pick the engine with the ``AOI_QUERY_BACKEND`` environment variable
+(``pandas`` – default – or ``duckdb``).  duckdb is optional; without it the
+pandas backend is used.
+
+Both backends take the dashboard filters as a hashable ``FilterSpec`` so
+results can be cached with ``st.cache_data``.
+"""
+from __future__ import annotations
+
+import datetime as dt
+import os
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Sequence, Tuple
+
+import pandas as pd
+
+try:
+    import duckdb
+    DUCKDB_AVAILABLE = True
+except ImportError:
+    DUCKDB_AVAILABLE = False
+
+from connections import pooled
+from defect_data import deduplicate_pins, filter_frame
+from parquet_snapshot import (
+    DATE_COLUMN,
+    PARTITION_FIELD,
+    archive_files,
+    is_datetime_column,
+    partition_files,
+    snapshot_dir,
+    snapshot_is_fresh,
+)
+
+BACKEND_ENV = "AOI_QUERY_BACKEND"
+BACKENDS = ("pandas", "duckdb")
+
+
+class FilterSpec(NamedTuple):
+    """Dashboard filter state in a hashable form."""
+    outcomes: Tuple[str, ...] = ()
+    columns: Tuple[Tuple[str, Tuple], ...] = ()
+    datetime_col: Optional[str] = None
+    start: Optional[dt.datetime] = None
+    end: Optional[dt.datetime] = None
+
+
+def make_filter_spec(filters: Dict[str, Sequence] | None = None, datetime_col: str | None = None,
+                     start_dt=None, end_dt=None, outcome_sel: Sequence[str] | None = None) -> FilterSpec:
+    """Build a FilterSpec from the same arguments ``apply_filters_cached`` takes."""
+    cols = tuple(sorted((c, tuple(v)) for c, v in (filters or {}).items() if v))
+    if not (datetime_col and start_dt and end_dt):
+        datetime_col = start_dt = end_dt = None
+    return FilterSpec(tuple(outcome_sel or ()), cols, datetime_col, start_dt, end_dt)
+
+
+def selected_backend() -> str:
+    """Backend requested through the environment, downgraded if unavailable."""
+    name = os.environ.get(BACKEND_ENV, "pandas").strip().lower()
+    if name not in BACKENDS:
+        name = "pandas"
+    if name == "duckdb" and not DUCKDB_AVAILABLE:
+        name = "pandas"
+    return name
+
+
+def make_frame_backend(df: pd.DataFrame, name: str | None = None):
+    """Backend over an in-memory frame (e.g. the tracker's sliced defects)."""
+    name = name or selected_backend()
+    return DuckDBBackend.for_frame(df) if name == "duckdb" else PandasBackend(df)
+
+
+# ---------------------------------------------------------------------------
+# pandas
+# ---------------------------------------------------------------------------
+
+class PandasBackend:
+    """Reference implementation; every other backend must match its output."""
+
+    name = "pandas"
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+
+    def filter(self, spec: FilterSpec = FilterSpec()) -> pd.DataFrame:
+        return filter_frame(self.df, dict(spec.columns), spec.outcomes,
+                            spec.datetime_col, spec.start, spec.end)
+
+    def outcome_counts(self, spec: FilterSpec = FilterSpec()) -> pd.Series:
+        """Rows per Outcome, largest first."""
+        df = self.filter(spec)
+        if df.empty or "Outcome" not in df.columns:
+            return pd.Series(dtype="int64", name="count")
+        counts = df["Outcome"].value_counts()
+        counts = counts[counts > 0]  # Categorical columns list unobserved labels too
+        return _order_counts(counts.rename_axis("Outcome").rename("count"))
+
+    def top_counts(self, column: str, spec: FilterSpec = FilterSpec(), top_n: int = 20) -> pd.DataFrame:
+        """Top *top_n* values of *column* by row count."""
+        df = self.filter(spec)
+        if df.empty or column not in df.columns:
+            return pd.DataFrame(columns=[column, "count"])
+        out = df.groupby(column, observed=True).size().reset_index(name="count")
+        return _order_top(out, column).head(top_n)
+
+    def top_ref_ids(self, spec: FilterSpec = FilterSpec(), top_n: int = 20, dedup: bool = True) -> pd.DataFrame:
+        """Top Ref_Id counts. If *dedup* true treat pin-level refs as one."""
+        df = self.filter(spec)
+        if df.empty or "Ref_Id" not in df.columns:
+            return pd.DataFrame()
+
+        if dedup:
+            df = deduplicate_pins(df)
+            base_col = "RF_Base"
+        else:
+            base_col = "Ref_Id"
+
+        out = df.groupby(base_col, observed=True).size().reset_index(name="count")
+        return _order_top(out, base_col).head(top_n)
+
+    def pivot_top_components(self, spec: FilterSpec = FilterSpec(), n_components: int = 5) -> pd.DataFrame:
+        """Distinct SerialNumber count by Part › Component › Ref vs DefectCode,
+        limited to the top *n_components* Component PNs in the current filter."""
+        df_piv = self.filter(spec)
+        if df_piv.empty or "SerialNumber" not in df_piv.columns or "ComponentPN" not in df_piv.columns:
+            return pd.DataFrame()
+
+        pn_counts = df_piv["ComponentPN"].value_counts()
+        top_pns = _order_counts(pn_counts[pn_counts > 0]).head(n_components).index.tolist()
+        df_piv = df_piv[df_piv["ComponentPN"].isin(top_pns)].copy()
+
+        if "RF_Base" not in df_piv.columns:
+            if "Ref_Id" in df_piv.columns:
+                df_piv["RF_Base"] = df_piv["Ref_Id"].astype(str).str.split(".").str[0]
+            else:
+                df_piv["RF_Base"] = "N/A"
+
+        index_cols, col_field = _pivot_fields(df_piv.columns)
+        return pd.pivot_table(
+            df_piv,
+            index=index_cols,
+            columns=col_field,
+            values="SerialNumber",
+            aggfunc="nunique",
+            fill_value=0,
+            observed=True,  # dimension columns are Categoricals
+        )
+
+    def weekly_closure(self, issues: pd.DataFrame) -> pd.DataFrame:
+        """Issues reported per (Monday-start) week and the share closed."""
+        if issues.empty:
+            return pd.DataFrame(columns=["week", "total", "closed", "closure_rate", "week_str"])
+        week = pd.to_datetime(issues["date_reported"]).dt.to_period("W")
+        weekly_stats = (
+            pd.DataFrame({"week": week, "closed": issues["status"].eq("Closed")})
+            .groupby("week")
+            .agg(total=("closed", "size"), closed=("closed", "sum"))
+        )
+        return _finish_weekly(weekly_stats.reset_index())
+
+
+# ---------------------------------------------------------------------------
+# DuckDB
+# ---------------------------------------------------------------------------
+
+class DuckDBBackend:
+    """Runs the same queries in an embedded DuckDB over a ``defects`` view."""
+
+    name = "duckdb"
+
+    def __init__(self, conn: "duckdb.DuckDBPyConnection", shared: bool = False,
+                 db_path: Path | None = None, snapshot: bool = False):
+        self.conn = conn
+        self.shared = shared
+        self.db_path = db_path    # set for on-disk sources (archive lookups)
+        self.snapshot = snapshot  # True when the view reads the Parquet snapshot
+        has_defects = "defects" in {r[0] for r in conn.execute("SHOW TABLES").fetchall()}
+        self.columns = [r[0] for r in conn.execute("DESCRIBE defects").fetchall()] if has_defects else []
+
+    # -- construction -------------------------------------------------------
+
+    @classmethod
+    def for_database(cls, db_path: Path, data_version: int) -> "DuckDBBackend":
+        """Query the Parquet snapshot when fresh, otherwise the SQLite file."""
+        conn = duckdb.connect()
+        if snapshot_is_fresh(db_path, data_version):
+            glob = (snapshot_dir(db_path) / f"{PARTITION_FIELD}=*" / "*.parquet").as_posix()
+            conn.execute(
+                f"CREATE VIEW defects AS SELECT * EXCLUDE ({PARTITION_FIELD}) "
+                f"FROM read_parquet({_path_literal(glob)}, hive_partitioning = true)"
+            )
+            return cls(conn, shared=True, db_path=Path(db_path), snapshot=True)
+
+        try:
+            conn.execute(f"ATTACH {_path_literal(db_path)} AS aoi (TYPE SQLITE, READ_ONLY)")
+            cols = [r[0] for r in conn.execute("DESCRIBE aoi.defects").fetchall()]
+            select = ", ".join(
+                f"TRY_CAST({_q(c)} AS TIMESTAMP) AS {_q(c)}" if is_datetime_column(c) else _q(c)
+                for c in cols
+            )
+            conn.execute(f"CREATE VIEW defects AS SELECT {select} FROM aoi.defects")
+        except duckdb.Error:
+            # sqlite extension not installable (offline host) – read once via
+            # the stdlib driver and keep a columnar copy inside DuckDB.
+            with pooled(db_path) as sq:
+                frame = pd.read_sql("SELECT * FROM defects", sq)
+            for c in frame.columns:
+                if is_datetime_column(c):
+                    frame[c] = pd.to_datetime(frame[c], errors="coerce")
+            conn.execute("CREATE TABLE defects AS SELECT * FROM frame")
+        return cls(conn, shared=True, db_path=Path(db_path))
+
+    @classmethod
+    def for_frame(cls, df: pd.DataFrame) -> "DuckDBBackend":
+        conn = duckdb.connect()
+        conn.register("defects", df)
+        return cls(conn)
+
+    # -- helpers ------------------------------------------------------------
+
+    def _source(self, spec: FilterSpec) -> str:
+        """Relation to scan for *spec*.
+
+        With an EventDate window only the snapshot months overlapping it are
+        opened (partition pruning), plus any archived months it reaches.
+        """
+        if self.db_path is None or spec.datetime_col != DATE_COLUMN:
+            return "defects"
+        start, end = pd.Timestamp(spec.start).date(), pd.Timestamp(spec.end).date()
+        archived = archive_files(self.db_path, start, end)
+        if self.snapshot:
+            files = partition_files(self.db_path, start, end) + archived
+            return _read_parquet(files) if files else "(SELECT * FROM defects WHERE false)"
+        if not archived:
+            return "defects"
+        return f"(SELECT * FROM defects UNION ALL BY NAME SELECT * FROM {_read_parquet(archived)})"
+
+    def _from(self, spec: FilterSpec, *extra: str) -> Tuple[str, list]:
+        """``<relation> WHERE ...`` fragment plus parameters for *spec*."""
+        clauses, params = list(extra), []
+        if spec.outcomes:
+            clauses.append(f"Outcome IN ({', '.join('?' * len(spec.outcomes))})")
+            params.extend(spec.outcomes)
+        for col, sel in spec.columns:
+            clauses.append(f"{_q(col)} IN ({', '.join('?' * len(sel))})")
+            params.extend(sel)
+        if spec.datetime_col:
+            clauses.append(f"{_q(spec.datetime_col)} BETWEEN ? AND ?")
+            params.extend([spec.start, spec.end])
+        where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+        return self._source(spec) + where, params
+
+    def _df(self, sql: str, params: list) -> pd.DataFrame:
+        # Shared (cached) connections hand each Streamlit thread its own
+        # cursor; registered frames are only visible on the owning handle.
+        conn = self.conn.cursor() if self.shared else self.conn
+        return conn.execute(sql, params).df()
+
+    # -- queries ------------------------------------------------------------
+
+    def filter(self, spec: FilterSpec = FilterSpec(), limit: int | None = None) -> pd.DataFrame:
+        rel, params = self._from(spec)
+        sql = f"SELECT * FROM {rel}" + (f" LIMIT {int(limit)}" if limit else "")
+        return self._df(sql, params)
+
+    def outcome_counts(self, spec: FilterSpec = FilterSpec()) -> pd.Series:
+        if "Outcome" not in self.columns:
+            return pd.Series(dtype="int64", name="count")
+        rel, params = self._from(spec, "Outcome IS NOT NULL")
+        out = self._df(f"SELECT Outcome, COUNT(*) AS count FROM {rel} GROUP BY 1", params)
+        return _order_counts(out.set_index("Outcome")["count"].astype("int64"))
+
+    def top_counts(self, column: str, spec: FilterSpec = FilterSpec(), top_n: int = 20) -> pd.DataFrame:
+        if column not in self.columns:
+            return pd.DataFrame(columns=[column, "count"])
+        rel, params = self._from(spec)
+        sql = (
+            f"SELECT {_q(column)}, COUNT(*) AS count FROM {rel} GROUP BY 1 "
+            f"HAVING {_q(column)} IS NOT NULL ORDER BY count DESC, 1 LIMIT {int(top_n)}"
+        )
+        return _ints(self._df(sql, params), "count")
+
+    def top_ref_ids(self, spec: FilterSpec = FilterSpec(), top_n: int = 20, dedup: bool = True) -> pd.DataFrame:
+        if "Ref_Id" not in self.columns:
+            return pd.DataFrame()
+        rel, params = self._from(spec)
+        if dedup:
+            keys = ["SerialNumber", "split_part(Ref_Id, '.', 1) AS RF_Base"]
+            if "EventDate" in self.columns:
+                keys.append("date_trunc('minute', EventDate) AS _event_min")
+            if "DefectCode" in self.columns:
+                keys.append("DefectCode")
+            src = f"(SELECT DISTINCT {', '.join(keys)} FROM {rel})"
+            base_col = "RF_Base"
+        else:
+            src = f"(SELECT * FROM {rel})"
+            base_col = "Ref_Id"
+        sql = (
+            f"SELECT {base_col}, COUNT(*) AS count FROM {src} WHERE {base_col} IS NOT NULL "
+            f"GROUP BY 1 ORDER BY count DESC, 1 LIMIT {int(top_n)}"
+        )
+        out = _ints(self._df(sql, params), "count")
+        return out if not out.empty else pd.DataFrame()
+
+    def pivot_top_components(self, spec: FilterSpec = FilterSpec(), n_components: int = 5) -> pd.DataFrame:
+        if "SerialNumber" not in self.columns or "ComponentPN" not in self.columns:
+            return pd.DataFrame()
+        rel, params = self._from(spec)
+        rf = "split_part(CAST(Ref_Id AS VARCHAR), '.', 1)" if "Ref_Id" in self.columns else "'N/A'"
+        index_cols, col_field = _pivot_fields([*self.columns, "RF_Base"])
+        dims = [c for c in index_cols if c != "RF_Base"] + [col_field]
+        sql = f"""
+            WITH f AS (SELECT * FROM {rel}),
+            top AS (
+                SELECT ComponentPN FROM f WHERE ComponentPN IS NOT NULL
+                GROUP BY 1 ORDER BY COUNT(*) DESC, 1 LIMIT {int(n_components)}
+            ),
+            g AS (
+                SELECT {', '.join(_q(c) for c in dims)}, {rf} AS RF_Base,
+                       COUNT(DISTINCT SerialNumber) AS n
+                FROM f WHERE ComponentPN IN (SELECT ComponentPN FROM top)
+                GROUP BY ALL
+            )
+            SELECT * FROM g WHERE {' AND '.join(f'{_q(c)} IS NOT NULL' for c in [*index_cols, col_field])}
+        """
+        long = self._df(sql, params)
+        if long.empty:
+            return pd.DataFrame()
+        return long.pivot_table(index=index_cols, columns=col_field, values="n", aggfunc="sum",
+                                fill_value=0, observed=True).astype("int64")  # as the pandas backend
+
+    def weekly_closure(self, issues: pd.DataFrame) -> pd.DataFrame:
+        if issues.empty:
+            return pd.DataFrame(columns=["week", "total", "closed", "closure_rate", "week_str"])
+        cur = self.conn.cursor()
+        cur.register("issues_frame", issues[["date_reported", "status"]])
+        weekly_stats = cur.execute("""
+            SELECT date_trunc('week', CAST(date_reported AS DATE)) AS week_start,
+                   COUNT(*) AS total,
+                   COUNT(*) FILTER (WHERE status = 'Closed') AS closed
+            FROM issues_frame GROUP BY 1 ORDER BY 1
+        """).df()
+        weekly_stats.insert(0, "week", pd.to_datetime(weekly_stats.pop("week_start")).dt.to_period("W"))
+        return _finish_weekly(_ints(weekly_stats, "total", "closed"))
+
+
+# ---------------------------------------------------------------------------
+# Shared helpers
+# ---------------------------------------------------------------------------
+
+def _q(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _path_literal(path) -> str:
+    """SQL string literal of *path* (quotes doubled: O'Brien shares, etc.)."""
+    return "'" + Path(path).as_posix().replace("'", "''") + "'"
+
+
+def _read_parquet(files) -> str:
+    listing = ", ".join(_path_literal(f) for f in files)
+    return f"read_parquet([{listing}], hive_partitioning = false, union_by_name = true)"
+
+
+def _ints(df: pd.DataFrame, *cols: str) -> pd.DataFrame:
+    for c in cols:
+        df[c] = df[c].astype("int64")
+    return df
+
+
+def _order_counts(counts: pd.Series) -> pd.Series:
+    """Sort counts largest first with ties broken by label (deterministic top-N)."""
+    return counts.sort_index().sort_values(ascending=False, kind="stable")
+
+
+def _order_top(out: pd.DataFrame, key: str) -> pd.DataFrame:
+    return out.sort_values(["count", key], ascending=[False, True]).reset_index(drop=True)
+
+
+def _pivot_fields(columns) -> Tuple[list, str]:
+    index_cols = [c for c in ("PartNumber", "ComponentPN", "RF_Base") if c in columns]
+    col_field = "DefectCode" if "DefectCode" in columns else "Outcome"
+    return index_cols, col_field
+
+
+def _finish_weekly(weekly_stats: pd.DataFrame) -> pd.DataFrame:
+    weekly_stats["closure_rate"] = (weekly_stats["closed"] / weekly_stats["total"] * 100).fillna(0)
+    weekly_stats["week_str"] = weekly_stats["week"].astype(str)
+    return weekly_stats
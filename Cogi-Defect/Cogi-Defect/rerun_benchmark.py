@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+rerun_benchmark.py
+------------------
+Headless benchmark of dashboard reruns: ``streamlit.testing.v1.AppTest``
+drives scripted widget interactions on ``app.py`` and
+``pages/action_tracker.py`` against synthetic databases of increasing size
+and records the latency of every rerun and the peak memory.
+
+Each (tier, page) runs in its own Python process with the synthetic
+database as working directory, so ``defect_data.DB_PATH`` and the
+Streamlit caches start cold and peak RSS belongs to that page alone.
+
+A rerun's latency covers the whole script: everything rendered on every
+rerun shows up in every interaction (an Excel export built for a download
+button, hashing a full frame into a cache key …).  Expanders are drawn
+client-side, so "expanding" the pivot is not a rerun of its own – its body
+runs on every rerun and the ``pivot`` interaction changes the Component PN
+filter the pivot is built from.
+
+Results per page: ``cold`` (first run), p50 / p95 / max per interaction
+over ``--rounds`` rounds, p50 / p95 / p99 over all reruns and
+``peak_rss_mb``.  A rerun regresses when its p50 is more than
+``--tolerance`` slower than the baseline (benchmark.compare).
+
+Usage
+-----
+$ python rerun_benchmark.py                                # 10k and 100k rows
+$ python rerun_benchmark.py --rows 10k,100k,1M --rounds 5 --workdir bench_data
+$ python rerun_benchmark.py --rows 10k --update-baseline
+"""
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+from streamlit.testing.v1 import AppTest
+
+from benchmark import DEFAULT_TOLERANCE, compare, read_baseline
+from connections import connect
+from ingest_to_db import classify_frame, ensure_table, publish_ingest, upsert_df
+from issue_effectiveness import link_issues
+from issues_db import save_issue
+from migrations import migrate
+from parquet_snapshot import months_of
+from synthetic_data import iter_rawdata, parse_rows, rows_label
+
+CODE_DIR = Path(__file__).resolve().parent
+PAGES = ["app.py", "pages/action_tracker.py"]
+BASELINE_PATH = CODE_DIR / "rerun_baseline.json"
+DEFAULT_TIERS = "10k,100k"
+APP_TIMEOUT_S = 600
+N_ISSUES = 40
+
+
+# ---------------------------------------------------------------------------
+# Synthetic databases
+# ---------------------------------------------------------------------------
+
+def build_db(db_path: Path, n_rows: int, seed: int = 0, n_issues: int = N_ISSUES) -> int:
+    """Classify and ingest synthetic rows plus *n_issues* linked issues; returns classified rows."""
+    rows, months, real_counts = 0, set(), []
+    last_day = None
+    with connect(db_path) as conn:
+        migrate(conn)
+        for raw in iter_rawdata(n_rows, seed):
+            df = classify_frame(raw)
+            ensure_table(conn, df)
+            upsert_df(conn, df)
+            months |= months_of(df)
+            rows += len(df)
+            real = df[df["Outcome"] == "Real"]
+            real_counts.append(real.groupby(["ComponentPN", "Ref_Id", "LineName"]).size())
+            last_day = pd.to_datetime(df["EventDate"]).max().date()
+
+        # Issues on the worst parts, reported over the last four weeks of data
+        statuses = ["Open", "In Progress", "Closed", "On Hold"]
+        parts = pd.concat(real_counts).groupby(level=[0, 1, 2]).sum()
+        for i, (cpn, ref, line) in enumerate(parts.nlargest(n_issues).index):
+            save_issue(conn, {
+                "date_reported": str(last_day - dt.timedelta(days=i % 28)),
+                "status": statuses[i % len(statuses)],
+                "line_name": line, "component_pn": cpn, "ref_id": ref,
+                "issue_category": "Process", "description": f"Repeat defects on {ref} ({cpn})",
+            }, changed_by="rerun_benchmark")
+        with conn:
+            link_issues(conn)
+        publish_ingest(conn, db_path, months)
+    return rows
+
+
+# ---------------------------------------------------------------------------
+# Scripted interactions
+# ---------------------------------------------------------------------------
+
+def _by_label(widgets, label: str):
+    return next(w for w in widgets if w.label == label)
+
+
+def _toggle_options(widget, round_no: int) -> None:
+    """First option on even rounds, none on odd ones (every round is a change)."""
+    widget.set_value([] if round_no % 2 else widget.options[:1])
+
+
+def app_script() -> List[Tuple[str, Callable]]:
+    return [
+        ("preset", lambda at, r: at.selectbox(key="preset").set_value(["Weekly", "Monthly"][r % 2])),
+        ("machine", lambda at, r: _toggle_options(at.multiselect(key="machine_filter"), r)),
+        ("dedup", lambda at, r: _by_label(at.checkbox, "Deduplicate pin-level Ref IDs").set_value(r % 2 == 1)),
+        ("pivot", lambda at, r: _toggle_options(at.multiselect(key="cpn_filter"), r)),
+        ("rerun", lambda at, r: None),
+    ]
+
+
+def action_tracker_script() -> List[Tuple[str, Callable]]:
+    return [
+        ("machine", lambda at, r: _toggle_options(_by_label(at.sidebar.multiselect, "Machines"), r)),
+        ("search", lambda at, r: at.text_input(key="issue_search").set_value(["solder", ""][r % 2])),
+        ("status", lambda at, r: _toggle_options(_by_label(at.sidebar.multiselect, "Status"), r)),
+        ("effect_window", lambda at, r: at.slider(key="effect_window").set_value([30, 7][r % 2])),
+        ("rerun", lambda at, r: None),
+    ]
+
+
+SCRIPTS = {"app.py": app_script, "pages/action_tracker.py": action_tracker_script}
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def percentiles(seconds: List[float], qs=(50, 95)) -> Dict[str, float]:
+    stats = {f"p{q}": round(float(np.percentile(seconds, q)), 4) for q in qs}
+    stats["max"] = round(max(seconds), 4)
+    return stats
+
+
+def measure_page(page: str, rounds: int, trace_memory: bool = False) -> Dict:
+    """Run *page*'s script in this process (cwd holds the database)."""
+    warnings.filterwarnings("ignore")
+    at = AppTest.from_file(str(CODE_DIR / page), default_timeout=APP_TIMEOUT_S)
+    samples: Dict[str, List[float]] = {}
+    heap_peaks: Dict[str, float] = {}
+
+    def timed_run(name: str) -> None:
+        if trace_memory:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        at.run()
+        samples.setdefault(name, []).append(time.perf_counter() - start)
+        if trace_memory:
+            peak = tracemalloc.get_traced_memory()[1] / 2**20
+            heap_peaks[name] = round(max(heap_peaks.get(name, 0.0), peak), 1)
+        if at.exception:
+            raise RuntimeError(f"{page} [{name}]: {at.exception[0].message}")
+
+    if trace_memory:
+        tracemalloc.start()
+    timed_run("cold")
+    script = SCRIPTS[page]()
+    for round_no in range(rounds):
+        for name, interact in script:
+            interact(at, round_no)
+            timed_run(name)
+
+    reruns = [s for name, runs in samples.items() if name != "cold" for s in runs]
+    result = {
+        "cold": round(samples.pop("cold")[0], 4),
+        "interactions": {name: percentiles(runs) for name, runs in samples.items()},
+        "reruns": {"n": len(reruns), **percentiles(reruns, (50, 95, 99))},
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    if trace_memory:
+        result["heap_peak_mb"] = heap_peaks
+    return result
+
+
+def run_page(db_dir: Path, page: str, rounds: int, trace_memory: bool = False) -> Dict:
+    """measure_page in a fresh interpreter with *db_dir* as working directory."""
+    cmd = [sys.executable, str(Path(__file__).resolve()), "--measure", page, "--rounds", str(rounds)]
+    if trace_memory:
+        cmd.append("--trace-memory")
+    proc = subprocess.run(cmd, cwd=db_dir, capture_output=True, text=True)
+    if proc.returncode:
+        raise RuntimeError(f"{page} failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def run(n_rows: int, seed: int, workdir: Path, rounds: int, pages: List[str],
+        trace_memory: bool = False) -> Dict:
+    """Every page's script against one database size; returns the result document."""
+    db_dir = workdir / f"reruns-{rows_label(n_rows)}-s{seed}"
+    shutil.rmtree(db_dir, ignore_errors=True)
+    db_dir.mkdir(parents=True)
+    start = time.perf_counter()
+    classified = build_db(db_dir / "aoi_defects.db", n_rows, seed)
+    print(f"[INFO] {rows_label(n_rows)}: {classified:,} classified rows in {time.perf_counter() - start:.1f}s")
+
+    result = {"tier": rows_label(n_rows), "rows": n_rows, "classified_rows": classified, "pages": {}}
+    for page in pages:
+        result["pages"][page] = run_page(db_dir, page, rounds, trace_memory)
+    return result
+
+
+def flat_timings(tier: Dict) -> Dict[str, float]:
+    """``page:interaction`` → p50 seconds, the values checked against the baseline."""
+    return {f"{page}:{name}": stats["p50"]
+            for page, res in tier["pages"].items() for name, stats in res["interactions"].items()}
+
+
+def print_tier(tier: Dict) -> None:
+    print(f"[INFO] {tier['tier']} ({tier['classified_rows']:,} classified rows)")
+    for page, res in tier["pages"].items():
+        print(f"  {page}  cold {res['cold']:.2f}s  reruns p50 {res['reruns']['p50']:.2f}s "
+              f"p95 {res['reruns']['p95']:.2f}s  peak RSS {res['peak_rss_mb']:,.0f} MB")
+        for name, stats in res["interactions"].items():
+            print(f"    {name:<14} p50 {stats['p50']:6.2f}s  p95 {stats['p95']:6.2f}s  max {stats['max']:6.2f}s")
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+def parse_args(argv: List[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark dashboard reruns with Streamlit AppTest")
+    parser.add_argument("--rows", default=DEFAULT_TIERS, help="comma-separated tiers (default 10k,100k)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rounds", type=int, default=3, help="passes over each page's interactions")
+    parser.add_argument("--pages", default=",".join(PAGES))
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="also record tracemalloc peaks per interaction (slower reruns)")
+    parser.add_argument("--workdir", type=Path, default=None, help="keep the databases (default: temporary)")
+    parser.add_argument("--out", type=Path, default=Path("rerun_results.json"))
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--measure", default=None, help=argparse.SUPPRESS)  # child process
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str] | None = None) -> int:
+    args = parse_args(argv)
+    if args.measure:
+        print(json.dumps(measure_page(args.measure, args.rounds, args.trace_memory)))
+        return 0
+
+    tiers = [parse_rows(t) for t in args.rows.split(",")]
+    pages = args.pages.split(",")
+    print(f"[INFO] Rerun benchmark: {', '.join(args.rows.split(','))} rows, {args.rounds} round(s), "
+          f"{len(pages)} page(s)")
+
+    if args.workdir:
+        args.workdir.mkdir(parents=True, exist_ok=True)
+        results = [run(n, args.seed, args.workdir, args.rounds, pages, args.trace_memory) for n in tiers]
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            results = [run(n, args.seed, Path(tmp), args.rounds, pages, args.trace_memory) for n in tiers]
+
+    baseline_doc = read_baseline(args.baseline)
+    regressions = []
+    for tier in results:
+        print_tier(tier)
+        baseline = baseline_doc.get(tier["tier"], {}).get("timings", {})
+        tier["regressions"] = compare(flat_timings(tier), baseline, args.tolerance)
+        regressions += [dict(reg, tier=tier["tier"]) for reg in tier["regressions"]]
+
+    doc = {
+        "created": dt.datetime.now().isoformat(timespec="seconds"),
+        "seed": args.seed,
+        "rounds": args.rounds,
+        "environment": {"python": platform.python_version(), "pandas": pd.__version__,
+                        "platform": platform.platform(), "cpus": os.cpu_count()},
+        "tiers": results,
+    }
+    args.out.write_text(json.dumps(doc, indent=2))
+    print(f"[INFO] Results written to {args.out.resolve()}")
+
+    if args.update_baseline:
+        for tier in results:
+            baseline_doc[tier["tier"]] = {"created": doc["created"], "environment": doc["environment"],
+                                          "timings": flat_timings(tier)}
+        args.baseline.write_text(json.dumps(baseline_doc, indent=2) + "\n")
+        print(f"[DONE] Baseline updated: {args.baseline}")
+        return 0
+    for reg in regressions:
+        print(f"[WARN] {reg['tier']} {reg['stage']}: {reg['current']:.3f}s vs baseline "
+              f"{reg['baseline']:.3f}s (x{reg['ratio']})")
+    if regressions:
+        return 1
+    print("[DONE] No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
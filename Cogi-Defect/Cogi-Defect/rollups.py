@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+rollups.py
+----------
+Small aggregate table kept in the hot SQLite database.
+
+``defect_rollups`` stores defect counts per day × line × machine × component
+× ref × outcome.  Rows carry a *source* tag so pair-level data that was moved
+to the cold Parquet archive (see compact_db.py) still contributes to trend
+and count queries without the raw rows living in SQLite.
+
+``daily_outcome_counts`` (day × line × machine × outcome) is refreshed by
+ingestion for every day it touches, and ``outcome_prefix`` holds running
+totals per outcome so the outcome counts of any date range are two lookups
+(issue snapshots, tracker metrics).  ``part_daily_counts`` (day × line ×
+component × ref × outcome) is refreshed with it and indexed by part, so the
+defect history of one placement is a range seek (issue_effectiveness.py).
+"""
+from __future__ import annotations
+
+import datetime as dt
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+import pandas as pd
+
+ROLLUP_DIMS = ["LineName", "MachineName", "ComponentPN", "Ref_Id", "Outcome"]
+ROLLUP_KEYS = ["day", *ROLLUP_DIMS]
+
+
+def ensure_rollup_table(conn: sqlite3.Connection) -> None:
+    """Create the rollup table (NULL dimensions are stored as '')."""
+    dims_sql = ", ".join(f"`{c}` TEXT NOT NULL DEFAULT ''" for c in ROLLUP_DIMS)
+    keys_sql = ", ".join(f"`{c}`" for c in ROLLUP_KEYS)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS defect_rollups (
+            day     TEXT NOT NULL,
+            {dims_sql},
+            source  TEXT NOT NULL,
+            n       INTEGER NOT NULL,
+            PRIMARY KEY ({keys_sql}, source)
+        );
+    """)
+    conn.commit()
+
+
+def rollup_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Aggregate pair-level defect rows to the rollup grain."""
+    if df.empty or "EventDate" not in df.columns:
+        return pd.DataFrame(columns=[*ROLLUP_KEYS, "n"])
+    keys = pd.DataFrame({"day": pd.to_datetime(df["EventDate"], errors="coerce").dt.strftime("%Y-%m-%d")})
+    for col in ROLLUP_DIMS:
+        keys[col] = df[col].fillna("").astype(str) if col in df.columns else ""
+    keys = keys.dropna(subset=["day"])
+    return keys.groupby(ROLLUP_KEYS).size().reset_index(name="n")
+
+
+def add_rollups(conn: sqlite3.Connection, df: pd.DataFrame, source: str) -> int:
+    """Add the rollup of *df* under *source*; counts are summed on conflict.
+
+    Does not commit, so callers can make it part of a larger transaction.
+    """
+    agg = rollup_frame(df)
+    cols = ", ".join(f"`{c}`" for c in ROLLUP_KEYS)
+    conn.executemany(
+        f"""
+        INSERT INTO defect_rollups ({cols}, source, n) VALUES ({', '.join('?' * len(ROLLUP_KEYS))}, ?, ?)
+        ON CONFLICT DO UPDATE SET n = n + excluded.n;
+        """,
+        [(*row[:-1], source, int(row[-1])) for row in agg.itertuples(index=False)],
+    )
+    return len(agg)
+
+
+def read_rollups(conn: sqlite3.Connection, start: dt.date, end: dt.date,
+                 by: Sequence[str] = ("day", "Outcome")) -> pd.DataFrame:
+    """Defect counts for [start, end] grouped by *by* (all sources combined)."""
+    by_sql: List[str] = [f"`{c}`" for c in by]
+    return pd.read_sql(
+        f"SELECT {', '.join(by_sql)}, SUM(n) AS n FROM defect_rollups "
+        f"WHERE day BETWEEN ? AND ? GROUP BY {', '.join(by_sql)} ORDER BY {', '.join(by_sql)}",
+        conn,
+        params=(start.isoformat(), end.isoformat()),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Daily outcome counts + prefix sums
+# ---------------------------------------------------------------------------
+
+DAILY_DIMS = ["LineName", "MachineName", "Outcome"]
+PART_DIMS = ["LineName", "ComponentPN", "Ref_Id", "Outcome"]
+
+
+def ensure_daily_tables(conn: sqlite3.Connection) -> None:
+    dims_sql = ", ".join(f"`{c}` TEXT NOT NULL DEFAULT ''" for c in DAILY_DIMS)
+    keys_sql = ", ".join(f"`{c}`" for c in DAILY_DIMS)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS daily_outcome_counts (
+            day  TEXT NOT NULL,
+            {dims_sql},
+            n    INTEGER NOT NULL,
+            PRIMARY KEY (day, {keys_sql})
+        );
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS outcome_prefix (
+            Outcome TEXT NOT NULL,
+            day     TEXT NOT NULL,
+            cum     INTEGER NOT NULL,
+            PRIMARY KEY (Outcome, day)
+        );
+    """)
+    part_sql = ", ".join(f"`{c}` TEXT NOT NULL DEFAULT ''" for c in PART_DIMS)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS part_daily_counts (
+            day  TEXT NOT NULL,
+            {part_sql},
+            n    INTEGER NOT NULL,
+            PRIMARY KEY (day, {", ".join(f"`{c}`" for c in PART_DIMS)})
+        );
+    """)
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_part_daily_counts_part "
+        "ON part_daily_counts(ComponentPN, Ref_Id, LineName, day);"
+    )
+
+
+def days_of(df: pd.DataFrame) -> Set[str]:
+    """ISO days ("YYYY-MM-DD") touched by *df*."""
+    if df.empty or "EventDate" not in df.columns:
+        return set()
+    return set(pd.to_datetime(df["EventDate"], errors="coerce").dropna().dt.strftime("%Y-%m-%d"))
+
+
+def _table_exists(conn: sqlite3.Connection, name: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?;", (name,)).fetchone() is not None
+
+
+def refresh_daily_counts(conn: sqlite3.Connection, days: Optional[Iterable[str]] = None) -> None:
+    """Recompute the daily and per-part counts of *days* (all days when None) and the prefix sums.
+
+    Counts combine hot rows with archived rollups, so re-ingesting a day
+    never loses what compaction moved out.  Does not commit.  The first call
+    on a database without the tables backfills every day.
+    """
+    if not (_table_exists(conn, "daily_outcome_counts") and _table_exists(conn, "part_daily_counts")):
+        days = None
+    ensure_daily_tables(conn)
+
+    present = {r[1] for r in conn.execute("PRAGMA table_info(defects);")}
+    hot_where, arch_where, params = "date(EventDate) IS NOT NULL", "1", ()
+    if days is not None:
+        days = sorted(days)
+        if not days:
+            return
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS touched_days (day TEXT PRIMARY KEY);")
+        conn.execute("DELETE FROM touched_days;")
+        conn.executemany("INSERT OR IGNORE INTO touched_days VALUES (?);", [(d,) for d in days])
+        # the EventDate range lets SQLite use the index before the day test
+        hot_where = "EventDate >= ? AND EventDate < date(?, '+1 day') AND date(EventDate) IN touched_days"
+        arch_where = "day IN touched_days"
+        params = (days[0], days[-1])
+
+    has_rollups = _table_exists(conn, "defect_rollups")
+    for table, dims in (("daily_outcome_counts", DAILY_DIMS), ("part_daily_counts", PART_DIMS)):
+        cols = ", ".join(f"`{c}`" for c in dims)
+        hot_cols = ", ".join(f"COALESCE(`{c}`, '') AS `{c}`" if c in present else f"'' AS `{c}`" for c in dims)
+        conn.execute(f"DELETE FROM {table}" + (" WHERE day IN touched_days;" if days is not None else ";"))
+        archived = ""
+        if has_rollups:
+            archived = f"UNION ALL SELECT day, {cols}, n FROM defect_rollups WHERE source = 'archive' AND {arch_where}"
+        conn.execute(
+            f"""
+            INSERT INTO {table} (day, {cols}, n)
+            SELECT day, {cols}, SUM(n) FROM (
+                SELECT date(EventDate) AS day, {hot_cols}, 1 AS n FROM defects WHERE {hot_where}
+                {archived}
+            ) GROUP BY day, {cols};
+            """,
+            params,
+        )
+
+    # Running totals per outcome – a few thousand rows even for years of data
+    conn.execute("DELETE FROM outcome_prefix;")
+    conn.execute("""
+        INSERT INTO outcome_prefix (Outcome, day, cum)
+        SELECT Outcome, day, SUM(n) OVER (PARTITION BY Outcome ORDER BY day)
+        FROM (SELECT Outcome, day, SUM(n) AS n FROM daily_outcome_counts GROUP BY Outcome, day);
+    """)
+
+
+def outcome_counts_between(conn: sqlite3.Connection, start: dt.date, end: dt.date) -> Optional[Dict[str, int]]:
+    """Outcome counts for the inclusive [start, end] from the prefix sums.
+
+    Returns None when the database has no prefix table yet.
+    """
+    if not _table_exists(conn, "outcome_prefix"):
+        return None
+    rows = conn.execute(
+        """
+        WITH o AS (SELECT DISTINCT Outcome FROM outcome_prefix)
+        SELECT o.Outcome,
+               COALESCE((SELECT cum FROM outcome_prefix p WHERE p.Outcome = o.Outcome AND p.day <= :end
+                         ORDER BY p.day DESC LIMIT 1), 0)
+             - COALESCE((SELECT cum FROM outcome_prefix p WHERE p.Outcome = o.Outcome AND p.day < :start
+                         ORDER BY p.day DESC LIMIT 1), 0)
+        FROM o;
+        """,
+        {"start": start.isoformat(), "end": end.isoformat()},
+    ).fetchall()
+    return {outcome: int(n) for outcome, n in rows if n}
+
+
+def read_outcomes(conn: sqlite3.Connection) -> List[str]:
+    """Sorted outcomes with any count, hot or archived – without touching the defect rows."""
+    if not _table_exists(conn, "outcome_prefix"):
+        return []
+    return [r[0] for r in conn.execute("SELECT DISTINCT Outcome FROM outcome_prefix WHERE Outcome != '' ORDER BY 1;")]
+
+
+def read_daily_counts(conn: sqlite3.Connection, start: dt.date, end: dt.date,
+                      by: Sequence[str] = ("day", "Outcome"), lines: Sequence[str] = (),
+                      machines: Sequence[str] = ()) -> pd.DataFrame:
+    """Daily-table counts for [start, end] grouped by *by*, optionally per line/machine."""
+    by_sql = ", ".join(f"`{c}`" for c in by)
+    where, params = ["day BETWEEN ? AND ?"], [start.isoformat(), end.isoformat()]
+    for col, sel in (("LineName", lines), ("MachineName", machines)):
+        if sel:
+            where.append(f"`{col}` IN ({', '.join('?' * len(sel))})")
+            params.extend(sel)
+    return pd.read_sql(
+        f"SELECT {by_sql}, SUM(n) AS n FROM daily_outcome_counts WHERE {' AND '.join(where)} "
+        f"GROUP BY {by_sql} ORDER BY {by_sql}",
+        conn,
+        params=params,
+    )
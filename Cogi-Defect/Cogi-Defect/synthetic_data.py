@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+synthetic_data.py
+-----------------
+Deterministic generator for realistic "Defect RawData" exports, used by the
+benchmark suite (benchmark.py) and tests.
+
+The generated rows follow the structure of the real AOI exports:
+
+* boards (SerialNumber) are inspected in time order on a few lines, top or
+  bottom side, with one or two inspection passes a few minutes apart;
+* each board has a handful of pad defects (Ref_Id × DefectCode), each
+  repeated over several loop rows (LoopNumber) with a ReworkStatus mix that
+  classifies to the real outcome mix (mostly False calls);
+* ComponentPN follows a Zipf distribution over a generated catalog, so a few
+  parts dominate, and ICs / switches / transistors get pin-level Ref_Ids
+  (U5300.6).
+
+The same *seed* and row count always give the same rows.  ``write_rawdata``
+splits large sets across files below Excel's 1,048,576-row sheet limit,
+always at a board boundary so ingestion never sees half a pad defect.
+``--format csv`` / ``tsv`` writes the same rows as delimited text.
+
+Usage
+-----
+$ python synthetic_data.py 1M              # ./Defect RawData - synthetic-1M-000.xlsx …
+$ python synthetic_data.py 10k --seed 7 --out-dir bench_data
+$ python synthetic_data.py 1M --format csv
+"""
+from __future__ import annotations
+
+import argparse
+import datetime as dt
+import re
+from pathlib import Path
+from typing import Iterator, List
+
+import numpy as np
+import pandas as pd
+
+try:
+    import xlsxwriter  # noqa: F401 (faster constant-memory writer when installed)
+    XLSXWRITER_AVAILABLE = True
+except ImportError:
+    XLSXWRITER_AVAILABLE = False
+
+# Rows per sheet, header included
+EXCEL_MAX_ROWS = 1_048_576
+TIERS = {"10k": 10_000, "100k": 100_000, "1M": 1_000_000, "10M": 10_000_000}
+FORMATS = {"xlsx": None, "csv": ",", "tsv": "\t"}  # format → delimiter
+
+START = dt.datetime(2025, 1, 6, 6, 0, 0)
+LINES = ["L1A", "L1B", "L2A", "L2B"]
+LINE_WEIGHTS = [0.4, 0.3, 0.2, 0.1]
+BOARDS_PER_LINE_DAY = 400
+ASSEMBLIES = ["SLD-AP1221A-FMB-236-VP-FW1-00", "SLD-AP1221A-MB-239-VP-FW1-00",
+              "SLD-AP1340B-IO-112-VP-FW2-00"]
+ASSEMBLY_WEIGHTS = [0.8, 0.15, 0.05]
+
+# Outcome mix of a real export and the loop rows behind each outcome
+OUTCOMES = ["False", "Real", "Fixed from previously caught", "Suspect"]
+OUTCOME_WEIGHTS = [0.75, 0.13, 0.07, 0.05]
+REWORK_STATUSES = ["False call", "Overridden", "Reworkable"]
+LOOP_ROWS = [1, 2, 3, 4, 6, 8, 14]
+LOOP_WEIGHTS = [0.10, 0.11, 0.55, 0.07, 0.15, 0.015, 0.005]
+
+DEFECT_CODES = ["OVERHANG", "OCROCV", "COPLANARITY", "DIMENSION", "SOLDERFILLET", "MISSING",
+                "PADOVERHANG", "BRIDGE", "UPSIDEDOWN", "SOLDER_JOINT", "POLARITY",
+                "LIFTED_BODY", "LIFTED_LEAD", "BRIDGING", "COMPONENT_SHIFT", "POSITION"]
+# Codes are space-padded to a fixed width in the exports
+DEFECT_CODE_WIDTH = 45
+
+# Component families: catalog share, designator prefix, pin-level refs
+FAMILIES = {
+    "LG": (0.20, "U", True), "PR": (0.10, "U", True), "AM": (0.08, "U", True),
+    "CC": (0.25, "C", False), "RE": (0.17, "R", False), "R1": (0.05, "R", False),
+    "SW": (0.02, "SW", True), "FT": (0.04, "L", False), "DI": (0.05, "D", False),
+    "TR": (0.04, "Q", True),
+}
+N_COMPONENTS = 240
+ZIPF_EXPONENT = 1.2
+
+
+def parse_rows(text: str) -> int:
+    """'10k' / '1M' / '250000' -> row count."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([kKmM]?)\s*", text)
+    if not match:
+        raise ValueError(f"Not a row count: {text!r}")
+    scale = {"": 1, "k": 1_000, "m": 1_000_000}[match.group(2).lower()]
+    return int(float(match.group(1)) * scale)
+
+
+def rows_label(n_rows: int) -> str:
+    """1_000_000 -> '1M' (the tier names; other sizes are printed as is)."""
+    return next((label for label, n in TIERS.items() if n == n_rows), str(n_rows))
+
+
+# ---------------------------------------------------------------------------
+# Catalog
+# ---------------------------------------------------------------------------
+
+def component_catalog(seed: int = 0) -> pd.DataFrame:
+    """ComponentPN, designator refs and pin count per component, most frequent first."""
+    rng = np.random.default_rng([seed, 0])
+    families = list(FAMILIES)
+    shares = np.array([FAMILIES[f][0] for f in families])
+    family = rng.choice(families, size=N_COMPONENTS, p=shares / shares.sum())
+    refs, pins, used = [], [], set()
+    for fam in family:
+        prefix, pin_level = FAMILIES[fam][1], FAMILIES[fam][2]
+        placements = []
+        for _ in range(int(rng.integers(1, 9))):  # same part placed 1-8 times
+            number = int(rng.integers(1, 6000))
+            while f"{prefix}{number}" in used:
+                number += 1
+            used.add(f"{prefix}{number}")
+            placements.append(f"{prefix}{number}")
+        refs.append(placements)
+        pins.append(int(rng.choice([2, 8, 16, 32])) if pin_level else 0)
+    return pd.DataFrame({
+        "ComponentPN": [f"SLD-ECS-{fam}-{rng.integers(0, 100000):05d}-00" for fam in family],
+        "refs": refs,
+        "pins": pins,
+    })
+
+
+# ---------------------------------------------------------------------------
+# Rows
+# ---------------------------------------------------------------------------
+
+def _boards(rng: np.random.Generator, first_board: int, n_boards: int, catalog: pd.DataFrame,
+            zipf: np.ndarray) -> pd.DataFrame:
+    """Loop-level rows for boards first_board … first_board + n_boards - 1."""
+    boards = np.arange(first_board, first_board + n_boards)
+    line = rng.choice(len(LINES), size=n_boards, p=LINE_WEIGHTS)
+    side = rng.integers(0, 2, size=n_boards)
+    assembly = rng.choice(len(ASSEMBLIES), size=n_boards, p=ASSEMBLY_WEIGHTS)
+    seconds = boards * (86_400 / (BOARDS_PER_LINE_DAY * len(LINES))) + rng.uniform(0, 60, n_boards)
+    second_pass = rng.integers(120, 1_800, size=n_boards)
+
+    # Pad defects per board: 1 + geometric, a few boards with many
+    per_board = rng.geometric(0.45, size=n_boards)
+    board_of = np.repeat(np.arange(n_boards), per_board)
+    n_groups = len(board_of)
+    component = rng.choice(len(catalog), size=n_groups, p=zipf)
+    n_refs = catalog["refs"].str.len().to_numpy()[component]
+    ref_pick = (rng.random(n_groups) * n_refs).astype(int)
+    ref = np.array([catalog["refs"].iat[c][i] for c, i in zip(component, ref_pick)], dtype=object)
+    pins = catalog["pins"].to_numpy()[component]
+    pin_level = (pins > 0) & (rng.random(n_groups) < 0.5)
+    pin = (rng.random(n_groups) * np.maximum(pins, 1)).astype(int) + 1
+    ref = np.where(pin_level, ref + "." + pin.astype(str), ref)
+    code = rng.choice(len(DEFECT_CODES), size=n_groups, p=_code_weights())
+    outcome = rng.choice(len(OUTCOMES), size=n_groups, p=OUTCOME_WEIGHTS)
+    loops = np.array(LOOP_ROWS)[rng.choice(len(LOOP_ROWS), size=n_groups, p=LOOP_WEIGHTS)]
+    loops = np.where(outcome == OUTCOMES.index("Real"), np.maximum(loops, 2), loops)
+
+    # Loop rows: the ReworkStatus mix decides the outcome (see aoi_classify.classify)
+    group_of = np.repeat(np.arange(n_groups), loops)
+    k = np.arange(len(group_of)) - np.repeat(np.cumsum(loops) - loops, loops)
+    o = outcome[group_of]  # index into OUTCOMES
+    fc, ov, rw = range(3)  # index into REWORK_STATUSES
+    any_status = rng.choice(3, size=len(group_of), p=[0.5, 0.25, 0.25])
+    rework = np.where(rng.random(len(group_of)) < 0.5, rw, ov)
+    status = np.select(
+        [o == 0, o == 1, o == 2],
+        [np.where(k == 0, fc, any_status),
+         np.where(k == 0, rw, np.where(k == 1, ov, rework)),
+         ov],
+        rw,
+    )
+    b = board_of[group_of]
+    later = k >= (loops[group_of] + 1) // 2
+    event = pd.Timestamp(START) + pd.to_timedelta(seconds[b] + later * second_pass[b], unit="s")
+    lines = np.array(LINES)[line[b]]
+    sides = np.array(["TOP", "BOT"])[side[b]]
+    return pd.DataFrame({
+        "LineName": lines,
+        "MachineName": pd.Series(lines).radd("AUS-AOI-").str.cat(sides, sep="-").to_numpy(),
+        "EventDate": event.floor("s").strftime("%Y-%m-%d %H:%M:%S"),
+        "EventType": "INSPECTION",
+        "OperationName": np.char.add(np.char.add("AOI (", sides), ")"),
+        "RouteStep": np.nan,
+        "SerialNumber": np.char.add("BSE", (2_500_000_000 + boards[b]).astype(str)),
+        "PartNumber": np.array(ASSEMBLIES)[assembly[b]],
+        "PartNumberRev": 12,
+        "ReworkStatus": np.array(REWORK_STATUSES)[status],
+        "DefectCode": np.array([c.ljust(DEFECT_CODE_WIDTH) for c in DEFECT_CODES])[code[group_of]],
+        "Ref_Id": ref[group_of],
+        "ComponentPN": catalog["ComponentPN"].to_numpy()[component[group_of]],
+        "LoopNumber": np.minimum(k + 1, 7),
+        "_board": boards[b],
+    })
+
+
+def _code_weights() -> np.ndarray:
+    weights = 1.0 / np.arange(1, len(DEFECT_CODES) + 1) ** 1.5
+    return weights / weights.sum()
+
+
+def iter_rawdata(n_rows: int, seed: int = 0, max_rows: int = EXCEL_MAX_ROWS - 1) -> Iterator[pd.DataFrame]:
+    """*n_rows* raw export rows in frames of at most *max_rows*, cut between boards.
+
+    Only the last frame may end inside a board (to hit *n_rows* exactly).
+    """
+    catalog = component_catalog(seed)
+    zipf = 1.0 / np.arange(1, len(catalog) + 1) ** ZIPF_EXPONENT
+    zipf /= zipf.sum()
+    remaining, next_board, part = n_rows, 0, 0
+    while remaining > 0:
+        target = min(max_rows, remaining)
+        rng = np.random.default_rng([seed, 1, part])
+        frames, rows = [], 0
+        while rows <= target:  # ~5 rows per board; overshoot, then cut
+            batch = _boards(rng, next_board, max(16, int(target / 6)), catalog, zipf)
+            next_board = int(batch["_board"].iat[-1]) + 1
+            frames.append(batch)
+            rows += len(batch)
+        df = pd.concat(frames, ignore_index=True)
+        if remaining > max_rows:
+            last_board = df["_board"].iat[target]  # first board that does not fit
+            cut = int(np.searchsorted(df["_board"].to_numpy(), last_board))
+            next_board = int(last_board)
+        else:
+            cut = target
+        df = df.iloc[:cut].drop(columns="_board")
+        remaining -= len(df)
+        part += 1
+        yield df
+
+
+def generate_rawdata(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """All *n_rows* rows in one frame (tests and small tiers)."""
+    return pd.concat(iter_rawdata(n_rows, seed), ignore_index=True)
+
+
+def write_xlsx(path: Path, df: pd.DataFrame, batch_rows: int = 50_000) -> None:
+    """Stream *df* to a one-sheet workbook without holding every cell in memory.
+
+    ``DataFrame.to_excel`` through openpyxl keeps the whole sheet as cell
+    objects, which does not fit a million-row export in a few GB of RAM.
+    """
+    if XLSXWRITER_AVAILABLE:
+        with pd.ExcelWriter(path, engine="xlsxwriter",
+                            engine_kwargs={"options": {"constant_memory": True}}) as writer:
+            df.to_excel(writer, index=False)
+        return
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(list(df.columns))
+    for start in range(0, len(df), batch_rows):
+        batch = df.iloc[start:start + batch_rows].astype(object)
+        for row in batch.where(batch.notna(), None).itertuples(index=False, name=None):
+            ws.append(row)
+    wb.save(path)
+
+
+def write_rawdata(out_dir: Path, n_rows: int, seed: int = 0,
+                  max_rows: int = EXCEL_MAX_ROWS - 1, fmt: str = "xlsx") -> List[Path]:
+    """Write ``Defect RawData - synthetic-<rows>-NNN.<fmt>`` files; returns their paths."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for part, df in enumerate(iter_rawdata(n_rows, seed, max_rows)):
+        path = out_dir / f"Defect RawData - synthetic-{rows_label(n_rows)}-s{seed}-{part:03d}.{fmt}"
+        if fmt == "xlsx":
+            write_xlsx(path, df)
+        else:
+            df.to_csv(path, sep=FORMATS[fmt], index=False)
+        paths.append(path)
+    return paths
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Write deterministic synthetic AOI raw exports")
+    parser.add_argument("rows", help="row count: 10k, 1M, 10M or a number")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out-dir", type=Path, default=Path.cwd())
+    parser.add_argument("--format", choices=list(FORMATS), default="xlsx")
+    args = parser.parse_args(argv)
+
+    n_rows = parse_rows(args.rows)
+    print(f"[INFO] Writing {n_rows:,} rows (seed {args.seed}) to {args.out_dir.resolve()}…")
+    for path in write_rawdata(args.out_dir, n_rows, args.seed, fmt=args.format):
+        print(f"  → {path.name}")
+    print("[DONE]")
+
+
+if __name__ == "__main__":
+    main()
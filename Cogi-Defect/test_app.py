@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Dashboard smoke tests (AppTest) for the data sources app.py can start from.
+"""
+from pathlib import Path
+
+import pandas as pd
+
+import defect_data
+from ingest_to_db import classify_frame
+from synthetic_data import generate_rawdata
+
+APP = Path(__file__).resolve().parent / "Cogi-Defect" / "app.py"
+
+
+def test_excel_fallback_without_database(tmp_path, monkeypatch):
+    df = classify_frame(generate_rawdata(300))
+    df["EventDate"] = pd.to_datetime(df["EventDate"])  # real datetimes enable the date window
+    df.to_excel(tmp_path / "AOI_defect_status.xlsx", index=False)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(defect_data, "DB_PATH", tmp_path / "aoi_defects.db")
+
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(APP), default_timeout=120).run()
+    assert not at.exception, [e.message for e in at.exception]
+    assert any("falling back to Excel" in w.value for w in at.sidebar.warning)
+
+
+def test_database_loads_only_the_window_months(tmp_path, monkeypatch):
+    import datetime as dt
+    import sqlite3
+
+    from ingest_to_db import ingest_batch
+    from migrations import migrate
+
+    dates = pd.date_range("2025-05-01", "2025-07-31 18:00", freq="6h")
+    export = tmp_path / "Defect RawData - 2025-08-01.csv"
+    pd.DataFrame({
+        "SerialNumber": [f"SN{i}" for i in range(len(dates))],
+        "Ref_Id": "C1",
+        "DefectCode": "MISSING",
+        "ReworkStatus": "False call",
+        "EventDate": dates.strftime("%Y-%m-%d %H:%M:%S"),
+    }).to_csv(export, index=False)
+    db_path = tmp_path / "aoi_defects.db"
+    with sqlite3.connect(db_path) as conn:
+        migrate(conn)
+        ingest_batch(conn, db_path, [export], report=lambda m: None)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(defect_data, "DB_PATH", db_path)
+
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(APP), default_timeout=120).run()
+    assert not at.exception, [e.message for e in at.exception]
+    assert "Loaded rows: 124" in [c.value for c in at.caption]  # July only: the latest day's month
+
+    at.selectbox(key="preset").set_value("Monthly").run()
+    at.date_input(key="ref_date").set_value(dt.date(2025, 5, 10)).run()
+    assert not at.exception, [e.message for e in at.exception]
+    assert "Loaded rows: 124" in [c.value for c in at.caption]  # May
+
+    at.date_input(key="ref_date").set_value(dt.date(2025, 9, 10)).run()  # no data: widgets stay
+    assert not at.exception and "Loaded rows: 0" in [c.value for c in at.caption]
+    assert at.date_input(key="ref_date").value == dt.date(2025, 9, 10)
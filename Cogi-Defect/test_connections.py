@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Connection manager: WAL, busy timeout and the per-process pool.
+"""
+import threading
+import time
+
+from connections import ConnectionPool, connect
+
+
+def test_wal_lets_readers_run_during_a_write(tmp_path):
+    db = tmp_path / "db.sqlite"
+    with connect(db) as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.execute("INSERT INTO t VALUES (1)")
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    writer, reader = connect(db), connect(db)
+    writer.execute("BEGIN IMMEDIATE")
+    writer.execute("INSERT INTO t VALUES (2)")
+    assert reader.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 1  # not blocked
+    writer.commit()
+    assert reader.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 2
+
+
+def test_second_writer_waits_instead_of_failing(tmp_path):
+    db = tmp_path / "db.sqlite"
+    with connect(db) as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+    first = connect(db, check_same_thread=False)
+    first.execute("BEGIN IMMEDIATE")
+    threading.Timer(0.3, first.commit).start()
+
+    start = time.perf_counter()
+    with connect(db) as second:
+        second.execute("INSERT INTO t VALUES (1)")  # would raise "database is locked" without the timeout
+    assert time.perf_counter() - start >= 0.2
+
+
+def test_pool_reuses_a_bounded_set_of_connections(tmp_path):
+    pool = ConnectionPool(tmp_path / "db.sqlite", size=2)
+    seen = set()
+
+    def work():
+        for _ in range(20):
+            with pool.connection() as conn:
+                seen.add(id(conn))
+                conn.execute("SELECT 1")
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(seen) <= 2
+
+    try:
+        with pool.connection() as conn:
+            conn.execute("CREATE TABLE t (x INTEGER)")
+            conn.execute("INSERT INTO t VALUES (1)")
+            raise RuntimeError
+    except RuntimeError:
+        pass
+    with pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0  # rolled back
+    pool.close()
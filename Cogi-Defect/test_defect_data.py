@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Shared data layer: date index bounds / prefix-sum counts vs. plain masks,
+and one cached representation per compact setting.
+"""
+import datetime as dt
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from defect_data import (DateIndex, compact_frame, date_window, load_defect_window, load_defects, memory_report,
+                         month_span, read_data_version, slice_window)
+from rerun_benchmark import build_db
+
+WINDOWS = [
+    (dt.date(2025, 7, 1), dt.date(2025, 7, 1)),
+    (dt.date(2025, 7, 3), dt.date(2025, 7, 9)),
+    (dt.date(2025, 6, 1), dt.date(2025, 8, 31)),
+    (dt.date(2025, 7, 12), dt.date(2025, 7, 11)),  # empty
+]
+
+
+@pytest.fixture(scope="module")
+def frame():
+    rng = np.random.default_rng(11)
+    n = 2000
+    dates = pd.Timestamp("2025-07-01") + pd.to_timedelta(rng.integers(0, 20 * 86400, n), unit="s")
+    df = pd.DataFrame({
+        "EventDate": dates.where(rng.random(n) > 0.02),  # a few NaT
+        "Outcome": rng.choice(["False", "Real", "Suspect"], n),
+    })
+    df = compact_frame(df)
+    return df.sort_values("EventDate", na_position="last", ignore_index=True)
+
+
+@pytest.mark.parametrize("start,end", WINDOWS)
+def test_index_matches_mask(frame, start, end):
+    expected = frame[date_window(frame, start, end)]
+    lo, hi = DateIndex(frame).bounds(start, end)
+    pd.testing.assert_frame_equal(frame.iloc[lo:hi], expected)
+    pd.testing.assert_frame_equal(slice_window(frame, start, end), expected)
+
+    counts = expected["Outcome"].value_counts()
+    assert DateIndex(frame).outcome_counts(start, end) == {str(k): int(v) for k, v in counts.items() if v}
+
+
+@pytest.mark.parametrize("compact", [True, False])
+def test_window_slices_the_dashboards_copy(tmp_path, compact):
+    db = tmp_path / "aoi_defects.db"
+    build_db(db, 1_000, n_issues=1)
+    version = read_data_version(db)
+    full = load_defects(db, version, compact, *month_span(dt.date(2025, 1, 1), dt.date(2025, 12, 31)))
+    window = load_defect_window(db, dt.date(2025, 1, 1), dt.date(2025, 12, 31), version, compact)
+
+    assert len(window) == len(full) and (memory_report(window) is not None) == compact
+    pd.testing.assert_series_equal(window.dtypes, full.dtypes)
+
+
+@pytest.mark.parametrize("data_version", [4, 5])  # fresh snapshot / SQLite fallback
+def test_window_reads_only_its_months(tmp_path, data_version):
+    pytest.importorskip("pyarrow")
+    from parquet_snapshot import write_snapshot
+
+    db = tmp_path / "aoi_defects.db"
+    dates = pd.date_range("2025-05-20", "2025-08-10", freq="6h")
+    with sqlite3.connect(db) as conn:
+        pd.DataFrame({
+            "SerialNumber": [f"SN{i}" for i in range(len(dates))],
+            "Ref_Id": "C1",
+            "DefectCode": "MISSING",
+            "Outcome": "Real",
+            "EventDate": dates.strftime("%Y-%m-%d %H:%M:%S"),
+        }).to_sql("defects", conn, index=False)
+        write_snapshot(conn, db, data_version=4)
+
+    start, end = dt.date(2025, 6, 28), dt.date(2025, 7, 3)
+    assert month_span(start, end) == (dt.date(2025, 6, 1), dt.date(2025, 7, 31))
+    months = load_defects(db, data_version, True, *month_span(start, end))
+    assert set(months["EventDate"].dt.strftime("%Y-%m")) == {"2025-06", "2025-07"}
+    assert len(months) == (30 + 31) * 4
+    assert len(load_defect_window(db, start, end, data_version)) == 6 * 4
+    assert load_defect_window(db, end, start, data_version).empty
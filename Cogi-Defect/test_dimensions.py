@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Star schema: dimension encoding, the ``defects`` view and legacy migration.
+"""
+import sqlite3
+
+import pandas as pd
+
+from dimensions import FACT_TABLE, migrate_legacy_table, read_dimensions
+from ingest_to_db import ensure_table, upsert_df
+
+
+def frame(n: int = 6) -> pd.DataFrame:
+    return pd.DataFrame({
+        "SerialNumber": [f"SN{i}" for i in range(n)],
+        "Ref_Id": "C1",
+        "DefectCode": "MISSING",
+        "Outcome": "Real",
+        "MachineName": ["M2", "M1", None, "M2", "M1", "M2"][:n],
+        "ComponentPN": "CPN-1",
+        "EventDate": "2025-07-01 08:00:00",
+    })
+
+
+def test_upsert_round_trips_through_view(tmp_path):
+    df = frame()
+    with sqlite3.connect(tmp_path / "db.sqlite") as conn:
+        ensure_table(conn, df)
+        upsert_df(conn, df)
+        upsert_df(conn, df)  # replaces, does not duplicate
+        out = pd.read_sql("SELECT * FROM defects ORDER BY SerialNumber", conn)
+        facts = [r[1] for r in conn.execute(f"PRAGMA table_info({FACT_TABLE});")]
+        dims = read_dimensions(conn)
+
+    assert list(out.columns) == list(df.columns)
+    assert out["MachineName"].tolist() == df["MachineName"].tolist()
+    assert "MachineName_id" in facts and "MachineName" not in facts
+    assert dims == {"MachineName": ["M1", "M2"], "ComponentPN": ["CPN-1"]}
+
+
+def test_legacy_table_is_migrated(tmp_path):
+    df = frame()
+    with sqlite3.connect(tmp_path / "db.sqlite") as conn:
+        df.to_sql("defects", conn, index=False)
+        assert migrate_legacy_table(conn)
+        assert not migrate_legacy_table(conn)
+        out = pd.read_sql("SELECT * FROM defects ORDER BY SerialNumber", conn)
+    pd.testing.assert_frame_equal(out, df)
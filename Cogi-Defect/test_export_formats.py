@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+CSV/TSV exports: format detection and parity with the Excel reader.
+"""
+import io
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import export_formats
+from export_formats import detect_format, read_any_export, sniff_delimiter
+from ingest_to_db import ingest_batch
+from migrations import migrate
+from synthetic_data import write_rawdata
+
+
+@pytest.fixture(scope="module")
+def exports(tmp_path_factory):
+    out = tmp_path_factory.mktemp("exports")
+    return {fmt: write_rawdata(out, 300, fmt=fmt)[0] for fmt in ("xlsx", "csv", "tsv")}
+
+
+def test_format_and_delimiter_come_from_content(exports, tmp_path):
+    renamed = tmp_path / "Defect RawData - really-tab-separated.csv"
+    renamed.write_bytes(exports["tsv"].read_bytes())
+    assert detect_format(exports["xlsx"]) == "excel"
+    assert detect_format(renamed) == "csv" and sniff_delimiter(renamed.read_bytes()) == "\t"
+    assert sniff_delimiter(b"\xef\xbb\xbfSerialNumber;Ref_Id;DefectCode\n1,5;U1;X\n") == ";"
+
+
+@pytest.mark.parametrize("arrow", [True, False])
+def test_csv_reads_like_the_workbook(exports, monkeypatch, arrow):
+    if arrow and not export_formats.PYARROW_CSV_AVAILABLE:
+        pytest.skip("pyarrow not installed")
+    monkeypatch.setattr(export_formats, "PYARROW_CSV_AVAILABLE", arrow)
+    expected = pd.read_excel(exports["xlsx"])
+    upload = io.BytesIO(exports["tsv"].read_bytes())
+    upload.name = "upload.tsv"
+
+    pd.testing.assert_frame_equal(read_any_export(exports["csv"]), expected)
+    pd.testing.assert_frame_equal(read_any_export(upload), expected)
+
+
+def test_mixed_formats_share_the_pipeline(exports, tmp_path):
+    with sqlite3.connect(tmp_path / "aoi_defects.db") as conn:
+        migrate(conn)
+        ingest_batch(conn, tmp_path / "aoi_defects.db", [exports["xlsx"], exports["csv"]], report=lambda m: None)
+        defects = conn.execute("SELECT COUNT(*) FROM defects").fetchone()[0]
+        runs = conn.execute("SELECT file, rows FROM ingest_runs ORDER BY id").fetchall()
+
+    assert runs[0][1] == runs[1][1] == defects  # same rows: the CSV replaced the workbook's
+    assert [file for file, _ in runs] == [exports["xlsx"].name, exports["csv"].name]
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Background ingestion jobs: progress, cancellation, server restarts and
+in-memory uploads.
+"""
+import io
+import sqlite3
+import time
+
+import pytest
+
+from ingest_jobs import JobRunner, cancel_job, create_job, read_jobs, run_job
+from ingest_to_db import get_data_version
+from migrations import migrate
+from synthetic_data import write_rawdata
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = tmp_path / "aoi_defects.db"
+    with sqlite3.connect(path) as conn:
+        migrate(conn)
+    return path
+
+
+def job(db, job_id):
+    with sqlite3.connect(db) as conn:
+        return read_jobs(conn).set_index("id").loc[job_id]
+
+
+def test_job_reports_files_and_publishes(db, tmp_path):
+    paths = write_rawdata(tmp_path / "exports", 300, max_rows=200)
+    missing = tmp_path / "exports" / "Defect RawData - gone.xlsx"
+    with sqlite3.connect(db) as conn:
+        job_id = create_job(conn, [*paths, missing])
+
+    assert run_job(str(db), job_id) == "done"
+    row = job(db, job_id)
+    assert (row["done_files"], row["failed_files"], row["total_files"]) == (2, 1, 3)
+    assert row["data_version"] == 1 and "gone.xlsx" in row["message"]
+
+
+def test_cancel_queued_and_running_jobs(db, tmp_path):
+    paths = write_rawdata(tmp_path / "exports", 300, max_rows=200)
+    with sqlite3.connect(db) as conn:
+        queued, running = create_job(conn, paths), create_job(conn, paths)
+        assert cancel_job(conn, queued) == "cancelled"
+        conn.execute("UPDATE ingest_jobs SET cancel_requested = 1 WHERE id = ?", (running,))
+        conn.commit()
+
+    assert run_job(str(db), queued) == "cancelled"  # never starts
+    assert run_job(str(db), running) == "cancelled"  # stops before its first file
+    assert job(db, running)["done_files"] == 0
+    with sqlite3.connect(db) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM ingest_runs").fetchone()[0] == 0
+
+
+def test_runner_works_in_background_and_recovers_after_restart(db, tmp_path):
+    paths = write_rawdata(tmp_path / "exports", 300)
+    with sqlite3.connect(db) as conn:
+        interrupted, waiting = create_job(conn, paths), create_job(conn, paths)
+        conn.execute("UPDATE ingest_jobs SET status = 'running' WHERE id = ?", (interrupted,))
+        conn.commit()
+
+    runner = JobRunner(db)
+    try:
+        assert runner.resumed == [waiting]
+        submitted = runner.submit(paths)
+        deadline = time.monotonic() + 120
+        while job(db, submitted)["status"] in ("queued", "running"):
+            assert time.monotonic() < deadline
+            time.sleep(0.2)
+    finally:
+        runner.shutdown()
+
+    assert job(db, interrupted)["status"] == "failed"
+    assert job(db, waiting)["status"] == job(db, submitted)["status"] == "done"
+    with sqlite3.connect(db) as conn:
+        assert get_data_version(conn) == 2
+
+
+def test_uploads_ingest_from_memory_and_skip_known_content(db, tmp_path):
+    (export,) = write_rawdata(tmp_path / "exports", 300)
+    first, again = io.BytesIO(export.read_bytes()), io.BytesIO(export.read_bytes())
+    first.name, again.name = "upload.xlsx", "renamed.xlsx"
+
+    runner = JobRunner(db)
+    try:
+        job_id = runner.submit_uploads([first, again], skip_duplicates=True)
+        assert runner.futures[job_id].result(timeout=120) == "done"
+        disk_job = runner.submit([export], skip_duplicates=True)
+        assert runner.futures[disk_job].result(timeout=120) == "done"
+    finally:
+        runner.shutdown()
+
+    row = job(db, job_id)
+    assert (row["done_files"], row["skipped_files"]) == (1, 1) and "renamed.xlsx (= upload.xlsx)" in row["message"]
+    assert job(db, disk_job)["skipped_files"] == 1 and job(db, disk_job)["data_version"] == 1
+    with sqlite3.connect(db) as conn:
+        assert conn.execute("SELECT file, file_bytes FROM ingest_runs").fetchall() == [
+            ("upload.xlsx", export.stat().st_size)]
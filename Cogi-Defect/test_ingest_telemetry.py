@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Ingestion telemetry: per-stage timings per file and slow-file flags.
+"""
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from ingest_telemetry import INGEST_STAGES, flag_slow, read_ingest_runs
+from ingest_to_db import ingest_file
+from migrations import migrate
+from synthetic_data import write_rawdata
+
+
+def test_ingest_file_records_every_stage(tmp_path):
+    (export,) = write_rawdata(tmp_path, 500)
+    with sqlite3.connect(tmp_path / "db.sqlite") as conn:
+        migrate(conn)
+        df, run, _ = ingest_file(conn, export, "2025-08-01 06:00:00")
+        runs = read_ingest_runs(conn)
+
+    assert run["raw_rows"] == 500 and run["rows"] == len(df) > 0 and not run["slow"]
+    row = runs.iloc[0]
+    assert row["file"] == export.name and row["file_bytes"] == export.stat().st_size
+    stage_seconds = [row[f"{stage}_s"] for stage in INGEST_STAGES]
+    assert all(s > 0 for s in stage_seconds)
+    assert row["total_s"] == pytest.approx(sum(stage_seconds), abs=1e-3)
+    assert row["rows_per_s"] == pytest.approx(500 / row["total_s"], rel=0.01)
+
+
+def test_slow_against_median_of_earlier_files():
+    runs = pd.DataFrame({"rows_per_s": [1000, 1100, 900, 1000, 400, 1000, 600]})
+    flagged = flag_slow(runs)
+    assert flagged["typical_rows_per_s"].isna().tolist()[:4] == [True, True, True, False]
+    assert flagged["slow"].tolist() == [False, False, False, False, True, False, False]
+
+
+def test_history_before_migration_is_empty(tmp_path):
+    with sqlite3.connect(tmp_path / "db.sqlite") as conn:
+        assert read_ingest_runs(conn).empty
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Watch-folder ingestion: settle detection, batching, dedup and shutdown.
+"""
+import sqlite3
+import threading
+import time
+import zipfile
+
+from ingest_to_db import get_data_version
+from ingest_watcher import FolderScanner, IngestWatcher
+from synthetic_data import write_rawdata
+
+
+def quiet(_message):
+    pass
+
+
+def ingested_files(db):
+    with sqlite3.connect(db) as conn:
+        return conn.execute("SELECT COUNT(*) FROM ingest_runs").fetchone()[0]
+
+
+def test_file_is_ready_once_unchanged_for_settle_period(tmp_path):
+    scanner = FolderScanner(tmp_path, settle_s=10)
+    (export,) = write_rawdata(tmp_path, 200)
+    (tmp_path / "Defect RawData - partial.xlsx").write_bytes(b"PK\x03\x04 still copying")
+    (tmp_path / "~$Defect RawData - open.xlsx").write_bytes(b"lock")
+
+    assert scanner.scan(now=0) == []
+    assert scanner.scan(now=5) == []
+    assert scanner.scan(now=11) == [export]  # the partial workbook is not a complete zip
+    scanner.claim(export)
+    assert scanner.scan(now=30) == []
+
+    with zipfile.ZipFile(export, "a") as zf:  # rewritten: a new signature to settle
+        zf.writestr("extra.txt", "x")
+    assert scanner.scan(now=31) == [] and scanner.scan(now=42) == [export]
+
+
+def test_once_ingests_and_skips_known_files_on_restart(tmp_path):
+    db = tmp_path / "aoi_defects.db"
+    write_rawdata(tmp_path, 300, max_rows=200)
+    watcher = IngestWatcher(tmp_path, db, settle_s=0, report=quiet)
+    assert watcher.run_once() == 2 and watcher.batches == 1
+
+    with sqlite3.connect(db) as conn:
+        assert get_data_version(conn) == 1
+        assert conn.execute("SELECT COUNT(*) FROM ingest_runs").fetchone()[0] == 2
+    assert IngestWatcher(tmp_path, db, settle_s=0, report=quiet).run_once() == 0
+
+
+def test_service_batches_arrivals_and_stops_gracefully(tmp_path):
+    db = tmp_path / "aoi_defects.db"
+    watcher = IngestWatcher(tmp_path, db, interval_s=0.05, settle_s=0.1, batch_window_s=0.5,
+                            queue_size=2, report=quiet)
+    service = threading.Thread(target=watcher.run)
+    service.start()
+    try:
+        write_rawdata(tmp_path, 300, max_rows=200)
+        with zipfile.ZipFile(tmp_path / "Defect RawData - broken.xlsx", "w") as zf:
+            zf.writestr("not-a-workbook.txt", "x")
+        deadline = time.monotonic() + 60
+        while not (watcher.failed and ingested_files(db) == 2):
+            assert time.monotonic() < deadline
+            time.sleep(0.1)
+    finally:
+        watcher.stop.set()
+        service.join(timeout=60)
+
+    assert not service.is_alive()
+    assert [p.name for p in watcher.failed] == ["Defect RawData - broken.xlsx"]
+    assert ingested_files(db) == 2
+    with sqlite3.connect(db) as conn:
+        assert get_data_version(conn) == watcher.batches
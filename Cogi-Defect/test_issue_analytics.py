@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Tracker analytics in SQL: KPIs, weekly closure, cycle times and the backlog.
+"""
+import datetime as dt
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from issue_analytics import backlog_series, cycle_time_percentiles, issue_kpis, weekly_closure
+from issues_db import rebuild_issue_backlog, save_issue
+from migrations import migrate
+from query_backend import PandasBackend
+
+JULY = dt.date(2025, 7, 1), dt.date(2025, 7, 31)
+
+
+@pytest.fixture()
+def conn(tmp_path):
+    with sqlite3.connect(tmp_path / "db.sqlite") as conn:
+        migrate(conn)
+        for i in range(12):
+            issue_id = save_issue(conn, {
+                "date_reported": f"2025-07-{1 + 2 * i:02d}",
+                "status": "Open",
+                "due_date": "2025-07-10" if i % 2 else "2099-01-01",
+            })
+            if i % 3 == 0:
+                save_issue(conn, {"id": issue_id, "status": "Closed"})
+        yield conn
+
+
+def test_kpis_and_weekly_closure_match_pandas(conn):
+    issues = pd.read_sql("SELECT * FROM issues", conn)
+    kpis = issue_kpis(conn, *JULY, now=dt.datetime(2025, 8, 1))
+    expected_weekly = PandasBackend(pd.DataFrame()).weekly_closure(issues)
+
+    assert kpis["total"] == 12
+    assert kpis["overdue"] == ((issues["due_date"] < "2025-08-01") & (issues["status"] == "Open")).sum()
+    assert kpis["avg_resolution_days"] == 0
+    pd.testing.assert_frame_equal(weekly_closure(conn, *JULY), expected_weekly, check_dtype=False)
+
+
+def test_cycle_times_and_backlog(conn):
+    cycle = cycle_time_percentiles(conn, *JULY)
+    today = dt.date.fromisoformat(conn.execute("SELECT date('now')").fetchone()[0])  # changelog days are UTC
+    incremental = backlog_series(conn, today, today)
+    with conn:
+        rebuild_issue_backlog(conn)
+
+    assert list(cycle) == ["p50", "p75", "p90", "p95"] and cycle["p95"] < 1
+    assert incremental[["opened", "closed", "backlog"]].values.tolist() == [[12, 4, 8]]
+    pd.testing.assert_frame_equal(backlog_series(conn, today, today), incremental)
+
+
+def test_issue_created_closed_leaves_backlog_unchanged(tmp_path):
+    with sqlite3.connect(tmp_path / "db.sqlite") as conn:
+        migrate(conn)
+        today = dt.date.fromisoformat(conn.execute("SELECT date('now')").fetchone()[0])
+        save_issue(conn, {"date_reported": "2025-07-01", "status": "Closed"})
+        reopened = save_issue(conn, {"date_reported": "2025-07-02", "status": "Closed"})
+        save_issue(conn, {"id": reopened, "status": "Open"})
+        save_issue(conn, {"date_reported": "2025-07-03", "status": "Open"})
+        incremental = backlog_series(conn, today, today)
+        with conn:
+            rebuild_issue_backlog(conn)
+
+        assert incremental[["opened", "closed", "backlog"]].values.tolist() == [[2, 0, 2]]
+        pd.testing.assert_frame_equal(backlog_series(conn, today, today), incremental)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Issue ↔ defect links and before/after defect rates around each action.
+"""
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from ingest_to_db import ensure_table, upsert_df
+from issue_effectiveness import effectiveness, link_issues
+from issues_db import save_issue
+from migrations import migrate
+
+
+def defects(days_per_ref):
+    """Real defects on line L1 of part PN1: {ref: [day of month, ...]}."""
+    rows = [(ref, day) for ref, days in days_per_ref.items() for day in days]
+    return pd.DataFrame({
+        "SerialNumber": [f"SN{i}" for i in range(len(rows))],
+        "Ref_Id": [ref for ref, _ in rows],
+        "DefectCode": "MISSING",
+        "Outcome": "Real",
+        "LineName": "L1",
+        "ComponentPN": "PN1",
+        "EventDate": [f"2025-07-{day:02d} 10:00:00" for _, day in rows],
+    })
+
+
+@pytest.fixture
+def conn(tmp_path):
+    with sqlite3.connect(tmp_path / "db.sqlite") as conn:
+        migrate(conn)
+        # C1: 2 defects/day on days 1-10, then 1 on day 14; R5 only after day 10
+        df = defects({"C1": [d for d in range(1, 11) for _ in range(2)] + [14], "R5": [12, 13]})
+        ensure_table(conn, df)
+        upsert_df(conn, df)
+        yield conn
+
+
+def test_save_links_issue_by_part_ref_and_line(conn):
+    by_ref = save_issue(conn, {"date_reported": "2025-07-11", "status": "Open",
+                               "component_pn": "PN1", "ref_id": "C1", "line_name": "L1"})
+    any_ref = save_issue(conn, {"date_reported": "2025-07-11", "status": "Open", "component_pn": " PN1 "})
+    other_line = save_issue(conn, {"date_reported": "2025-07-11", "status": "Open",
+                                   "component_pn": "PN1", "line_name": "L2"})
+    links = conn.execute("SELECT issue_id, Ref_Id, n FROM issue_defect_links ORDER BY 1, 2").fetchall()
+    assert links == [(by_ref, "C1", 21), (any_ref, "C1", 21), (any_ref, "R5", 2)]
+    assert other_line not in {row[0] for row in links}
+
+    # Changing the part fields relinks in the same save
+    save_issue(conn, {"id": other_line, "line_name": "L1", "ref_id": "R5"})
+    assert conn.execute("SELECT Ref_Id FROM issue_defect_links WHERE issue_id = ?", (other_line,)).fetchall() == [("R5",)]
+    assert link_issues(conn) == 4
+
+
+def test_rates_before_and_after_action_day(conn):
+    issue_id = save_issue(conn, {"date_reported": "2025-07-11", "status": "Open",
+                                 "component_pn": "PN1", "ref_id": "C1", "line_name": "L1"})
+    row = effectiveness(conn, [issue_id], window_days=5).iloc[0]
+
+    # before: days 6-10 (10 defects / 5 days); after: days 12-14 of data (1 / 3)
+    assert row["action_day"] == "2025-07-11"
+    assert (row["before_n"], row["before_days"], row["after_n"], row["after_days"]) == (10, 5, 1, 3)
+    assert row["change_pct"] == pytest.approx((1 / 3 - 2) / 2 * 100)
+
+    # Closing the issue moves the action day to the closing day (today): no data after it yet
+    save_issue(conn, {"id": issue_id, "status": "Closed"})
+    closed = effectiveness(conn, [issue_id], window_days=5).iloc[0]
+    assert closed["action_day"] != "2025-07-11" and pd.isna(closed["after_rate"])
+
+
+def test_unlinked_issues_are_left_out(conn):
+    save_issue(conn, {"date_reported": "2025-07-11", "status": "Open", "description": "no part"})
+    assert effectiveness(conn).empty
+    assert effectiveness(conn, outcomes=()).empty
+
+
+def test_ref_links_its_pins(tmp_path):
+    with sqlite3.connect(tmp_path / "db.sqlite") as conn:
+        migrate(conn)
+        df = defects({"D1001": [1], "D1001.1": [2, 3], "D1001.2": [4], "D10010": [5], "D1001-X": [6]})
+        ensure_table(conn, df)
+        upsert_df(conn, df)
+        base = save_issue(conn, {"date_reported": "2025-07-11", "status": "Open",
+                                 "component_pn": "PN1", "ref_id": "D1001"})
+        pin = save_issue(conn, {"date_reported": "2025-07-11", "status": "Open",
+                                "component_pn": "PN1", "ref_id": "D1001.2"})
+
+        links = conn.execute("SELECT issue_id, Ref_Id, n FROM issue_defect_links ORDER BY 1, 2").fetchall()
+        assert links == [(base, "D1001", 1), (base, "D1001.1", 2), (base, "D1001.2", 1), (pin, "D1001.2", 1)]
+        assert effectiveness(conn, [base])["before_n"].tolist() == [4]
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Full-text issue search: FTS5 tables kept in sync by triggers, ranked results.
+"""
+import sqlite3
+
+import pytest
+
+from issue_search import fts5_available, fts_query, search_issues
+from issues_db import save_issue
+from migrations import migrate
+
+
+@pytest.fixture()
+def conn(tmp_path):
+    with sqlite3.connect(tmp_path / "db.sqlite") as conn:
+        if not fts5_available(conn):
+            pytest.skip("SQLite built without FTS5")
+        migrate(conn)
+        yield conn
+
+
+def test_search_follows_saves(conn):
+    first = save_issue(conn, {"date_reported": "2025-07-01", "status": "Open",
+                              "description": "Solder bridging on U7 after stencil change"})
+    second = save_issue(conn, {"date_reported": "2025-07-02", "status": "Open",
+                               "description": "Tombstoning on 0402 caps"})
+    save_issue(conn, {"id": second, "root_cause_final": "Uneven stencil aperture"})
+
+    assert search_issues(conn, "bridg")["id"].tolist() == [first]
+    assert set(search_issues(conn, "stencil")["id"]) == {first, second}
+
+    save_issue(conn, {"id": first, "description": "Reworked"})
+    hits = search_issues(conn, "bridging")
+    assert hits["id"].tolist() == [first]                 # now only via the changelog
+    assert hits["match"].iloc[0].startswith("description:")
+
+
+def test_user_input_is_never_fts_syntax(conn):
+    assert fts_query('solder "OR (NEAR') == '"solder"* "OR"* "NEAR"*'
+    assert search_issues(conn, '") AND *').empty
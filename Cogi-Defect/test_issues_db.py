@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Issue tracker storage: paged issue reads and transactional saves.
+"""
+import datetime as dt
+import sqlite3
+
+import pytest
+
+from issues_db import IssueConflictError, issue_lines, query_issue_page, read_issues, save_issue
+from migrations import migrate
+
+JULY = dt.date(2025, 7, 1), dt.date(2025, 7, 31)
+
+
+def seed(conn, n=30):
+    migrate(conn)
+    conn.executemany(
+        "INSERT INTO issues (date_reported, line_name, issue_category, status) VALUES (?, ?, ?, ?)",
+        [(f"2025-07-{1 + i % 28:02d}", f"L{i % 3}", "Other", ["Open", "Closed"][i % 2]) for i in range(n)],
+    )
+    conn.commit()
+
+
+def test_pages_cover_matches_once(tmp_path):
+    with sqlite3.connect(tmp_path / "db.sqlite") as conn:
+        seed(conn)
+        pages = [query_issue_page(conn, *JULY, statuses=["Open"], sort="date_reported", page=p, page_size=4)
+                 for p in range(5)]
+
+    totals = {total for _, total in pages}
+    ids = [i for page_df, _ in pages for i in page_df["id"]]
+    assert totals == {15}
+    assert len(ids) == len(set(ids)) == 15
+    assert len(pages[0][0]) == 4 and pages[-1][0].empty
+
+
+def test_sort_and_filters_run_in_sql(tmp_path):
+    with sqlite3.connect(tmp_path / "db.sqlite") as conn:
+        seed(conn)
+        page_df, total = query_issue_page(conn, dt.date(2025, 7, 1), dt.date(2025, 7, 10),
+                                          lines=["L1"], sort="id", descending=False, page_size=100)
+        with pytest.raises(ValueError):
+            query_issue_page(conn, *JULY, sort="id; DROP TABLE issues")
+
+    assert total == len(page_df) > 0
+    assert page_df["id"].is_monotonic_increasing
+    assert set(page_df["line_name"]) == {"L1"}
+    assert page_df["date_reported"].max() <= "2025-07-10"
+
+
+def test_sidebar_filters_use_indexes(tmp_path):
+    with sqlite3.connect(tmp_path / "db.sqlite") as conn:
+        seed(conn)
+        issues = read_issues(conn, *JULY, statuses=["Closed"], categories=["Other"])
+        slim = read_issues(conn, *JULY, statuses=["Closed"], categories=["Other"], columns=("id", "status"))
+        lines = issue_lines(conn, dt.date(2025, 7, 1), dt.date(2025, 7, 1))
+        plan = " ".join(r[-1] for r in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM issues WHERE date_reported >= ? AND date_reported < ?", ("a", "b")
+        ))
+        history = " ".join(r[-1] for r in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM issue_changelog WHERE issue_id = ? ORDER BY changed_at DESC", (1,)
+        ))
+
+    assert len(issues) == 15 and set(issues["status"]) == {"Closed"}
+    assert slim.columns.tolist() == ["id", "status"] and slim["id"].tolist() == issues["id"].tolist()
+    assert lines == ["L0", "L1"]
+    assert "idx_issues_date_reported" in plan
+    assert "idx_issue_changelog_issue" in history
+
+
+def test_save_logs_creation_and_changed_fields(tmp_path):
+    with sqlite3.connect(tmp_path / "db.sqlite") as conn:
+        migrate(conn)
+        issue_id = save_issue(conn, {"date_reported": "2025-07-01", "status": "Open", "line_name": "L1"})
+        save_issue(conn, {"id": issue_id, "date_reported": "2025-07-01", "status": "Closed", "line_name": "L2"})
+        log = conn.execute(
+            "SELECT field_name, old_value, new_value FROM issue_changelog WHERE issue_id = ? ORDER BY id",
+            (issue_id,),
+        ).fetchall()
+        status = conn.execute("SELECT status FROM issues WHERE id = ?", (issue_id,)).fetchone()[0]
+
+    assert status == "Closed"
+    assert log == [("status", "", "Created"), ("status", "Open", "Closed"), ("line_name", "L1", "L2")]
+
+
+def test_failed_changelog_rolls_back_update(tmp_path):
+    with sqlite3.connect(tmp_path / "db.sqlite") as conn:
+        migrate(conn)
+        issue_id = save_issue(conn, {"date_reported": "2025-07-01", "status": "Open"})
+        conn.execute("CREATE TRIGGER no_log BEFORE INSERT ON issue_changelog BEGIN SELECT RAISE(ABORT, 'x'); END;")
+        with pytest.raises(sqlite3.IntegrityError):
+            save_issue(conn, {"id": issue_id, "status": "Closed"})
+        status = conn.execute("SELECT status FROM issues WHERE id = ?", (issue_id,)).fetchone()[0]
+
+    assert status == "Open"
+
+
+def test_stale_edit_is_rejected(tmp_path):
+    with sqlite3.connect(tmp_path / "db.sqlite") as conn:
+        migrate(conn)
+        issue_id = save_issue(conn, {"date_reported": "2025-07-01", "status": "Open"})
+        save_issue(conn, {"id": issue_id, "status": "In Progress"}, expected_version=0)  # -> version 1
+        with pytest.raises(IssueConflictError):
+            save_issue(conn, {"id": issue_id, "status": "Closed"}, expected_version=0)
+        status, version = conn.execute("SELECT status, version FROM issues WHERE id = ?", (issue_id,)).fetchone()
+
+    assert (status, version) == ("In Progress", 1)
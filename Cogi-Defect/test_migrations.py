@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Schema migrations: ordered, recorded in schema_version, applied once.
+"""
+import sqlite3
+
+import pandas as pd
+
+from migrations import MIGRATIONS, migrate, schema_version
+
+
+def objects(conn, kind):
+    return {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = ?", (kind,))}
+
+
+def test_fresh_database_gets_every_migration(tmp_path):
+    with sqlite3.connect(tmp_path / "db.sqlite") as conn:
+        assert schema_version(conn) == 0
+        assert migrate(conn) == MIGRATIONS[-1][0]
+        applied = [r[0] for r in conn.execute("SELECT version FROM schema_version ORDER BY version")]
+        assert migrate(conn) == MIGRATIONS[-1][0]  # nothing left to do
+        rows = conn.execute("SELECT COUNT(*) FROM schema_version").fetchone()[0]
+
+        assert applied == [v for v, _, _ in MIGRATIONS] and rows == len(MIGRATIONS)
+        assert {"issues", "issue_changelog"} <= objects(conn, "table")
+        assert "idx_issue_changelog_issue" in objects(conn, "index")
+
+
+def test_legacy_database_is_upgraded(tmp_path):
+    df = pd.DataFrame({
+        "SerialNumber": ["SN1", "SN2"],
+        "Ref_Id": "C1",
+        "DefectCode": "MISSING",
+        "Outcome": ["Real", "False"],
+        "LineName": "L1",
+        "EventDate": "2025-07-01 08:00:00",
+    })
+    with sqlite3.connect(tmp_path / "db.sqlite") as conn:
+        df.to_sql("defects", conn, index=False)
+        migrate(conn)
+        out = pd.read_sql("SELECT * FROM defects ORDER BY SerialNumber", conn)
+        daily = conn.execute("SELECT SUM(n) FROM daily_outcome_counts").fetchone()[0]
+
+        assert "defects" in objects(conn, "view")
+        assert "idx_defect_facts_eventdate" in objects(conn, "index")
+    pd.testing.assert_frame_equal(out, df)
+    assert daily == 2
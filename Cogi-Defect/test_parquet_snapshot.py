@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Parquet snapshot: month partitions, manifest stats and window pruning.
+"""
+import datetime as dt
+import sqlite3
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from parquet_snapshot import latest_event_date, partition_files, read_snapshot, snapshot_is_fresh, write_snapshot
+
+
+@pytest.fixture()
+def db_path(tmp_path):
+    path = tmp_path / "aoi_defects.db"
+    dates = pd.date_range("2025-05-20", "2025-08-10", freq="6h")
+    df = pd.DataFrame({
+        "SerialNumber": [f"SN{i}" for i in range(len(dates))],
+        "Ref_Id": "C1",
+        "DefectCode": "MISSING",
+        "Outcome": "Real",
+        "EventDate": dates.strftime("%Y-%m-%d %H:%M:%S"),
+    })
+    with sqlite3.connect(path) as conn:
+        df.to_sql("defects", conn, index=False)
+        write_snapshot(conn, path, data_version=4)
+    return path
+
+
+def test_manifest_and_freshness(db_path):
+    assert snapshot_is_fresh(db_path, 4)
+    assert not snapshot_is_fresh(db_path, 5)
+    assert latest_event_date(db_path) == dt.date(2025, 8, 10)
+
+
+def test_window_prunes_partitions(db_path):
+    files = partition_files(db_path, dt.date(2025, 6, 28), dt.date(2025, 7, 3))
+    assert [f.parent.name for f in files] == ["month=2025-06", "month=2025-07"]
+
+    week = read_snapshot(db_path, dt.date(2025, 6, 28), dt.date(2025, 7, 3))
+    assert len(week) == 6 * 4
+    assert week["EventDate"].min() == pd.Timestamp("2025-06-28")
+    assert week["EventDate"].max() == pd.Timestamp("2025-07-03 18:00")
+    assert len(read_snapshot(db_path)) == len(pd.date_range("2025-05-20", "2025-08-10", freq="6h"))
+
+
+def test_incremental_refresh_keeps_other_months(db_path):
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("DELETE FROM defects WHERE EventDate LIKE '2025-06-%'")
+        write_snapshot(conn, db_path, data_version=5, months={"2025-06"})
+    assert [f.parent.name for f in partition_files(db_path)] == ["month=2025-05", "month=2025-07", "month=2025-08"]
+
+
+def test_compaction_archives_old_months(db_path):
+    from compact_db import main
+    from rollups import read_rollups
+
+    main(["--db", str(db_path), "--max-age-days", "0", "--as-of", "2025-07-15"])
+    with sqlite3.connect(db_path) as conn:
+        hot = conn.execute("SELECT MIN(EventDate) FROM defects").fetchone()[0]
+        june = read_rollups(conn, dt.date(2025, 6, 1), dt.date(2025, 6, 30), by=("Outcome",))
+    assert hot.startswith("2025-07-01")
+    assert june["n"].tolist() == [30 * 4]
+
+    # Drill-down across the archive boundary still sees every row
+    window = read_snapshot(db_path, dt.date(2025, 6, 28), dt.date(2025, 7, 3))
+    assert len(window) == 6 * 4
+    assert [f.parent.name for f in partition_files(db_path)] == ["month=2025-07", "month=2025-08"]
+
+
+def test_reingest_leaves_archived_months_out(tmp_path):
+    from compact_db import main
+    from ingest_to_db import ingest_batch
+    from migrations import migrate
+    from rollups import outcome_counts_between
+
+    dates = pd.date_range("2025-06-01", "2025-07-31 18:00", freq="6h")
+    export = tmp_path / "Defect RawData - 2025-08-01.csv"
+    pd.DataFrame({
+        "SerialNumber": [f"SN{i}" for i in range(len(dates))],
+        "Ref_Id": "C1",
+        "DefectCode": "MISSING",
+        "ReworkStatus": "False call",
+        "EventDate": dates.strftime("%Y-%m-%d %H:%M:%S"),
+    }).to_csv(export, index=False)
+    db_path = tmp_path / "aoi_defects.db"
+    summer = dt.date(2025, 6, 1), dt.date(2025, 7, 31)
+    with sqlite3.connect(db_path) as conn:
+        migrate(conn)
+        ingest_batch(conn, db_path, [export], report=lambda m: None)
+    main(["--db", str(db_path), "--max-age-days", "0", "--as-of", "2025-07-15"])
+
+    messages = []
+    with sqlite3.connect(db_path) as conn:
+        ingest_batch(conn, db_path, [export], report=messages.append)
+        hot = conn.execute("SELECT COUNT(*), MIN(EventDate) FROM defects").fetchone()
+        counts = outcome_counts_between(conn, *summer)
+    assert hot == (31 * 4, "2025-07-01 00:00:00")
+    assert counts == {"False": len(dates)}
+    assert len(read_snapshot(db_path, *summer)) == len(dates)
+    assert any("120 row(s) from archived months left out" in m for m in messages)
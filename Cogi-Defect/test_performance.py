@@ -2,11 +2,14 @@
 """
 Quick performance test for the AOI dashboard
 """
+import json
 import time
 import sqlite3
 import pandas as pd
 from pathlib import Path
 
+from benchmark import STAGES, compare, main as run_benchmark
+
 def test_db_load():
     """Test database loading performance"""
     db_path = Path("aoi_defects.db")
@@ -54,5 +57,27 @@ def test_db_load():
     else:
         print("✅ Performance looks good!")
 
+def test_benchmark_on_synthetic_data(tmp_path):
+    """Every pipeline stage runs on generated data and lands in the JSON results"""
+    out, baseline = tmp_path / "results.json", tmp_path / "baseline.json"
+    args = ["--rows", "1000", "--repeat", "1", "--workdir", str(tmp_path), "--baseline", str(baseline)]
+    assert run_benchmark([*args, "--out", str(out), "--update-baseline"]) == 0
+
+    result = json.loads(out.read_text())
+    assert {stage.split(".")[0] for stage in result["timings"]} == set(STAGES)
+    assert result["dataset"]["classified_rows"] == result["dataset"]["loaded_rows"] > 0
+    assert json.loads(baseline.read_text())["1000"]["timings"] == result["timings"]
+
+    # A second run reuses the generated exports
+    assert run_benchmark([*args, "--out", str(out), "--tolerance", "100"]) == 0
+    assert "generate" not in json.loads(out.read_text())["timings"]
+
+
+def test_regression_needs_ratio_and_delta():
+    baseline = {"load": 0.5, "filter": 0.01, "pivot": 1.0}
+    current = {"load": 1.0, "filter": 0.03, "pivot": 1.2, "new_stage": 9.0}
+    assert [r["stage"] for r in compare(current, baseline, tolerance=0.5)] == ["load"]
+
+
 if __name__ == "__main__":
     test_db_load() 
\ No newline at end of file
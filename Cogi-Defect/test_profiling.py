@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Per-rerun profiling: stage timings, cache hits/misses and cProfile dumps.
+"""
+import pandas as pd
+
+import profiling
+from profiling import begin_rerun, cached_stage, end_rerun, stage, timed
+
+
+@cached_stage("double")
+def double(df: pd.DataFrame) -> pd.DataFrame:
+    return df * 2
+
+
+@timed("section:demo")
+def render(df: pd.DataFrame) -> int:
+    with stage("inner", rows=len(df)):
+        return len(double(df))
+
+
+def test_off_by_default_records_nothing():
+    df = pd.DataFrame({"a": range(3)})
+    begin_rerun(enabled=False)
+    assert render(df) == 3 and profiling.current() is None
+
+
+def test_stages_cache_hits_and_rows():
+    df = pd.DataFrame({"a": range(5)})
+    double.clear()
+    profile = begin_rerun(enabled=True)
+    render(df)
+    render(df)
+    end_rerun(profile)
+
+    table = profile.table().set_index("stage")
+    assert list(table.index) == ["double", "inner", "section:demo", "rerun (total)"]
+    assert table.loc["double", "cache"] == "1 hit / 1 miss"
+    assert table.loc["double", "calls"] == 2 and table.loc["double", "rows"] == 10
+    assert table.loc["section:demo", "seconds"] >= table.loc["inner", "seconds"]
+    assert profiling.current() is None  # the next rerun starts clean
+
+
+def test_cprofile_dump(tmp_path):
+    profile = begin_rerun(enabled=True, cprofile=True)
+    render(pd.DataFrame({"a": range(2)}))
+    end_rerun(profile, out_dir=tmp_path)
+    assert profile.stats_path.parent == tmp_path and profile.stats_path.stat().st_size > 0
+    assert "render" in profile.stats_text
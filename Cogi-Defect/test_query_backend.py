@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Equivalence tests: the DuckDB query backend must return exactly what the
+pandas reference backend returns for the same data and filters.
+"""
+import datetime as dt
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("duckdb")
+
+from query_backend import DuckDBBackend, FilterSpec, PandasBackend, make_filter_spec
+
+
+def synthetic_defects(n: int = 4000, seed: int = 7) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    refs = [f"C{i}" for i in range(40)] + [f"C{i}.{p}" for i in range(10) for p in (1, 2)]
+    start = pd.Timestamp("2025-07-01")
+    return pd.DataFrame({
+        "SerialNumber": [f"SN{i:05d}" for i in rng.integers(0, 300, n)],
+        "Ref_Id": rng.choice(refs, n),
+        "DefectCode": rng.choice(["MISSING", "BRIDGE", "SHIFT", "POLARITY"], n),
+        "Outcome": rng.choice(["False", "Real", "Suspect", "Fixed from previously caught"], n, p=[.6, .2, .15, .05]),
+        "PartNumber": rng.choice(["PN-A", "PN-B"], n),
+        "ComponentPN": rng.choice([f"CMP-{i:03d}" for i in range(25)], n, p=np.r_[[.3, .2], [.5 / 23] * 23]),
+        "MachineName": rng.choice(["AOI-1", "AOI-2", "AOI-3"], n),
+        "EventDate": start + pd.to_timedelta(rng.integers(0, 40 * 24 * 3600, n), unit="s"),
+    })
+
+
+SPECS = [
+    FilterSpec(),
+    make_filter_spec({"MachineName": ["AOI-1", "AOI-3"]}, "EventDate",
+                     dt.datetime(2025, 7, 5), dt.datetime(2025, 7, 20, 23, 59), ["Real", "False"]),
+    make_filter_spec({"PartNumber": ["PN-B"]}, None, None, None, ["Suspect"]),
+]
+
+
+@pytest.fixture(scope="module")
+def backends():
+    df = synthetic_defects()
+    return PandasBackend(df), DuckDBBackend.for_frame(df)
+
+
+@pytest.mark.parametrize("spec", SPECS)
+def test_outcome_counts(backends, spec):
+    pdb, ddb = backends
+    pd.testing.assert_series_equal(pdb.outcome_counts(spec), ddb.outcome_counts(spec))
+
+
+@pytest.mark.parametrize("spec", SPECS)
+def test_top_counts(backends, spec):
+    pdb, ddb = backends
+    pd.testing.assert_frame_equal(pdb.top_counts("ComponentPN", spec, 5), ddb.top_counts("ComponentPN", spec, 5))
+
+
+@pytest.mark.parametrize("spec", SPECS)
+@pytest.mark.parametrize("dedup", [True, False])
+def test_top_ref_ids(backends, spec, dedup):
+    pdb, ddb = backends
+    pd.testing.assert_frame_equal(pdb.top_ref_ids(spec, 20, dedup), ddb.top_ref_ids(spec, 20, dedup))
+
+
+@pytest.mark.parametrize("spec", SPECS)
+def test_pivot_top_components(backends, spec):
+    pdb, ddb = backends
+    pd.testing.assert_frame_equal(pdb.pivot_top_components(spec), ddb.pivot_top_components(spec),
+                                  check_dtype=False)
+
+
+def test_weekly_closure(backends):
+    pdb, ddb = backends
+    rng = np.random.default_rng(3)
+    issues = pd.DataFrame({
+        "date_reported": pd.date_range("2025-06-01", periods=90, freq="D").date,
+        "status": rng.choice(["Open", "Closed", "In Progress"], 90),
+    })
+    pd.testing.assert_frame_equal(pdb.weekly_closure(issues), ddb.weekly_closure(issues), check_dtype=False)
+
+
+@pytest.mark.parametrize("folder", ["share", "O'Brien share"])
+@pytest.mark.parametrize("data_version", [1, 2])  # fresh snapshot / attached SQLite file
+def test_database_backend_matches_frame(tmp_path, folder, data_version):
+    pytest.importorskip("pyarrow")
+    from parquet_snapshot import write_snapshot
+
+    df = synthetic_defects(1500)
+    (tmp_path / folder).mkdir()
+    db_path = tmp_path / folder / "aoi_defects.db"
+    with sqlite3.connect(db_path) as conn:
+        df.assign(EventDate=df["EventDate"].dt.strftime("%Y-%m-%d %H:%M:%S")).to_sql("defects", conn, index=False)
+        write_snapshot(conn, db_path, data_version=1)
+
+    ddb = DuckDBBackend.for_database(db_path, data_version=data_version)
+    spec = SPECS[1]
+    pd.testing.assert_frame_equal(PandasBackend(df).top_ref_ids(spec), ddb.top_ref_ids(spec))
+    pd.testing.assert_series_equal(PandasBackend(df).outcome_counts(spec), ddb.outcome_counts(spec))
+
+
+@pytest.mark.parametrize("spec", SPECS)
+def test_compact_frame_gives_same_results(spec):
+    from defect_data import compact_frame
+
+    df = synthetic_defects()
+    small = compact_frame(df)
+    before, after = small.attrs["memory_mb"]
+    assert after < before / 2
+    raw, compact = PandasBackend(df), PandasBackend(small)
+    loose = dict(check_dtype=False, check_categorical=False, check_index_type=False)
+    frame_loose = dict(loose, check_column_type=False)
+    pd.testing.assert_series_equal(raw.outcome_counts(spec), compact.outcome_counts(spec), **loose)
+    pd.testing.assert_frame_equal(raw.top_counts("ComponentPN", spec, 5),
+                                  compact.top_counts("ComponentPN", spec, 5), **frame_loose)
+    pd.testing.assert_frame_equal(raw.top_ref_ids(spec, 20, False), compact.top_ref_ids(spec, 20, False), **frame_loose)
+    pd.testing.assert_frame_equal(raw.pivot_top_components(spec), compact.pivot_top_components(spec), **frame_loose)
@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+"""
+AppTest rerun benchmark: the scripted interactions still find their widgets.
+"""
+import sqlite3
+
+from rerun_benchmark import PAGES, SCRIPTS, build_db, flat_timings, run
+
+
+def test_synthetic_db_has_linked_issues(tmp_path):
+    rows = build_db(tmp_path / "aoi_defects.db", 1_000, n_issues=5)
+    with sqlite3.connect(tmp_path / "aoi_defects.db") as conn:
+        assert conn.execute("SELECT COUNT(*) FROM defects").fetchone()[0] == rows > 0
+        assert conn.execute("SELECT COUNT(*) FROM issues").fetchone()[0] == 5
+        assert conn.execute("SELECT COUNT(DISTINCT issue_id) FROM issue_defect_links").fetchone()[0] == 5
+
+
+def test_every_interaction_reruns_each_page(tmp_path):
+    tier = run(1_000, 0, tmp_path, rounds=1, pages=PAGES)
+    for page in PAGES:
+        result = tier["pages"][page]
+        assert list(result["interactions"]) == [name for name, _ in SCRIPTS[page]()]
+        assert result["reruns"]["n"] == len(SCRIPTS[page]()) and result["peak_rss_mb"] > 0
+    assert set(flat_timings(tier)) == {f"{page}:{name}" for page in PAGES for name, _ in SCRIPTS[page]()}
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Daily outcome counts: maintained by upsert_df, answered from prefix sums.
+"""
+import datetime as dt
+import sqlite3
+
+import pandas as pd
+
+from ingest_to_db import ensure_table, upsert_df
+from rollups import outcome_counts_between, read_daily_counts
+
+
+def frame(outcomes, day_of_row):
+    n = len(outcomes)
+    return pd.DataFrame({
+        "SerialNumber": [f"SN{i}" for i in range(n)],
+        "Ref_Id": "C1",
+        "DefectCode": "MISSING",
+        "Outcome": outcomes,
+        "LineName": ["L1" if i % 2 else "L2" for i in range(n)],
+        "EventDate": [f"2025-07-{d:02d} 10:00:00" for d in day_of_row],
+    })
+
+
+def test_counts_follow_upserts(tmp_path):
+    july = dt.date(2025, 7, 1), dt.date(2025, 7, 31)
+    with sqlite3.connect(tmp_path / "db.sqlite") as conn:
+        df = frame(["Real", "False", "False", "Real", "Suspect"], [1, 1, 2, 3, 3])
+        ensure_table(conn, df)
+        upsert_df(conn, df)
+        assert outcome_counts_between(conn, *july) == {"Real": 2, "False": 2, "Suspect": 1}
+        assert outcome_counts_between(conn, dt.date(2025, 7, 2), dt.date(2025, 7, 3)) == {"False": 1, "Real": 1, "Suspect": 1}
+        assert outcome_counts_between(conn, dt.date(2025, 7, 4), dt.date(2025, 7, 9)) == {}
+
+        # Re-ingesting day 3 with new outcomes replaces, not adds
+        upsert_df(conn, frame(["Real", "False", "False", "False", "False"], [1, 1, 2, 3, 3]))
+        assert outcome_counts_between(conn, *july) == {"Real": 1, "False": 4}
+
+        by_line = read_daily_counts(conn, *july, by=("LineName",))
+    assert by_line.set_index("LineName")["n"].to_dict() == {"L1": 2, "L2": 3}
+
+
+def test_moved_rows_leave_their_old_day(tmp_path):
+    july = dt.date(2025, 7, 1), dt.date(2025, 7, 31)
+    with sqlite3.connect(tmp_path / "db.sqlite") as conn:
+        df = frame(["Real", "False", "Real"], [1, 2, 3])
+        ensure_table(conn, df)
+        upsert_df(conn, df)
+
+        # A corrected export dates SN0 and SN1 on day 5 instead
+        assert upsert_df(conn, frame(["Real", "False"], [5, 5])) == {"2025-07-01", "2025-07-02", "2025-07-05"}
+        by_day = read_daily_counts(conn, *july, by=("day",)).set_index("day")["n"].to_dict()
+        parts = conn.execute("SELECT day, SUM(n) FROM part_daily_counts GROUP BY day ORDER BY day").fetchall()
+    assert by_day == {"2025-07-03": 1, "2025-07-05": 2}
+    assert parts == [("2025-07-03", 1), ("2025-07-05", 2)]
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Synthetic AOI exports: deterministic, realistic, split between boards.
+"""
+import pandas as pd
+
+from ingest_to_db import classify_frame
+from synthetic_data import generate_rawdata, iter_rawdata, parse_rows, write_rawdata
+
+RAW_COLUMNS = ["LineName", "MachineName", "EventDate", "EventType", "OperationName", "RouteStep",
+               "SerialNumber", "PartNumber", "PartNumberRev", "ReworkStatus", "DefectCode", "Ref_Id",
+               "ComponentPN", "LoopNumber"]
+
+
+def test_same_seed_same_rows():
+    df = generate_rawdata(3_000, seed=4)
+    assert list(df.columns) == RAW_COLUMNS and len(df) == 3_000
+    assert df.equals(generate_rawdata(3_000, seed=4))
+    assert not df.equals(generate_rawdata(3_000, seed=5))
+
+
+def test_rows_classify_to_realistic_mix():
+    df = generate_rawdata(20_000)
+    outcomes = classify_frame(df)["Outcome"].value_counts(normalize=True)
+    components = df["ComponentPN"].value_counts(normalize=True)
+
+    assert set(outcomes.index) == {"False", "Real", "Fixed from previously caught", "Suspect"}
+    assert outcomes["False"] > 0.6
+    assert components.iloc[:5].sum() > 0.4  # a few parts dominate
+    assert df["Ref_Id"].str.contains(r"^[A-Z]+\d+\.\d+$").any()  # pin-level refs
+    assert df.groupby(["SerialNumber", "Ref_Id", "DefectCode"]).size().max() > 1  # loops
+
+
+def test_split_files_never_share_a_board(tmp_path):
+    parts = list(iter_rawdata(5_000, max_rows=1_200))
+    assert sum(map(len, parts)) == 5_000 and max(map(len, parts)) <= 1_200
+    for before, after in zip(parts, parts[1:]):
+        assert not set(before["SerialNumber"]) & set(after["SerialNumber"])
+
+    paths = write_rawdata(tmp_path, 600, max_rows=400)
+    assert [p.name for p in paths] == ["Defect RawData - synthetic-600-s0-000.xlsx",
+                                       "Defect RawData - synthetic-600-s0-001.xlsx"]
+    assert sum(len(pd.read_excel(p)) for p in paths) == 600
+
+
+def test_tier_names():
+    assert [parse_rows(t) for t in ("10k", "1M", "10M", "2500")] == [10_000, 1_000_000, 10_000_000, 2_500]